@@ -0,0 +1,235 @@
+"""
+A model of the game as Player sees it through act_utils.get_bucket, small enough to solve and evaluate exactly.
+
+The betting tree is built from the skeleton's RoundState rules, with each node offering the four abstract actions of
+act_utils.act at their average bet sizes (.75 and 1.25 of the pot). The cards are reduced to the bucket each player's
+hand falls in on every street: a preflop strength percentile, then a cluster from bucket_table or a win probability
+bucket. The chance model treats the two players' buckets as independent Markov chains, with the transition matrices
+between streets and the river showdown matrix between buckets estimated from sampled boards, and every holding
+evaluated on each board at once with EvaluatorNumpy.sweep_board.
+
+Running this file rebuilds abstract_game.npz, which holds the chance model.
+"""
+
+import argparse
+import pickle
+import time
+
+import numpy as np
+import act_utils
+import bucket_table
+import equity_calc
+import preflop_table
+
+from skeleton.cards import ID_TO_STR
+from skeleton.states import RoundState, TerminalState, STARTING_STACK, BIG_BLIND, SMALL_BLIND
+
+STREETS = [0, 3, 4, 5]
+N_ACTIONS = 4
+N_PREFLOP_BUCKETS = 100  # Percentile buckets, see act_utils.get_bucket
+N_POSTFLOP_BUCKETS = len(act_utils.strength_cutoffs) + 1  # The same number as bucket_table.N_CLUSTERS
+
+def n_buckets(street):
+    """
+    Returns the number of card buckets on a street.
+    """
+    return N_PREFLOP_BUCKETS if street == 0 else N_POSTFLOP_BUCKETS
+
+class MeanSizes:
+    """
+    Stands in for the random generator passed to act_utils.act, so every bet is made at its average size.
+    """
+
+    def normal(self, loc, scale):
+        return loc
+
+MEAN_SIZES = MeanSizes()
+
+class Node:
+    """
+    A node of the betting tree. Decision nodes have the acting player, the bucket id of the betting situation (without
+    the card bucket, which is added to it) and one child per abstract action. Terminal nodes have the chips each player
+    wins if they fold (deltas) or the amount each player has put in if they reach a showdown.
+    """
+
+    def __init__(self, state):
+        self.state = state
+        self.terminal = isinstance(state, TerminalState)
+        self.children = []  # The child reached by each abstract action, possibly the same child more than once
+        self.index = None  # Position in Tree.nodes
+
+        if self.terminal:
+            self.showdown = state.deltas == [0, 0]  # Folds always move chips, showdowns are settled afterwards
+            self.deltas = np.array(state.deltas)
+            self.contribution = STARTING_STACK - state.previous_state.stacks[0]
+            self.street = state.previous_state.street
+
+        else:
+            self.player = state.button % 2
+            self.street = state.street
+            active = self.player
+            continue_cost = state.pips[1 - active] - state.pips[active]
+            pot_after_continue = (STARTING_STACK - state.stacks[0]) + (STARTING_STACK - state.stacks[1]) + continue_cost
+            cluster = None if self.street == 0 else 0
+            self.base = act_utils.get_bucket(active, continue_cost, pot_after_continue, self.street, -1, cluster)
+            self.pip = state.pips[active]
+            self.continue_cost = continue_cost
+            self.pot_after_continue = pot_after_continue
+
+    def actions(self):
+        """
+        Returns the skeleton action taken by each abstract action.
+        """
+        legal_actions = self.state.legal_actions()
+        return [act_utils.act(i, legal_actions, self.state, self.pip, self.continue_cost, self.pot_after_continue,
+                              MEAN_SIZES) for i in range(N_ACTIONS)]
+
+    def distinct(self):
+        """
+        Returns the distinct children of the node and, for each, the abstract actions that lead to it.
+        """
+        groups = {}
+        for action, child in enumerate(self.children):
+            groups.setdefault(child.index, (child, []))[1].append(action)
+
+        return list(groups.values())
+
+class Tree:
+    """
+    The betting tree of one round, from the blinds (or the given RoundState) to every fold and showdown. Nodes are
+    listed parents first, and decision nodes can be found by their betting situation with find.
+    """
+
+    def __init__(self, root=None):
+        if root is None:
+            root = RoundState(0, 0, [SMALL_BLIND, BIG_BLIND],
+                              [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND], [[], []], [], None)
+        self.nodes = []
+        self.lookup = {}  # Decision nodes by situation_key
+        self.root = self.expand(root)
+
+    def find(self, state):
+        """
+        Returns the decision node in the same betting situation as a RoundState, or None if it is not in the tree.
+        """
+        return self.lookup.get(situation_key(state))
+
+    def expand(self, state):
+        node = Node(state)
+        node.index = len(self.nodes)
+        self.nodes.append(node)
+        if not node.terminal:
+            self.lookup.setdefault(situation_key(state), node)
+
+        if not node.terminal:
+            seen = {}
+            for action in node.actions():
+                key = (type(action), getattr(action, 'amount', None))
+                if key not in seen:  # Abstract actions that map to the same action share a child
+                    seen[key] = self.expand(state.proceed(action))
+                node.children.append(seen[key])
+
+        return node
+
+def situation_key(state):
+    """
+    Identifies the betting situation of a RoundState: whose turn it is and what both players have put in.
+    """
+    return state.street, state.button, tuple(state.pips), tuple(state.stacks)
+
+class ChanceModel:
+    """
+    The distribution of card buckets: the preflop prior, the transition matrix from each street to the next and the
+    expected showdown result between two river buckets.
+    """
+
+    def __init__(self, prior, transitions, showdown):
+        self.prior = prior  # (N_PREFLOP_BUCKETS,)
+        self.transitions = transitions  # Dictionary from street to the (n_buckets(street), n_buckets(next)) matrix
+        self.showdown = showdown  # (N_POSTFLOP_BUCKETS, N_POSTFLOP_BUCKETS) P(win) - P(lose) of the row bucket
+
+    def save(self, path='abstract_game.npz'):
+        np.savez_compressed(path, prior=self.prior, showdown=self.showdown,
+                            **{f'transition_{street}': matrix for street, matrix in self.transitions.items()})
+
+    @classmethod
+    def load(cls, path='abstract_game.npz'):
+        with np.load(path) as data:
+            transitions = {street: data[f'transition_{street}'] for street in STREETS[:-1]}
+            return cls(data['prior'], transitions, data['showdown'])
+
+def next_street(street):
+    return STREETS[STREETS.index(street) + 1]
+
+def preflop_buckets():
+    """
+    Returns the preflop bucket of every holding in equity_calc.HOLDINGS.
+    """
+    with open('preflop_odds.pickle', 'rb') as file:
+        preflop_odds = pickle.load(file)
+
+    strengths = np.array([preflop_odds[ID_TO_STR[first] + ID_TO_STR[second]][0][0]
+                          for first, second in equity_calc.HOLDINGS])
+    return np.searchsorted(act_utils.get_percentiles(), strengths)
+
+def postflop_buckets(evaluator, board, n_runouts=None):
+    """
+    Returns the bucket of every holding in equity_calc.HOLDINGS on a board: its cluster where bucket_table has the
+    street, and otherwise its win probability bucket from sweep_board with n_runouts runouts (None for all of them).
+    """
+    clusters = bucket_table.get_clusters(board)
+    if clusters is not None:
+        return clusters
+
+    odds, _ = evaluator.sweep_board(equity_calc.ID_TO_INT[board], n_runouts)
+    return np.searchsorted(act_utils.strength_cutoffs, np.nan_to_num(odds[:, 0]))
+
+def estimate(n_boards=1000, n_flop_runouts=100, seed=0):
+    """
+    Estimates the chance model from n_boards random boards. On each board every holding is bucketed on every street,
+    transitions are counted for every holding that stays live, and the showdown matrix counts every pair of disjoint
+    holdings on the river.
+    """
+    evaluator = equity_calc.EvaluatorNumpy(np.random.default_rng(seed))
+    rng = np.random.default_rng(seed)
+    disjoint = preflop_table.get_disjoint()
+
+    buckets = {0: preflop_buckets()}
+    prior = np.bincount(buckets[0], minlength=N_PREFLOP_BUCKETS) / len(buckets[0])
+    counts = {street: np.zeros((n_buckets(street), n_buckets(next_street(street)))) for street in STREETS[:-1]}
+    wins = np.zeros((N_POSTFLOP_BUCKETS, N_POSTFLOP_BUCKETS))
+    meetings = np.zeros((N_POSTFLOP_BUCKETS, N_POSTFLOP_BUCKETS))
+
+    for _ in range(n_boards):
+        board = rng.choice(52, 5, replace=False)
+        for street in STREETS[1:]:
+            buckets[street] = postflop_buckets(evaluator, board[:street], n_flop_runouts if street == 3 else None)
+
+        live = ~np.isin(equity_calc.HOLDINGS, board).any(axis=1)
+        for street in STREETS[:-1]:
+            np.add.at(counts[street], (buckets[street][live], buckets[next_street(street)][live]), 1)
+
+        river = evaluator.score_holdings(board[None, :])[0]
+        one_hot = np.zeros((len(river), N_POSTFLOP_BUCKETS))
+        one_hot[live, buckets[5][live]] = 1
+        meet = disjoint & live[:, None] & live[None, :]
+        results = np.sign(river[None, :] - river[:, None]) * meet  # Lower scores win
+        wins += one_hot.T @ results @ one_hot
+        meetings += one_hot.T @ meet @ one_hot
+
+    transitions = {street: matrix / np.maximum(matrix.sum(axis=1, keepdims=True), 1) for street, matrix in counts.items()}
+    for street, matrix in transitions.items():  # Buckets never seen stay where the average hand would go
+        unseen = matrix.sum(axis=1) == 0
+        matrix[unseen] = counts[street].sum(axis=0) / counts[street].sum()
+
+    return ChanceModel(prior, transitions, wins / np.maximum(meetings, 1))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python3 abstract_game.py')
+    parser.add_argument('--boards', type=int, default=1000, help='Number of random boards to estimate the model from')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the sampled boards')
+    args = parser.parse_args()
+
+    start = time.time()
+    estimate(args.boards, seed=args.seed).save()
+    print(f"Done in {time.time() - start:.0f}s")
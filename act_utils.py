@@ -4,6 +4,7 @@ A set of utilities used to make decisions by bots implementing counterfactual re
 
 import numpy as np
 import pickle
+import threading
 
 from skeleton.actions import FoldAction, CallAction, CheckAction, RaiseAction
 
@@ -11,30 +12,54 @@ continue_cost_cutoffs = np.array([2.5, 10, 22.5, 40, 62.5, 90, 117.5, 145, 172.5
 grand_total_cutoffs = np.array([5, 20, 45, 80, 125, 180, 235, 290, 345])
 strength_cutoffs = np.array([.05, .1, .15, .2, .25, .3, .35, .4, .45, .5, .55, .6, .65, .7, .75, .8, .85, .9, .95]) # Only used for post-flop hands
 
-with open("preflop_odds.pickle", "rb") as file: # A dictionary of pre-computed preflop odds and hand types
-    PREFLOP_ODDS = pickle.load(file)
+_load_lock = threading.Lock()
+_percentiles = None
 
-preflop_strengths = [PREFLOP_ODDS[strength][0][0] for strength in PREFLOP_ODDS] # Make a list of all preflop hand strengths
-percentiles = np.percentile(np.array(preflop_strengths), np.arange(1, 100)) # Convert hand strengths into percentiles
+def get_percentiles():
+    """
+    Returns the 1st through 99th percentiles of all preflop hand strengths, loading them the first time they are needed.
+    """
+    global _percentiles
+
+    with _load_lock:  # Bots on other threads can ask at the same time, and must not load twice
+        if _percentiles is None:
+            with open("preflop_odds.pickle", "rb") as file: # A dictionary of pre-computed preflop odds and hand types
+                preflop_odds = pickle.load(file)
 
-def get_bucket(button, continue_cost, pot_after_continue, street, strength):
+            preflop_strengths = [preflop_odds[strength][0][0] for strength in preflop_odds] # Make a list of all preflop hand strengths
+            _percentiles = np.percentile(np.array(preflop_strengths), np.arange(1, 100)) # Convert hand strengths into percentiles
+
+    return _percentiles
+
+def get_bucket(button, continue_cost, pot_after_continue, street, strength, cluster=None):
     """
     Places a game state into a single bucket. Takes in button (0 if small blind, 1 if big blind), the cost to continue
-    the round of betting, the grand total in the pot after you continue, the street, and card strength.
+    the round of betting, the grand total in the pot after you continue, the street, and card strength. Post-flop, the
+    cluster of your hand from bucket_table is used in place of the strength when it is given.
     """
     continue_bucket = np.searchsorted(continue_cost_cutoffs, continue_cost)
     grand_total_bucket = np.searchsorted(grand_total_cutoffs, pot_after_continue)
+    strength_bucket = get_strength_bucket(street, strength, cluster)
 
-    if street == 0: # If we are preflop, find what percentile our hand strength is in (100 options)
-        strength_bucket = np.searchsorted(percentiles, strength)
-
-    else:
+    if street != 0:
         street = street - 2 # Ensures streets have the value 0, 1, 2, or 3
-        strength_bucket = np.searchsorted(strength_cutoffs, strength)
-        # strength_bucket = int(min(strength * 100, 99))
 
     return (40000 * button) + (10000 * street) + (1000 * continue_bucket) + (100 * grand_total_bucket) + strength_bucket
 
+def get_strength_bucket(street, strength, cluster=None):
+    """
+    Returns the part of the bucket id that comes from the cards: the percentile of the hand strength preflop (100
+    options), and post-flop the cluster of the hand if it is given, or else its strength bucket. A strategy table must
+    be read with the same kind of buckets it was trained on.
+    """
+    if street == 0:
+        return np.searchsorted(get_percentiles(), strength)
+
+    if cluster is not None:
+        return cluster
+
+    return np.searchsorted(strength_cutoffs, strength)
+
 def calculate_strategy(regrets):
     """
     Given the regrets of taking each of the four possible actions for a given bucket, computes a probability
@@ -52,11 +77,11 @@ def calculate_strategy(regrets):
     else: # Otherwise, compute a probability distribution over actions with positive regrets
         return regrets / total
 
-def act(action, legal_actions, round_state, pip, continue_cost, pot_after_continue):
+def act(action, legal_actions, round_state, pip, continue_cost, pot_after_continue, rng=np.random):
     """
     Takes in one of four possible action types as a number in [0, 1, 2, 3] and executes it for the player. Requires that
     it is provided a list of legal actions, the current round state, the pip, cost to continue the round of betting, and
-    the pot size if you choose to continue.
+    the pot size if you choose to continue. Bet sizes are drawn from rng, a numpy Generator or the global numpy stream.
     """
     if action == 0:  # Check or fold
         if CheckAction in legal_actions:
@@ -69,10 +94,10 @@ def act(action, legal_actions, round_state, pip, continue_cost, pot_after_contin
         return CallAction()
 
     elif action == 2:  # Bet roughly .75 of the pot
-        bet = min(np.random.normal(loc=.75, scale=.5), 2)
+        bet = min(rng.normal(loc=.75, scale=.5), 2)
 
     else:  # Bet roughly 1.25 of the pot
-        bet = min(np.random.normal(loc=1.25, scale=.5), 2)
+        bet = min(rng.normal(loc=1.25, scale=.5), 2)
 
     if RaiseAction in legal_actions:
         min_raise, max_raise = round_state.raise_bounds()  # The smallest and largest number of chips for a legal bet/raise
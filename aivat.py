@@ -0,0 +1,162 @@
+"""
+Evaluates a bot from its hand logs, with the luck of the cards taken out of each hand's result in the style of AIVAT.
+
+Every card deal the bot sees is a chance event whose expected value is known: before the cards are dealt, the bot's
+equity against a uniformly random holding is the average of its equity over the cards to come. So for each street that
+was dealt, the pot at the start of the street times the change in that equity (from the previous street's, or from 1/2
+before the hole cards) measures how lucky the deal was, and is subtracted from the hand's result. Each correction has
+an expected value of zero, so the corrected results have the same mean as the raw ones and usually far less variance.
+This holds for any ranking of hands, so the unknown rank permutation only makes the correction less effective, never
+biased. The only bias is card removal: deals actually come from a deck without the opponent's cards.
+
+Equities are computed with EvaluatorNumpy over whole batches of records: exactly on the river, and on the flop and turn
+as the average river equity over sampled runouts, which keeps every correction unbiased. The bot's own decisions are
+not corrected, since the log does not hold the probabilities of the actions it did not take.
+"""
+
+import argparse
+import time
+
+import numpy as np
+import equity_calc
+import preflop_table
+
+from equity_calc import HOLDING_INDEX, HOLDINGS_WITH_CARD
+from skeleton import hand_log
+from skeleton.states import RoundState, TerminalState, STARTING_STACK, BIG_BLIND, SMALL_BLIND
+
+STREETS = [0, 3, 4, 5]
+
+def street_pots(record):
+    """
+    Replays the actions of a record from the blinds and returns the pot at the start of each street in STREETS, 0 for
+    streets that were not dealt. Streets dealt after both players are all in get the final pot.
+    """
+    state = RoundState(0, 0, [SMALL_BLIND, BIG_BLIND], [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND],
+                       [[], []], [], None)
+    pots = [SMALL_BLIND + BIG_BLIND, 0, 0, 0]
+
+    for code in record['actions'][:record['n_actions']]:
+        state = state.proceed(hand_log.unpack_action(int(code)))
+        if isinstance(state, TerminalState):
+            state = state.previous_state
+            break
+        pot = 2 * STARTING_STACK - state.stacks[0] - state.stacks[1]
+        if pots[STREETS.index(state.street)] == 0:
+            pots[STREETS.index(state.street)] = pot
+
+    final_pot = 2 * STARTING_STACK - state.stacks[0] - state.stacks[1]
+    n_board = int((record['board'] >= 0).sum())
+    for i, street in enumerate(STREETS):
+        if street <= n_board and pots[i] == 0:
+            pots[i] = final_pot
+
+    return pots
+
+def river_equities(evaluator, hands, boards, chunk_size=256):
+    """
+    Given hands (n, 2) and full boards (n, 5) as card ids, returns the equity of each hand on its board against a
+    uniformly random holding, scoring every holding on chunk_size boards at a time.
+    """
+    equities = np.empty(len(boards))
+    for start in range(0, len(boards), chunk_size):
+        chunk_hands, chunk_boards = hands[start:start + chunk_size], boards[start:start + chunk_size]
+        rows = np.arange(len(chunk_boards))[:, None]
+        scores = evaluator.score_holdings(chunk_boards)
+        ours = scores[rows[:, 0], HOLDING_INDEX[chunk_hands[:, 0], chunk_hands[:, 1]]]
+
+        live = scores > 0
+        for card in chunk_hands.T:  # The opponent cannot hold our cards
+            live[rows, HOLDINGS_WITH_CARD[card]] = False
+
+        wins = (live & (scores > ours[:, None])).sum(axis=1)  # Lower scores win
+        ties = (live & (scores == ours[:, None])).sum(axis=1)
+        equities[start:start + chunk_size] = (wins + ties / 2) / live.sum(axis=1)
+
+    return equities
+
+def street_equities(evaluator, hands, boards, street, n_runouts, rng):
+    """
+    Given hands (n, 2) and boards (n, street) as card ids, returns an unbiased estimate of each hand's equity against a
+    uniformly random holding: its average river equity over n_runouts runouts dealt from the unseen cards.
+    """
+    keys = rng.random((len(hands), n_runouts, 52))
+    known = np.concatenate((hands, boards), axis=1)
+    keys[np.arange(len(hands))[:, None], :, known] = np.inf  # Known cards sort last and are never dealt
+    runouts = np.argsort(keys, axis=2)[:, :, :5 - street]
+
+    full_boards = np.concatenate((np.repeat(boards[:, None, :], n_runouts, axis=1), runouts), axis=2).reshape(-1, 5)
+    equities = river_equities(evaluator, np.repeat(hands, n_runouts, axis=0), full_boards)
+    return equities.reshape(len(hands), n_runouts).mean(axis=1)
+
+def preflop_equities(hands):
+    """
+    Returns the exact preflop equity of hands (n, 2) against a uniformly random holding.
+    """
+    equity, pairs = preflop_table.load_matrix()
+    class_equities = (equity * pairs).sum(axis=1) / pairs.sum(axis=1)
+    return class_equities[[preflop_table.get_class(first, second) for first, second in hands]]
+
+def evaluate_batch(evaluator, records, n_runouts, rng):
+    """
+    Returns the raw and corrected result of every record in a batch, in chips.
+    """
+    hands = records['hand'].astype(int)
+    boards = records['board'].astype(int)
+    n_board = (boards >= 0).sum(axis=1)
+    pots = np.array([street_pots(record) for record in records])
+
+    equities = np.zeros((len(records), len(STREETS)))
+    equities[:, 0] = preflop_equities(hands)
+    for i, street in enumerate(STREETS[1:], 1):
+        dealt = n_board >= street
+        if street == 5:
+            equities[dealt, i] = river_equities(evaluator, hands[dealt], boards[dealt])
+        elif dealt.any():
+            equities[dealt, i] = street_equities(evaluator, hands[dealt], boards[dealt, :street], street, n_runouts,
+                                                 rng)
+
+    baselines = np.concatenate((np.full((len(records), 1), .5), equities[:, :-1]), axis=1)
+    corrections = (pots * (equities - baselines)).sum(axis=1)  # Pots of streets not dealt are 0
+    deltas = records['delta'].astype(float)
+    return deltas, deltas - corrections
+
+def evaluate(paths, n_runouts=16, batch_size=1024, seed=0):
+    """
+    Returns the raw and corrected results of every hand in the logs at paths, in chips.
+    """
+    evaluator = equity_calc.EvaluatorNumpy(np.random.default_rng(seed))
+    rng = np.random.default_rng(seed)
+    raw, corrected = [], []
+
+    for path in paths:
+        for records in hand_log.batches(path, batch_size):
+            batch_raw, batch_corrected = evaluate_batch(evaluator, records, n_runouts, rng)
+            raw.append(batch_raw)
+            corrected.append(batch_corrected)
+
+    return np.concatenate(raw), np.concatenate(corrected)
+
+def confidence_interval(values, z=1.96):
+    """
+    Returns the mean of values and the half width of its confidence interval (95% by default).
+    """
+    return values.mean(), z * values.std(ddof=1) / np.sqrt(len(values))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python3 aivat.py')
+    parser.add_argument('logs', type=str, nargs='+', help='Hand logs written with --log')
+    parser.add_argument('--runouts', type=int, default=16, help='Runouts sampled for flop and turn equities')
+    parser.add_argument('--batch-size', type=int, default=1024, help='Records evaluated at a time')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the sampled runouts')
+    args = parser.parse_args()
+
+    start = time.time()
+    raw, corrected = evaluate(args.logs, args.runouts, args.batch_size, args.seed)
+    print(f"Evaluated {len(raw)} hands in {time.time() - start:.1f}s")
+
+    for name, values in [('Raw', raw), ('Corrected', corrected)]:
+        mean, half_width = confidence_interval(values)
+        print(f"{name:<10}{mean:+.3f} +/- {half_width:.3f} chips/hand "
+              f"({1000 * mean / BIG_BLIND:+.0f} +/- {1000 * half_width / BIG_BLIND:.0f} mbb/hand)")
+    print(f"Variance reduced {raw.var() / corrected.var():.1f}x")
@@ -0,0 +1,74 @@
+"""
+Measures how exploitable a bucketed strategy is by computing a best response to it in the abstract game.
+
+The strategy is the average strategy in a table of strategy sums (such as stratsum_small_2.csv), played at every node
+of the compiled betting tree (see betting_tree.py) through its bucket id base. For each seat, a best responder who knows the strategy
+walks the tree once with the opponent's reach as a vector over their card buckets and returns its value as a vector
+over its own buckets, taking the best action for every bucket at its own nodes. The exploitability is the average of
+the two seats' best response values, reported in milli big blinds per hand.
+"""
+
+import argparse
+import time
+
+import numpy as np
+import abstract_game
+import betting_tree
+import bucket_store
+
+from skeleton.states import BIG_BLIND
+
+def best_response(tree, model, strategies, player):
+    """
+    Returns the expected winnings per hand, in chips, of a best response playing as player (0 for the small blind)
+    against the strategies of every node.
+    """
+    def walk(node, reach):
+        """
+        Given the opponent's reach over their card buckets on the node's street, returns the best responder's value
+        for each of its own card buckets.
+        """
+        if tree.terminal(node):
+            if tree.showdown[node]:
+                return tree.contribution[node] * (model.showdown @ reach)
+            return np.full(abstract_game.n_buckets(tree.street[node]), tree.deltas[node, player] * reach.sum())
+
+        if tree.player[node] == player:
+            return np.max([walk_child(node, child, reach) for child, _ in tree.distinct(node)], axis=0)
+
+        strategy = strategies[node]
+        return sum(walk_child(node, child, reach * strategy[:, actions].sum(axis=1))
+                   for child, actions in tree.distinct(node))
+
+    def walk_child(node, child, reach):
+        if tree.street[child] != tree.street[node]:  # Both players' buckets move on to the next street
+            transition = model.transitions[tree.street[node]]
+            return transition @ walk(child, reach @ transition)
+        return walk(child, reach)
+
+    return model.prior @ walk(0, model.prior)
+
+def exploitability(tree, model, strategies):
+    """
+    Returns the exploitability of the strategies in milli big blinds per hand, along with the best response value of
+    each seat in chips per hand.
+    """
+    values = [best_response(tree, model, strategies, player) for player in range(2)]
+    return 1000 * np.mean(values) / BIG_BLIND, values
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python3 best_response.py')
+    parser.add_argument('--stratsum', type=str, default='stratsum_small_2', help='Strategy sums, as .npz or .csv')
+    parser.add_argument('--model', type=str, default='abstract_game.npz', help='Chance model from abstract_game.py')
+    args = parser.parse_args()
+
+    start = time.time()
+    tree = betting_tree.load_tree()
+    model = abstract_game.ChanceModel.load(args.model)
+    strategies = betting_tree.get_strategies(tree, bucket_store.load(args.stratsum))
+    print(f"Loaded the tree ({len(tree)} nodes) and strategies in {time.time() - start:.1f}s")
+
+    start = time.time()
+    mbb, values = exploitability(tree, model, strategies)
+    print(f"Best response: {values[0]:.3f} chips/hand as small blind, {values[1]:.3f} as big blind")
+    print(f"Exploitability: {mbb:.0f} mbb/hand ({time.time() - start:.1f}s)")
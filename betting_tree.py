@@ -0,0 +1,240 @@
+"""
+The betting tree of abstract_game compiled to flat arrays, and translation of real actions onto it.
+
+Every node is an index into a set of parallel arrays: its children under each of the N_ACTIONS abstract actions, the
+acting player, street and bucket id base of decision nodes, and the deltas, showdown flag and contribution of terminal
+nodes. Trainers and live lookups walk these arrays directly, with no Python object per node.
+
+Real raises rarely match the tree's sizes, so a raise is mapped onto the two tree actions that bracket its size with the
+pseudo-harmonic mapping of Ganzfried and Sandholm: with sizes as fractions of the pot, a raise of x between tree sizes A
+and B is read as A with probability (B - x)(1 + A) / ((B - A)(1 + x)) and as B otherwise. Calling or checking counts as
+a size of 0, so raises smaller than the tree's smallest are sometimes read as calls.
+
+Running this file rebuilds betting_tree.npz, which Player loads instead of building the tree at startup.
+"""
+
+import argparse
+import threading
+import time
+
+import numpy as np
+import act_utils
+
+from skeleton.actions import FoldAction, CallAction, CheckAction, RaiseAction
+from skeleton.hand_log import CALL, CHECK, RAISE, ACTION_TYPES
+from skeleton.states import STARTING_STACK
+
+FIELDS = ['children', 'kinds', 'fractions', 'player', 'street', 'base', 'node_base', 'showdown', 'deltas',
+          'contribution']
+
+class CompiledTree:
+    """
+    The betting tree as parallel arrays indexed by node, with the root at index 0:
+
+    children (n, N_ACTIONS): the child reached by each abstract action, -1 at terminal nodes.
+    kinds (n, N_ACTIONS): the kind of skeleton action each abstract action takes, as in skeleton.hand_log.
+    fractions (n, N_ACTIONS): the size of each raise as a fraction of the pot after calling, nan for other actions.
+    player, street, base (n,): the acting player, street and bucket id base of decision nodes, -1 at terminal nodes
+        (street is the last street played at terminal nodes).
+    node_base (n,): the first row of each decision node in tables with rows of their own for every node (such as
+        vector_cfr.py's), -1 at terminal nodes.
+    showdown (n,), deltas (n, 2), contribution (n,): how terminal nodes are settled, as in abstract_game.Node.
+    """
+
+    def __init__(self, **arrays):
+        for field in FIELDS:
+            setattr(self, field, arrays[field])
+        self.rows = self.children.tolist()  # Plain lists are faster than array rows in recursive walks
+
+    def __len__(self):
+        return len(self.player)
+
+    @classmethod
+    def from_tree(cls, tree):
+        """
+        Compiles an abstract_game.Tree, keeping its node indices.
+        """
+        from abstract_game import N_ACTIONS, n_buckets  # Only needed to build the tree, so Player does not import it
+        n_nodes = len(tree.nodes)
+        arrays = {
+            'children': np.full((n_nodes, N_ACTIONS), -1, dtype=np.int32),
+            'kinds': np.zeros((n_nodes, N_ACTIONS), dtype=np.int8),
+            'fractions': np.full((n_nodes, N_ACTIONS), np.nan, dtype=np.float32),
+            'player': np.full(n_nodes, -1, dtype=np.int8),
+            'street': np.zeros(n_nodes, dtype=np.int8),
+            'base': np.full(n_nodes, -1, dtype=np.int32),
+            'node_base': np.full(n_nodes, -1, dtype=np.int32),
+            'showdown': np.zeros(n_nodes, dtype=bool),
+            'deltas': np.zeros((n_nodes, 2), dtype=np.int16),
+            'contribution': np.zeros(n_nodes, dtype=np.int16),
+        }
+
+        n_rows = 0
+        for node in tree.nodes:
+            i = node.index
+            arrays['street'][i] = node.street
+            if node.terminal:
+                arrays['showdown'][i] = node.showdown
+                arrays['deltas'][i] = node.deltas
+                arrays['contribution'][i] = node.contribution
+                continue
+
+            arrays['player'][i] = node.player
+            arrays['base'][i] = node.base
+            arrays['node_base'][i] = n_rows
+            n_rows += n_buckets(node.street)
+            arrays['children'][i] = [child.index for child in node.children]
+            for a, action in enumerate(node.actions()):
+                arrays['kinds'][i, a] = ACTION_TYPES.index(type(action))
+                if isinstance(action, RaiseAction):
+                    arrays['fractions'][i, a] = (action.amount - node.pip - node.continue_cost) / node.pot_after_continue
+
+        return cls(**arrays)
+
+    def save(self, path='betting_tree.npz'):
+        np.savez_compressed(path, **{field: getattr(self, field) for field in FIELDS})
+
+    @classmethod
+    def load(cls, path='betting_tree.npz'):
+        with np.load(path) as data:
+            return cls(**{field: data[field] for field in FIELDS})
+
+    def terminal(self, node):
+        return self.player[node] < 0
+
+    def distinct(self, node):
+        """
+        Yields the distinct children of a decision node and, for each, the abstract actions that lead to it.
+        """
+        row = self.rows[node]
+        for a, child in enumerate(row):
+            if child not in row[:a]:
+                yield child, [b for b in range(a, len(row)) if row[b] == child]
+
+    def translate(self, node, state, action, rng=np.random):
+        """
+        Returns the child of a decision node that a real action maps to, taken from state (the real RoundState it was
+        taken in), or -1 if the node has no such action. Raises are mapped with the pseudo-harmonic mapping, drawing from
+        rng.
+        """
+        kinds = self.kinds[node]
+        children = self.children[node]
+
+        if isinstance(action, (FoldAction, CheckAction, CallAction)):
+            kind = ACTION_TYPES.index(type(action))
+            matches = np.flatnonzero(kinds == kind)
+            return children[matches[0]] if len(matches) else -1
+
+        raises = np.flatnonzero(kinds == RAISE)
+        if len(raises) == 0:  # The tree is all in already, so read the raise as a call
+            return self.translate(node, state, CallAction() if CALL in kinds else CheckAction(), rng)
+
+        active = state.button % 2
+        continue_cost = state.pips[1 - active] - state.pips[active]
+        pot_after_continue = 2 * STARTING_STACK - state.stacks[0] - state.stacks[1] + continue_cost
+        size = (action.amount - state.pips[active] - continue_cost) / pot_after_continue
+
+        # The sizes to choose between: calling or checking counts as 0, then the tree's raises
+        passive = np.flatnonzero((kinds == CALL) | (kinds == CHECK))[:1]
+        options = np.concatenate((passive, raises[np.argsort(self.fractions[node, raises])]))
+        sizes = np.concatenate((np.zeros(len(passive)), np.sort(self.fractions[node, raises])))
+
+        above = np.searchsorted(sizes, size)
+        if above == 0:
+            return children[options[0]]
+        if above == len(sizes):
+            return children[options[-1]]
+
+        return children[options[above - 1 if rng.random() < pseudo_harmonic(sizes[above - 1], sizes[above], size)
+                                else above]]
+
+    def locate(self, steps, rng=np.random, node=0):
+        """
+        Follows a list of (state, action) steps, as returned by history, from node. Returns the node reached, or -1 if
+        the real hand leaves the tree (it goes on after the tree's hand is over, or takes an action the tree lacks).
+        """
+        for state, action in steps:
+            if node < 0 or self.terminal(node):
+                return -1
+            node = self.translate(node, state, action, rng)
+        return node
+
+def pseudo_harmonic(low, high, size):
+    """
+    Returns the probability of reading a bet of size (a fraction of the pot) as the smaller of the bracketing sizes.
+    """
+    return (high - size) * (1 + low) / ((high - low) * (1 + size))
+
+def history(round_state):
+    """
+    Returns the actions taken from the blinds to round_state, each with the state it was taken in, as inferred from
+    the chain of previous states.
+    """
+    states = []
+    while round_state is not None:
+        states.append(round_state)
+        round_state = round_state.previous_state
+    states.reverse()
+
+    steps = []
+    closed = False  # Whether the last action was a call that ended the betting round
+    for before, after in zip(states, states[1:]):
+        if after.street != before.street:  # Either a call ended the round just before, or a check ends it here
+            if not closed:
+                steps.append((before, CheckAction()))
+            closed = False
+            continue
+
+        active = before.button % 2
+        if after.pips == before.pips:
+            steps.append((before, CheckAction()))
+        elif after.pips[active] == after.pips[1 - active]:
+            steps.append((before, CallAction()))
+            closed = before.street > 0 or before.button > 0  # Only the small blind's limp leaves the round open
+        else:
+            steps.append((before, RaiseAction(after.pips[active])))
+
+    return steps
+
+def get_strategies(tree, stratsum, base=None):
+    """
+    Returns the average strategy at every decision node of a compiled tree as a dictionary from node index to an
+    (n_buckets, N_ACTIONS) matrix, read from a store or dense table of strategy sums indexed by bucket id. base gives
+    the first row of each node, tree.base (Player's shared bucket ids) by default.
+    """
+    from abstract_game import n_buckets  # Only needed by the trainers, so Player does not import abstract_game
+
+    base = tree.base if base is None else base
+    strategies = {}
+    for node in np.flatnonzero(tree.player >= 0):
+        rows = [stratsum[base[node] + bucket] for bucket in range(n_buckets(tree.street[node]))]
+        strategies[node] = np.array([act_utils.calculate_strategy(row) for row in rows])
+
+    return strategies
+
+_load_lock = threading.Lock()
+_tree = None
+
+def load_tree(path='betting_tree.npz'):
+    """
+    Returns the compiled tree of the whole round, loading it the first time it is needed. The tree is read-only and
+    shared by every Player in the process.
+    """
+    global _tree
+
+    with _load_lock:  # Bots on other threads can ask at the same time, and must not load twice
+        if _tree is None:
+            _tree = CompiledTree.load(path)
+
+    return _tree
+
+if __name__ == '__main__':
+    import abstract_game
+
+    parser = argparse.ArgumentParser(prog='python3 betting_tree.py')
+    args = parser.parse_args()
+
+    start = time.time()
+    tree = CompiledTree.from_tree(abstract_game.Tree())
+    tree.save()
+    print(f"Compiled {len(tree)} nodes in {time.time() - start:.1f}s")
@@ -0,0 +1,89 @@
+"""
+A utility to describe the texture of a board: how many cards share a suit, how connected the ranks are and whether the
+board is paired. Features are packed into a single integer so a board's texture can be stored and compared cheaply.
+
+Everything that depends on ranks alone is precomputed into RANK_FEATURES, indexed by the 13 bit mask of ranks on the
+board. A board is split into one rank mask per suit, so the suit counts, pairing and the rank features all come from
+table lookups and bitwise operations on those four masks.
+"""
+
+import numpy as np
+
+# Bit layout of a packed feature word
+SUIT_SHIFT = 0  # Bits 0-2: the most cards of any one suit on the board
+CONNECTED_SHIFT = 3  # Bits 3-5: the most distinct ranks on the board that fit in one straight
+PAIRING_SHIFT = 6  # Bits 6-7: UNPAIRED, PAIRED, TWO_PAIR or TRIPS
+FLUSH_POSSIBLE = 1 << 8  # Three or more cards of one suit
+STRAIGHT_POSSIBLE = 1 << 9  # Three or more ranks that fit in one straight
+
+UNPAIRED = 0
+PAIRED = 1
+TWO_PAIR = 2
+TRIPS = 3  # Trips or better
+
+# The five rank masks of every straight, including the wheel (A2345)
+STRAIGHTS = [0b1000000001111] + [0b11111 << low for low in range(9)]
+
+POPCOUNT = np.array([bin(mask).count('1') for mask in range(8192)])  # The number of ranks in each mask of ranks
+
+def build_rank_features():
+    """
+    Builds the connectedness and straight possibility of every mask of ranks, as packed feature words.
+    """
+    masks = np.arange(8192)
+    connected = np.max([POPCOUNT[masks & straight] for straight in STRAIGHTS], axis=0)
+    return (connected << CONNECTED_SHIFT) | np.where(connected >= 3, STRAIGHT_POSSIBLE, 0)
+
+RANK_FEATURES = build_rank_features()
+
+def get_texture(board, remap=None):
+    """
+    Given the board as card ids, returns its packed feature word. If remap (an array that maps each card id to the card
+    it plays as, see permutation_solver.get_remap) is given, the texture is that of the board under the permutation.
+    """
+    if remap is not None:
+        board = remap[board]
+
+    suit_masks = [0, 0, 0, 0]
+    for card in board:
+        suit_masks[card & 3] |= 1 << (card >> 2)
+
+    ranks = suit_masks[0] | suit_masks[1] | suit_masks[2] | suit_masks[3]
+    max_suit = max(POPCOUNT[suit_masks[0]], POPCOUNT[suit_masks[1]], POPCOUNT[suit_masks[2]], POPCOUNT[suit_masks[3]])
+    duplicates = len(board) - POPCOUNT[ranks]  # The number of cards that repeat a rank already on the board
+
+    first, second, third, fourth = suit_masks
+    if (first & second & (third | fourth)) | (third & fourth & (first | second)):  # A rank in three or more suits
+        pairing = TRIPS
+    else:
+        pairing = min(duplicates, TWO_PAIR)
+
+    texture = int(RANK_FEATURES[ranks]) | (max_suit << SUIT_SHIFT) | (pairing << PAIRING_SHIFT)
+    if max_suit >= 3:
+        texture |= FLUSH_POSSIBLE
+
+    return texture
+
+def max_suit(texture):
+    """
+    Returns the most cards of any one suit on the board.
+    """
+    return (texture >> SUIT_SHIFT) & 7
+
+def connectedness(texture):
+    """
+    Returns the most distinct board ranks that fit in one straight.
+    """
+    return (texture >> CONNECTED_SHIFT) & 7
+
+def pairing(texture):
+    """
+    Returns whether the board is UNPAIRED, PAIRED, TWO_PAIR or TRIPS.
+    """
+    return (texture >> PAIRING_SHIFT) & 3
+
+def is_wet(texture):
+    """
+    Returns whether the board makes flushes or straights possible, so one and two pair hands are more vulnerable.
+    """
+    return bool(texture & (FLUSH_POSSIBLE | STRAIGHT_POSSIBLE))
@@ -0,0 +1,196 @@
+"""
+A sparse store of per-bucket action vectors, such as the regret and strategy sums used by CFR.
+
+The dense tables index every possible bucket id even though most are never visited. This store is an open addressing
+hash table with linear probing over uint64 bucket keys, holding one float32 vector per visited bucket, so memory grows
+with the number of visited buckets rather than the size of the abstraction. Lookups and updates are O(1) on average,
+and the table doubles in size whenever it becomes half full.
+"""
+
+import numpy as np
+
+EMPTY = np.uint64(2 ** 64 - 1)  # Marks an unused slot, so this key can never be stored
+MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)  # Fibonacci hashing spreads nearby bucket ids across the table
+
+class BucketStore:
+    """
+    Maps uint64 bucket keys to float32 vectors of a fixed width. Buckets that were never updated read as zeros.
+    """
+
+    def __init__(self, width=4, capacity=1024):
+        """
+        Takes in the length of each vector and the initial number of slots, which is rounded up to a power of two.
+        """
+        self.width = width
+        self.size = 0  # The number of buckets stored
+        self.allocate(1 << max(int(capacity - 1).bit_length(), 4))
+
+    def allocate(self, capacity):
+        """
+        Replaces the table with an empty one of capacity slots.
+        """
+        self.keys = np.full(capacity, EMPTY, dtype=np.uint64)
+        self.values = np.zeros((capacity, self.width), dtype=np.float32)
+        self.mask = capacity - 1
+        self.shift = np.uint64(64 - (capacity.bit_length() - 1))
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, key):
+        return self.find(key) >= 0
+
+    def slot(self, key):
+        """
+        Returns the slot holding key, or the empty slot where it would be inserted.
+        """
+        key = np.uint64(key)
+        with np.errstate(over='ignore'):
+            index = int((key * MULTIPLIER) >> self.shift)
+
+        while self.keys[index] != key and self.keys[index] != EMPTY:
+            index = (index + 1) & self.mask
+
+        return index
+
+    def find(self, key):
+        """
+        Returns the slot holding key, or -1 if it is not stored.
+        """
+        index = self.slot(key)
+        return index if self.keys[index] != EMPTY else -1
+
+    def get(self, key):
+        """
+        Returns the vector stored for key, or zeros if the bucket was never updated. The vector is a copy.
+        """
+        index = self.find(key)
+        if index < 0:
+            return np.zeros(self.width, dtype=np.float32)
+
+        return self.values[index].copy()
+
+    def __getitem__(self, key):
+        return self.get(key)
+
+    def insert(self, key):
+        """
+        Returns the slot holding key, inserting the key with a zero vector if it is not stored yet.
+        """
+        index = self.slot(key)
+
+        if self.keys[index] == EMPTY:
+            if 2 * (self.size + 1) > len(self.keys):  # Keep the table at most half full so probe sequences stay short
+                self.resize(2 * len(self.keys))
+                index = self.slot(key)
+
+            self.keys[index] = key
+            self.size += 1
+
+        return index
+
+    def __setitem__(self, key, vector):
+        index = self.insert(key)  # Inserting may replace self.values, so find the slot first
+        self.values[index] = vector
+
+    def add(self, key, vector):
+        """
+        Adds vector to the vector stored for key, as a trainer accumulating regrets or strategies would.
+        """
+        index = self.insert(key)
+        self.values[index] += vector
+
+    def resize(self, capacity):
+        """
+        Moves every stored bucket into a table of capacity slots.
+        """
+        keys, values = self.items()
+        self.allocate(capacity)
+        self.size = 0
+        self.extend(keys, values)
+
+    def extend(self, keys, values):
+        """
+        Stores many new (not yet stored, distinct) keys and their vectors at once. Every key probes from its home slot
+        together, and where several keys want the same free slot the first one takes it and the others move on.
+        """
+        keys = np.asarray(keys, dtype=np.uint64)
+        if 2 * (self.size + len(keys)) > len(self.keys):
+            self.resize(1 << (2 * (self.size + len(keys))).bit_length())
+
+        with np.errstate(over='ignore'):
+            slots = ((keys * MULTIPLIER) >> self.shift).astype(np.intp)
+        pending = np.arange(len(keys))
+
+        while len(pending):
+            free = self.keys[slots[pending]] == EMPTY
+            _, first = np.unique(slots[pending], return_index=True)
+            placed = np.zeros(len(pending), dtype=bool)
+            placed[first] = True
+            placed &= free
+
+            taken = pending[placed]
+            self.keys[slots[taken]] = keys[taken]
+            self.values[slots[taken]] = values[taken]
+
+            pending = pending[~placed]
+            slots[pending] = (slots[pending] + 1) & self.mask
+
+        self.size += len(keys)
+
+    def items(self):
+        """
+        Returns the stored keys and their vectors as two arrays.
+        """
+        used = self.keys != EMPTY
+        return self.keys[used], self.values[used]
+
+    def save(self, path):
+        """
+        Writes the stored buckets to an npz file.
+        """
+        keys, values = self.items()
+        np.savez_compressed(path, keys=keys, values=values)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a store written by save.
+        """
+        with np.load(path) as data:
+            return cls.from_items(data['keys'], data['values'])
+
+    @classmethod
+    def from_items(cls, keys, values):
+        """
+        Builds a store from arrays of keys and their vectors.
+        """
+        store = cls(values.shape[1], 2 * len(keys) + 1)
+        store.extend(keys, values)
+        return store
+
+    @classmethod
+    def from_dense(cls, table):
+        """
+        Builds a store from a dense table indexed by bucket id, keeping only the buckets that were ever updated.
+        """
+        keys = np.flatnonzero(np.any(table != 0, axis=1))
+        return cls.from_items(keys.astype(np.uint64), table[keys])
+
+    def to_dense(self, n_buckets):
+        """
+        Returns the store as a dense table of n_buckets rows indexed by bucket id, the layout of the trainer's CSVs.
+        """
+        keys, values = self.items()
+        table = np.zeros((n_buckets, self.width))
+        table[keys.astype(np.intp)] = values
+        return table
+
+def load(name):
+    """
+    Loads the store saved as name.npz, or builds one from the dense table in name.csv.
+    """
+    try:
+        return BucketStore.load(name + '.npz')
+    except FileNotFoundError:
+        return BucketStore.from_dense(np.genfromtxt(name + '.csv', delimiter=','))
@@ -0,0 +1,249 @@
+"""
+Generates the post-flop card abstraction by clustering equity distributions, and provides lookups into it.
+
+A single win probability cannot tell a made hand from a draw with the same equity, so instead every holding on every
+flop and turn is described by a histogram of its equity against a random hand on each card of the next street. The
+histograms are clustered with k-means on their cumulative form (the squared distance between cumulative histograms
+stands in for the earth mover's distance), and the clusters are numbered from weakest to strongest by average equity.
+
+Running this file rebuilds postflop_buckets.npz, which holds the cluster of every holding on every flop and turn up to
+a relabelling of suits. Looking up a cluster during a game is then a single index into the table. The river has no
+next street, so it is still bucketed by win probability.
+"""
+
+import argparse
+import itertools
+import multiprocessing
+import threading
+import time
+
+import numpy as np
+import equity_calc
+import preflop_table
+
+N_CLUSTERS = 20  # The same number of post-flop strength buckets as act_utils.strength_cutoffs gives
+N_BINS = 10  # The number of equity bins in each histogram
+STREETS = [3, 4]  # The streets that are clustered, by number of board cards
+
+SUIT_PERMUTATIONS = np.array([[4 * (card >> 2) + suits[card & 3] for card in range(52)]
+                              for suits in itertools.permutations(range(4))])
+
+def board_key(board):
+    """
+    Given a board as sorted card ids, returns an integer that identifies it.
+    """
+    return np.sort(board, axis=-1).astype(np.int64) @ 52 ** np.arange(board.shape[-1] - 1, -1, -1, dtype=np.int64)
+
+def canonicalize(board):
+    """
+    Given a board as card ids, returns the key of its canonical board and the relabelling of card ids that turns the
+    board into it.
+    """
+    keys = board_key(SUIT_PERMUTATIONS[:, board])
+    best = np.argmin(keys)
+    return keys[best], SUIT_PERMUTATIONS[best]
+
+def next_street_equities(evaluator, board):
+    """
+    Given a canonical flop or turn, returns the equity of every holding against a random hand on each card of the next
+    street (n_cards, 1326), nan where the card or the holding collides with the board.
+    """
+    deck = np.setdiff1d(np.arange(52), board)
+    left_comm = 5 - len(board)
+    runouts = np.array(list(itertools.combinations(deck, left_comm)), dtype=np.int32)
+    boards = np.concatenate((np.broadcast_to(board, (len(runouts), len(board))), runouts), axis=1)
+
+    counts = np.concatenate([evaluator.count_showdowns(evaluator.score_holdings(boards[start:start + 128]))
+                             for start in range(0, len(boards), 128)], axis=1)
+
+    # Each runout counts towards every next card it contains
+    contains = (runouts[:, :, None] == deck[None, None, :]).any(axis=1)
+    counts = np.tensordot(contains.T.astype(float), counts, axes=(1, 1))  # (n_cards, 3, 1326)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (counts[:, 0] + counts[:, 1] / 2) / counts[:, 2]
+
+def get_histograms(equities):
+    """
+    Converts next street equities (n_cards, 1326) into the number of next cards that fall in each equity bin for every
+    holding (1326, N_BINS).
+    """
+    valid = ~np.isnan(equities)
+    bins = np.minimum((np.nan_to_num(equities) * N_BINS).astype(int), N_BINS - 1)
+    histograms = np.zeros((equities.shape[1], N_BINS), dtype=np.uint8)
+
+    for i in range(N_BINS):
+        histograms[:, i] = np.sum((bins == i) & valid, axis=0)
+
+    return histograms
+
+def histogram_boards(boards):
+    """
+    Worker task. Returns the histograms of every holding on each board (n_boards, 1326, N_BINS).
+    """
+    evaluator = equity_calc.EvaluatorNumpy()
+    return np.array([get_histograms(next_street_equities(evaluator, board)) for board in boards])
+
+def _histogram_chunk(chunk):
+    return histogram_boards(chunk)
+
+def to_points(histograms):
+    """
+    Converts histograms of counts into cumulative distributions, which k-means compares by earth mover's distance.
+    """
+    histograms = histograms.astype(np.float32)
+    return np.cumsum(histograms, axis=-1) / np.maximum(histograms.sum(axis=-1, keepdims=True), 1)
+
+def assign(points, centers, chunk_size=100000):
+    """
+    Returns the index of the closest center to every point.
+    """
+    labels = np.empty(len(points), dtype=np.intp)
+
+    for start in range(0, len(points), chunk_size):
+        chunk = points[start:start + chunk_size]
+        distances = (chunk ** 2).sum(axis=1)[:, None] - 2 * chunk @ centers.T + (centers ** 2).sum(axis=1)[None, :]
+        labels[start:start + chunk_size] = np.argmin(distances, axis=1)
+
+    return labels
+
+def kmeans(points, weights, n_clusters=N_CLUSTERS, n_iters=50, seed=0):
+    """
+    Weighted k-means with k-means++ initialization. Returns the centers (n_clusters, N_BINS).
+    """
+    rng = np.random.default_rng(seed)
+    centers = points[[rng.choice(len(points), p=weights / weights.sum())]]
+
+    for _ in range(1, n_clusters):  # Pick each next center in proportion to its squared distance from the others
+        distances = np.min(((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2), axis=1) * weights
+        centers = np.vstack((centers, points[rng.choice(len(points), p=distances / distances.sum())]))
+
+    for _ in range(n_iters):
+        labels = assign(points, centers)
+        totals = np.bincount(labels, weights, minlength=n_clusters)
+        moved = np.array([np.bincount(labels, weights * points[:, i], minlength=n_clusters)
+                          for i in range(points.shape[1])]).T / np.maximum(totals, 1e-12)[:, None]
+        moved[totals == 0] = centers[totals == 0]
+
+        if np.allclose(moved, centers):
+            break
+        centers = moved
+
+    return centers
+
+def cluster(histograms, weights, sample_size=200000, seed=0):
+    """
+    Clusters the histograms of every holding on every board (n_boards, 1326, N_BINS), each board weighted by the
+    number of boards it stands for. Returns the cluster of each holding on each board (n_boards, 1326), numbered from
+    weakest to strongest, with holdings that collide with the board left in cluster 0.
+    """
+    histograms = histograms.reshape(-1, N_BINS)
+    weights = np.repeat(weights, len(equity_calc.HOLDINGS)).astype(float)
+    valid = np.flatnonzero(histograms.sum(axis=1) > 0)
+
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(valid, min(sample_size, len(valid)), replace=False)
+    centers = kmeans(to_points(histograms[sample]), weights[sample], seed=seed)
+
+    # Number the clusters by average equity, the area above their cumulative distribution
+    order = np.argsort(np.argsort(-centers.sum(axis=1)))
+    labels = np.zeros(len(histograms), dtype=np.uint8)
+
+    for start in range(0, len(valid), 1000000):
+        chunk = valid[start:start + 1000000]
+        labels[chunk] = order[assign(to_points(histograms[chunk]), centers)]
+
+    return labels.reshape(-1, len(equity_calc.HOLDINGS))
+
+def generate(street, n_workers=None, chunk_size=50, limit=None):
+    """
+    Builds the histograms for every canonical board of a street across a pool of workers and clusters them. Returns
+    the keys of the canonical boards and the cluster table (n_boards, 1326). If limit is set, only that many canonical
+    boards are used, which is only useful for testing.
+    """
+    boards, weights = preflop_table.canonical_boards(street)
+    if limit is not None:
+        boards, weights = boards[:limit], weights[:limit]
+
+    chunks = [boards[i:i + chunk_size] for i in range(0, len(boards), chunk_size)]
+    histograms = np.empty((len(boards), len(equity_calc.HOLDINGS), N_BINS), dtype=np.uint8)
+
+    with multiprocessing.Pool(n_workers) as pool:
+        for i, chunk_histograms in enumerate(pool.imap(_histogram_chunk, chunks)):
+            histograms[i * chunk_size:i * chunk_size + len(chunk_histograms)] = chunk_histograms
+            print(f"street {street}: {i + 1}/{len(chunks)} chunks done")
+
+    return board_key(boards), cluster(histograms, weights)
+
+def save(tables, path='postflop_buckets.npz'):
+    """
+    Writes the board keys and cluster table of each street, given as a dictionary from street to (keys, clusters).
+    """
+    arrays = {}
+    for street, (keys, clusters) in tables.items():
+        arrays[f'keys_{street}'] = keys
+        arrays[f'clusters_{street}'] = clusters
+
+    np.savez_compressed(path, **arrays)
+
+_load_lock = threading.Lock()
+_tables = None
+
+def load_tables(path='postflop_buckets.npz'):
+    """
+    Returns a dictionary from street to (dictionary from board key to row, cluster table), loading the tables the
+    first time they are needed. Streets without a table are left out, and so is everything if the file is missing.
+    """
+    global _tables
+
+    with _load_lock:  # Bots on other threads can ask at the same time, and must not load twice
+        if _tables is None:
+            _tables = {}
+            try:
+                with np.load(path) as data:
+                    for street in STREETS:
+                        if f'keys_{street}' in data:
+                            rows = {key: row for row, key in enumerate(data[f'keys_{street}'])}
+                            _tables[street] = (rows, data[f'clusters_{street}'])
+            except FileNotFoundError:
+                pass
+
+    return _tables
+
+def get_cluster(hand, board):
+    """
+    Given your hand and the board as card ids, returns the cluster of your hand, or None if there is no table for the
+    street.
+    """
+    tables = load_tables()
+    if len(board) not in tables:
+        return None
+
+    rows, clusters = tables[len(board)]
+    key, relabel = canonicalize(np.asarray(board))
+    return int(clusters[rows[key], equity_calc.HOLDING_INDEX[relabel[hand[0]], relabel[hand[1]]]])
+
+def get_clusters(board):
+    """
+    Given the board as card ids, returns the cluster of every holding in equity_calc.HOLDINGS (0 for holdings that use
+    a board card), or None if there is no table for the street.
+    """
+    tables = load_tables()
+    if len(board) not in tables:
+        return None
+
+    rows, clusters = tables[len(board)]
+    key, relabel = canonicalize(np.asarray(board))
+    return clusters[rows[key], equity_calc.HOLDING_INDEX[relabel[equity_calc.HOLDINGS[:, 0]],
+                                                         relabel[equity_calc.HOLDINGS[:, 1]]]]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python3 bucket_table.py')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes, defaults to all cores')
+    parser.add_argument('--streets', type=int, nargs='+', default=STREETS, help='Streets to cluster, by board cards')
+    parser.add_argument('--limit', type=int, default=None, help='Only use this many canonical boards (testing)')
+    args = parser.parse_args()
+
+    start = time.time()
+    save({street: generate(street, args.workers, limit=args.limit) for street in args.streets})
+    print(f"Done in {time.time() - start:.0f}s")
@@ -1,12 +1,16 @@
+# cython: language_level=3
 """
 The source code for the deuces_numpy hand evaluation library. This is compiled into C code using Cython to improve
-overall performance.
+overall performance. The batch sampling and evaluation kernels are typed and release the GIL, so simulations can run
+in several threads at once.
 """
 
+cimport cython
 import itertools
 import numpy as np
+import os
+from concurrent.futures import ThreadPoolExecutor
 from random import shuffle as rshuffle
-import scipy.special
 
 class Card:
     """
@@ -221,13 +225,17 @@ class Deck:
     """
     _FULL_DECK = []
 
-    def __init__(self):
+    def __init__(self, rng=None):
+        self.rng = rng  # numpy Generator to shuffle with, the random module if None
         self.shuffle()
 
     def shuffle(self):
         # and then shuffle
         self.cards = Deck.GetFullDeck()
-        rshuffle(self.cards)
+        if self.rng is None:
+            rshuffle(self.cards)
+        else:
+            self.rng.shuffle(self.cards)
 
     def draw(self, n=1):
         if n == 1:
@@ -253,6 +261,20 @@ class Deck:
 
         return list(Deck._FULL_DECK)
 
+# Maps the canonical card ids used by the skeleton (4 * rank + suit, see skeleton/cards.py) to their binary integers
+ID_TO_INT = np.array(Deck.GetFullDeck())
+
+# Every possible pair of hole cards as card ids (1326, 2), and the index of each pair in that list (-1 on the diagonal)
+HOLDINGS = np.array(list(itertools.combinations(range(52), 2)))
+HOLDING_INDEX = np.full((52, 52), -1)
+HOLDING_INDEX[HOLDINGS[:, 0], HOLDINGS[:, 1]] = np.arange(len(HOLDINGS))
+HOLDING_INDEX[HOLDINGS[:, 1], HOLDINGS[:, 0]] = np.arange(len(HOLDINGS))
+HOLDING_INTS = ID_TO_INT[HOLDINGS]  # Every holding as binary integers
+INT_TO_ID = {card: i for i, card in enumerate(ID_TO_INT)}
+INT_ORDER = np.argsort(ID_TO_INT)  # The card ids sorted by binary integer, to convert whole arrays at once
+
+# The indices of the 51 holdings that contain each card id (52, 51)
+HOLDINGS_WITH_CARD = np.array([np.flatnonzero((HOLDINGS == card).any(axis=1)) for card in range(52)])
 
 class LookupTable(object):
     """
@@ -296,6 +318,19 @@ class LookupTable(object):
         MAX_HIGH_CARD: 9
     }
 
+    # Maps each rank class to the hand type integers used by hand_type (0 = high card, ..., 8 = straight flush)
+    RANK_CLASS_TO_TYPE = {
+        1: 8,
+        2: 7,
+        3: 6,
+        4: 5,
+        5: 4,
+        6: 3,
+        7: 2,
+        8: 1,
+        9: 0
+    }
+
     RANK_CLASS_TO_STRING = {
         1: "Straight Flush",
         2: "Four of a Kind",
@@ -690,27 +725,172 @@ class Evaluator(object):
                 else:
                     print(f"Players {winners} tied for the win with a {hand_result}\n")
 
+def build_type_table():
+    """
+    Precomputes the hand type of every possible hand rank, so that classifying a score is a single array lookup.
+    Index 0 is unused since hand ranks start at 1.
+    """
+    maxes = sorted(LookupTable.MAX_TO_RANK_CLASS)
+    scores = np.arange(LookupTable.MAX_HIGH_CARD + 1)
+    rank_classes = np.array([LookupTable.MAX_TO_RANK_CLASS[m] for m in maxes])[np.searchsorted(maxes, scores)]
+    types = np.array([LookupTable.RANK_CLASS_TO_TYPE[c] for c in rank_classes])
+    return types
+
+# Score lookup tables for the compiled kernels. Flushes are indexed directly by their 13 bit rank pattern, and all other
+# hands by binary search over the sorted prime products of their ranks.
+def build_kernel_tables(table):
+    """
+    Flattens the dictionaries of a LookupTable into arrays that can be read without the GIL.
+    """
+    flush_scores = np.zeros(1 << 13, dtype=np.int32)
+    for rankbits in range(1 << 13):
+        prime = Card.prime_product_from_rankbits(rankbits)
+        if prime in table.flush_lookup and bin(rankbits).count('1') == 5:
+            flush_scores[rankbits] = table.flush_lookup[prime]
+
+    products = np.array(sorted(table.unsuited_lookup), dtype=np.int64)
+    product_scores = np.array([table.unsuited_lookup[prod] for prod in products], dtype=np.int32)
+    return flush_scores, products, product_scores
+
+FLUSH_SCORES, UNSUITED_PRODUCTS, UNSUITED_SCORES = build_kernel_tables(LookupTable())
+
+cdef int[::1] _flush_scores = FLUSH_SCORES
+cdef long long[::1] _unsuited_products = UNSUITED_PRODUCTS
+cdef int[::1] _unsuited_scores = UNSUITED_SCORES
+cdef int _max_score = LookupTable.MAX_HIGH_CARD
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline int _score_five(int c0, int c1, int c2, int c3, int c4) noexcept nogil:
+    """
+    Scores a five card hand, mapping it to a rank in the range [1, 7462].
+    """
+    cdef long long product
+    cdef Py_ssize_t low, high, mid
+
+    if c0 & c1 & c2 & c3 & c4 & 0xF000:
+        return _flush_scores[(c0 | c1 | c2 | c3 | c4) >> 16]
+
+    product = <long long>(c0 & 0xFF) * (c1 & 0xFF) * (c2 & 0xFF) * (c3 & 0xFF) * (c4 & 0xFF)
+    low = 0
+    high = _unsuited_products.shape[0] - 1
+    while low < high:
+        mid = (low + high) >> 1
+        if _unsuited_products[mid] < product:
+            low = mid + 1
+        else:
+            high = mid
+
+    return _unsuited_scores[low]
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _evaluate_batch(const int[:, ::1] hands, const Py_ssize_t[:, ::1] combos, int[::1] out) noexcept nogil:
+    """
+    Writes the best five card score of each hand, trying every five card combination listed in combos.
+    """
+    cdef Py_ssize_t i, j
+    cdef int score, best
+
+    for i in range(hands.shape[0]):
+        best = _max_score
+        for j in range(combos.shape[0]):
+            score = _score_five(hands[i, combos[j, 0]], hands[i, combos[j, 1]], hands[i, combos[j, 2]],
+                                hands[i, combos[j, 3]], hands[i, combos[j, 4]])
+            if score < best:
+                best = score
+        out[i] = best
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _sample_batch(const int[::1] deck, unsigned long long seed, int[:, ::1] out) noexcept nogil:
+    """
+    Deals out.shape[1] cards without replacement from deck for every row of out, using a partial Fisher-Yates shuffle
+    driven by a xorshift64* generator.
+    """
+    cdef Py_ssize_t i, j, k, n_deck = deck.shape[0]
+    cdef int tmp
+    cdef int buf[52]
+    cdef unsigned long long state = seed | 1
+
+    for k in range(n_deck):
+        buf[k] = deck[k]
+
+    for i in range(out.shape[0]):
+        for j in range(out.shape[1]):
+            state ^= state >> 12
+            state ^= state << 25
+            state ^= state >> 27
+            k = j + <Py_ssize_t>((((state * 2685821657736338717ULL) >> 32) * <unsigned long long>(n_deck - j)) >> 32)
+            tmp = buf[k]
+            buf[k] = buf[j]
+            buf[j] = tmp
+            out[i, j] = tmp
+
+def evaluate_batch(hands, combos):
+    """
+    Scores every hand (n, n_cards) against the given five card combinations without holding the GIL.
+    """
+    hands = np.ascontiguousarray(hands, dtype=np.int32)
+    combos = np.ascontiguousarray(combos, dtype=np.intp)
+    out = np.empty(len(hands), dtype=np.int32)
+    cdef const int[:, ::1] hands_view = hands
+    cdef const Py_ssize_t[:, ::1] combos_view = combos
+    cdef int[::1] out_view = out
+    with nogil:
+        _evaluate_batch(hands_view, combos_view, out_view)
+    return out
+
+def sample_batch(deck, n_sims, n_cards, seed):
+    """
+    Deals n_cards random cards from deck for each of n_sims simulations without holding the GIL.
+    """
+    deck = np.ascontiguousarray(deck, dtype=np.int32)
+    out = np.empty((n_sims, n_cards), dtype=np.int32)
+    cdef const int[::1] deck_view = deck
+    cdef int[:, ::1] out_view = out
+    cdef unsigned long long state = seed
+    with nogil:
+        _sample_batch(deck_view, state, out_view)
+    return out
+
+def to_ids(cards):
+    """
+    Converts an array of binary integers to card ids.
+    """
+    return INT_ORDER[np.searchsorted(ID_TO_INT[INT_ORDER], cards)]
+
 def comb_index(n, k):
-    count = scipy.special.comb(n, k, exact=True)
     combs_iter = itertools.combinations(range(n), k)
     combs_flat_iter = itertools.chain.from_iterable(combs_iter)
-    index = np.fromiter(combs_flat_iter, dtype=int, count=count*k)
+    index = np.fromiter(combs_flat_iter, dtype=int)
     return index.reshape(-1, k)
 
 class EvaluatorNumpy(Evaluator):
     combos_seven_index = comb_index(7, 5)
+    combos_index = {5: comb_index(5, 5), 6: comb_index(6, 5), 7: combos_seven_index}
+    type_table = build_type_table()
+
+    def __init__(self, rng=None):
+        Evaluator.__init__(self)
+        self.rng = rng  # numpy Generator that seeds the sampling kernels, the global numpy stream if None
 
     def simulate_hands(self, n_sims, n_cards=5, deck=Deck.GetFullDeck()):
-        deck = np.array(deck)
-        decks = np.tile(deck, n_sims).reshape(n_sims, -1)
-        for i in range(len(decks)):
-            np.random.shuffle(decks[i])
-        hands = decks[:, :n_cards]
-        return hands
+        return sample_batch(deck, n_sims, n_cards, self.new_seed())
 
-    def simulate_games(self, cards, n_players, n_sims):
+    def new_seed(self):
+        '''
+        returns: a random seed for one call of the sampling kernel
+        '''
+        if self.rng is None:
+            return np.random.randint(1, 2 ** 62)
+        return int(self.rng.integers(1, 2 ** 62))
+
+    def simulate_games(self, cards, n_players, n_sims, seed=None, opp_weights=None):
         '''
         cards: array of pocket and community cards
+        seed: seed for the sampling kernel, a fresh one is drawn if None
+        opp_weights: optional weights over HOLDINGS (1326,) to deal the opponent's pocket cards from, heads up only
         returns: array of hands (n_sims, n_players, 7)
         '''
         n_cards = len(cards)
@@ -722,12 +902,22 @@ class EvaluatorNumpy(Evaluator):
         deck = Deck.GetFullDeck()
         for card in cards:
             deck.remove(card)
-        deck = np.array(deck)
-        decks = np.tile(deck, n_sims).reshape(n_sims, -1)
-        for i in range(len(decks)):
-            np.random.shuffle(decks[i])
+        seed = self.new_seed() if seed is None else seed
+
+        if opp_weights is None:
+            decks = sample_batch(deck, n_sims, left_cards + 2 * (n_players - 1), seed)
 
-        games = np.empty(shape=(n_sims, n_players, 7), dtype=int)
+        else:
+            assert n_players == 2, "Opponent ranges are only supported heads up"
+            opp_cards = self.sample_holdings(opp_weights, cards, n_sims, seed)
+            draws = sample_batch(deck, n_sims, left_cards + 2, seed)
+
+            # Removing the opponent's cards from a uniformly shuffled deal leaves a uniform deal of the remaining cards
+            live = (draws != opp_cards[:, :1]) & (draws != opp_cards[:, 1:])
+            order = np.argsort(~live, axis=1, kind='stable')[:, :left_cards]
+            decks = np.concatenate((np.take_along_axis(draws, order, axis=1), opp_cards), axis=1)
+
+        games = np.empty(shape=(n_sims, n_players, 7), dtype=np.int32)
         games[:, 0, :n_cards] = cards
         games[:, 0, n_cards:] = decks[:, :left_cards]
 
@@ -743,6 +933,24 @@ class EvaluatorNumpy(Evaluator):
         # print(games, 'games')
         return games
 
+    def sample_holdings(self, weights, dead_cards, n_sims, seed=None):
+        '''
+        weights: weights over HOLDINGS (1326,)
+        dead_cards: array of known cards that cannot be dealt
+        returns: array of n_sims pocket cards (n_sims, 2) drawn in proportion to weights
+        '''
+        dead = HOLDINGS_WITH_CARD[[INT_TO_ID[card] for card in dead_cards]]
+        weights = np.array(weights, dtype=float)
+        weights[dead] = 0
+        if not weights.any():  # Nothing left in the range, fall back to a random hand
+            weights[:] = 1
+            weights[dead] = 0
+
+        seed = self.new_seed() if seed is None else seed
+        cumulative = np.cumsum(weights)
+        draws = np.random.default_rng(seed).random(n_sims) * cumulative[-1]
+        return HOLDING_INTS[np.searchsorted(cumulative, draws, side='right')].astype(np.int32)
+
     def calc_primes_products(self, hands):
         return np.prod(hands & 0xFF, axis=-1)
 
@@ -766,26 +974,283 @@ class EvaluatorNumpy(Evaluator):
         return scores
 
     def evaluate(self, hands):
-        combos = hands[:, self.combos_seven_index]
-        scores = self.evaluate_hands5(combos.reshape(-1, combos.shape[-1]))
-        scores = scores.reshape(len(combos), -1).min(axis=1)
-        return scores
+        '''
+        hands: array of 5, 6 or 7 card hands (n, n_cards)
+        returns: array of the best five card score of each hand (n,)
+        '''
+        return evaluate_batch(hands, self.combos_index[hands.shape[-1]])
 
-    def analyze_hand(self, hand, n_players, n_sims):
+    def get_types(self, scores):
+        '''
+        scores: array of hand scores returned by evaluate
+        returns: array of hand types (0 = high card, ..., 8 = straight flush)
+        '''
+        return self.type_table[scores]
+
+    def classify(self, hands, boards):
+        '''
+        hands: array of pocket cards (n, 2)
+        boards: array of community cards (n, 3 to 5)
+        returns: array of hand types (n,). When a full board already makes the best hand on its own, the type of
+        just the pocket cards (pair or high card) is returned instead.
+        '''
+        hands = np.asarray(hands)
+        boards = np.asarray(boards)
+        full_scores = self.evaluate(np.concatenate((hands, boards), axis=1))
+        types = self.get_types(full_scores)
+
+        if boards.shape[1] == 5:  # Only a full board can make a five card hand without the pocket cards
+            board_scores = self.evaluate(boards)
+            played_board = full_scores == board_scores  # The pocket cards do not improve the board
+            pocket_pair = ((hands[:, 0] >> 8) & 0xF) == ((hands[:, 1] >> 8) & 0xF)
+            types = np.where(played_board, pocket_pair.astype(types.dtype), types)
+
+        return types
+
+    def analyze_hand(self, hand, n_players, n_sims, opp_weights=None):
         '''
         hand: array of known cards
+        opp_weights: optional weights over HOLDINGS (1326,) for the opponent's pocket cards, heads up only
         returns: array [win_odds, tie_odds_2pls, ...]
         '''
-        games = self.simulate_games(hand, n_players, n_sims)
+        return self.count_wins(hand, n_players, n_sims, opp_weights=opp_weights) / n_sims
+
+    def count_wins(self, hand, n_players, n_sims, seed=None, opp_weights=None):
+        '''
+        hand: array of known cards
+        seed: seed for the sampling kernel, a fresh one is drawn if None
+        opp_weights: optional weights over HOLDINGS (1326,) for the opponent's pocket cards, heads up only
+        returns: array [wins, ties_2pls, ...] counted over n_sims simulations
+        '''
+        games = self.simulate_games(hand, n_players, n_sims, seed, opp_weights)
         scores = self.evaluate(games.reshape(-1, 7)).reshape(n_sims, n_players)
         winners_scores = scores.min(axis=1)
         winners = np.empty_like(scores, dtype=bool)
         for i in range(n_players):
             winners[:, i] = scores[:, i] == winners_scores
         winners_number = winners.sum(axis=1)
-        win_ties_odds = np.empty(shape=n_players, dtype=float)
+        win_ties_counts = np.empty(shape=n_players, dtype=np.int64)
         for i in range(1, n_players+1):
             is_one_of_i_winners = winners[:, 0] & (winners_number == i)
-            win_ties_odds[i-1] = is_one_of_i_winners.sum() / n_sims
+            win_ties_counts[i-1] = is_one_of_i_winners.sum()
+
+        return win_ties_counts
+
+    def sweep_board(self, board, n_runouts=None, seed=None, chunk_size=128):
+        '''
+        Computes the odds of every holding against a random hand on a board in a single pass. Each runout is scored
+        once for all holdings, and the wins and ties of each holding are counted by sorting the scores, then removing
+        the opponent holdings that share a card with it.
+        board: array of 3 to 5 community cards
+        n_runouts: number of random runouts to sample, or None to enumerate every runout
+        returns: (odds, scores) where odds is an array (1326, 2) of [win_odds, tie_odds] for every holding in HOLDINGS
+        (nan for holdings that use a board card) and scores is an array (n_runouts, 1326) of every holding's score on
+        each runout (0 for holdings that use a card of the runout)
+        '''
+        board_ids = [INT_TO_ID[card] for card in board]
+        deck = np.setdiff1d(np.arange(52), board_ids)
+        left_comm = 5 - len(board_ids)
+
+        if n_runouts is None:
+            runouts = list(itertools.combinations(deck, left_comm))
+            runouts = np.array(runouts, dtype=np.int32).reshape(len(runouts), left_comm)
+        else:
+            seed = self.new_seed() if seed is None else seed
+            runouts = sample_batch(deck, n_runouts, left_comm, seed)
+
+        counts = np.zeros((3, len(HOLDINGS)))  # Wins, ties and opponent holdings faced by each holding
+        scores = np.empty((len(runouts), len(HOLDINGS)), dtype=np.int32)
+
+        for start in range(0, len(runouts), chunk_size):
+            chunk = runouts[start:start + chunk_size]
+            boards = np.concatenate((np.broadcast_to(board_ids, (len(chunk), len(board_ids))), chunk), axis=1)
+            scores[start:start + chunk_size] = self.score_holdings(boards)
+            counts += self.count_showdowns(scores[start:start + chunk_size]).sum(axis=1)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            odds = (counts[:2] / counts[2]).T
+        odds[HOLDINGS_WITH_CARD[board_ids]] = np.nan
+        return odds, scores
 
-        return win_ties_odds
\ No newline at end of file
+    def score_holdings(self, boards):
+        '''
+        boards: array of full boards as card ids (n, 5)
+        returns: array (n, 1326) of the score of every holding on every board, 0 where the holding uses a board card
+        '''
+        hands = np.empty((len(boards), len(HOLDINGS), 7), dtype=np.int32)
+        hands[:, :, :2] = HOLDING_INTS
+        hands[:, :, 2:] = ID_TO_INT[boards][:, None, :]
+        scores = self.evaluate(hands.reshape(-1, 7)).reshape(len(boards), len(HOLDINGS))
+
+        rows = np.arange(len(boards))[:, None]
+        for card in boards.T:
+            scores[rows, HOLDINGS_WITH_CARD[card]] = 0
+        return scores
+
+    def count_showdowns(self, scores):
+        '''
+        scores: array (n, 1326) of holding scores on n boards, as returned by score_holdings
+        returns: array (3, n, 1326) of the number of opponent holdings that each holding beats, ties and faces on each
+        board
+        '''
+        n_boards, n_holdings = scores.shape
+        span = LookupTable.MAX_HIGH_CARD + 1  # Offsets keep the scores of each board (and card) in their own range
+        live = scores > 0
+
+        # Counts over all holdings on each board. Dead holdings score 0, so they never count as worse or tied.
+        keys = scores + (np.arange(n_boards) * span)[:, None]
+        ordered = np.sort(keys, axis=None)
+        first = np.searchsorted(ordered, keys, side='left') - (np.arange(n_boards) * n_holdings)[:, None]
+        last = np.searchsorted(ordered, keys, side='right') - (np.arange(n_boards) * n_holdings)[:, None]
+        worse = n_holdings - last
+        equal = last - first
+        faced = np.repeat(live.sum(axis=1)[:, None], n_holdings, axis=1)
+
+        # Remove the holdings that share either card, which the holding can never face
+        card_scores = scores[:, HOLDINGS_WITH_CARD]  # (n_boards, 52, 51)
+        n_with_card = card_scores.shape[2]
+        rows = (np.arange(n_boards)[:, None] * 52 + np.arange(52)[None, :])
+        card_ordered = np.sort(card_scores + (rows * span)[:, :, None], axis=None)
+        card_live = (card_scores > 0).sum(axis=2)
+
+        for cards in HOLDINGS.T:
+            card_rows = rows[:, cards]
+            card_keys = scores + card_rows * span
+            card_first = np.searchsorted(card_ordered, card_keys, side='left') - card_rows * n_with_card
+            card_last = np.searchsorted(card_ordered, card_keys, side='right') - card_rows * n_with_card
+            worse -= n_with_card - card_last
+            equal -= card_last - card_first
+            faced -= card_live[:, cards]
+
+        # A holding was removed from its own ties and faced holdings once for each of its cards, so add it back
+        return np.stack((worse, equal + 1, faced + 1)) * live
+
+    def versus(self, scores, first, second):
+        '''
+        scores: array (n, 1326) of holding scores, as returned by sweep_board
+        first, second: arrays of indices into HOLDINGS
+        returns: array (len(first), len(second)) of the equity of each first holding against each second holding, nan
+        where they share a card or never meet on a live board
+        '''
+        first_scores = scores[:, first][:, :, None]
+        second_scores = scores[:, second][:, None, :]
+        both_live = (first_scores > 0) & (second_scores > 0)
+        wins = ((first_scores < second_scores) & both_live).sum(axis=0)
+        ties = ((first_scores == second_scores) & both_live).sum(axis=0)
+        disjoint = (HOLDINGS[first][:, None, :, None] != HOLDINGS[second][None, :, None, :]).all(axis=(2, 3))
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(disjoint, (wins + ties / 2) / both_live.sum(axis=0), np.nan)
+
+    def analyze_hand_parallel(self, hand, n_players, n_sims, n_workers=None, chunk_size=50000, seed=None):
+        '''
+        Parallel form of analyze_hand for very large n_sims. The simulations are split into chunks of at most
+        chunk_size, each with an independent random stream spawned from seed, and run on a pool of n_workers threads
+        (the sampling and evaluation kernels release the GIL). Only the chunks in flight are held in memory.
+        hand: array of known cards
+        returns: array [win_odds, tie_odds_2pls, ...]
+        '''
+        n_workers = n_workers or os.cpu_count() or 1
+        sizes = [chunk_size] * (n_sims // chunk_size)
+        if n_sims % chunk_size:
+            sizes.append(n_sims % chunk_size)
+
+        streams = np.random.SeedSequence(seed).spawn(len(sizes))
+        seeds = [int(stream.generate_state(1, dtype=np.uint64)[0]) for stream in streams]
+
+        counts = np.zeros(n_players, dtype=np.int64)
+        with ThreadPoolExecutor(n_workers) as pool:
+            chunks = [pool.submit(self.count_wins, hand, n_players, size, chunk_seed)
+                      for size, chunk_seed in zip(sizes[:n_workers], seeds[:n_workers])]
+            for size, chunk_seed in zip(sizes[n_workers:], seeds[n_workers:]):  # Keep at most n_workers chunks queued
+                counts += chunks.pop(0).result()
+                chunks.append(pool.submit(self.count_wins, hand, n_players, size, chunk_seed))
+            for chunk in chunks:
+                counts += chunk.result()
+
+        return counts / n_sims
+
+
+class EquitySession(object):
+    '''
+    Keeps the heads up simulations of a single hand so that they can be reused as the hand goes on. When a new card is
+    revealed, the simulations whose runout contains it are kept with that card moved to the board (the rest of their
+    runout is still a uniform deal of the remaining cards), and when the opponent's range changes the simulations are
+    importance weighted by the new range. Only the shortfall in effective simulations is then simulated.
+    '''
+
+    def __init__(self, evaluator):
+        self.evaluator = evaluator
+        self.reset()
+
+    def reset(self):
+        '''
+        Forgets all simulations, to be called at the start of every hand.
+        '''
+        self.hand = []
+        self.board = []
+        self.runouts = np.empty((0, 5), dtype=np.int32)  # The community cards dealt in each simulation
+        self.holdings = np.empty(0, dtype=np.intp)  # The opponent's holding in each simulation, as an index into HOLDINGS
+        self.proposals = np.empty(0)  # The probability each simulation's opponent holding was drawn with
+        self.outcomes = np.empty((0, 2))  # [win, tie] for each simulation
+        self.n_simulated = 0  # The number of simulations run since the last reset
+
+    def update(self, hand, board, n_sims, opp_weights=None):
+        '''
+        hand: array of pocket cards
+        board: array of community cards, which may extend the board of the previous update
+        n_sims: number of effective simulations to estimate the odds with
+        opp_weights: optional weights over HOLDINGS (1326,) for the opponent's pocket cards
+        returns: array [win_odds, tie_odds]
+        '''
+        hand, board = list(hand), list(board)
+        if hand != self.hand or board[:len(self.board)] != self.board:
+            self.reset()
+            self.hand = hand
+
+        new_cards = board[len(self.board):]
+        if new_cards:
+            revealed = np.isin(self.runouts, new_cards)
+            kept = revealed.sum(axis=1) == len(new_cards)
+            self.runouts = self.runouts[kept][~revealed[kept]].reshape(kept.sum(), 5 - len(board))
+            self.holdings = self.holdings[kept]
+            self.proposals = self.proposals[kept]
+            self.outcomes = self.outcomes[kept]
+            self.board = board
+
+        dead = HOLDINGS_WITH_CARD[to_ids(hand + board)]
+        targets = np.ones(len(HOLDINGS)) if opp_weights is None else np.array(opp_weights, dtype=float)
+        targets[dead] = 0
+        if not targets.any():  # Nothing left in the range, fall back to a random hand
+            targets[:] = 1
+            targets[dead] = 0
+        targets /= targets.sum()
+
+        weights = targets[self.holdings] / self.proposals
+        n_effective = weights.sum() ** 2 / (weights ** 2).sum() if weights.any() else 0
+        n_new = n_sims - int(n_effective)
+
+        if n_new > 0:
+            if weights.any():
+                weights *= n_effective / weights.sum()  # The old simulations count as n_effective new ones
+            self.simulate(n_new, targets)
+            weights = np.concatenate((weights, np.ones(n_new)))
+
+        return weights @ self.outcomes / weights.sum()
+
+    def simulate(self, n_sims, targets):
+        '''
+        Runs n_sims new simulations with the opponent's holding drawn from targets and adds them to the session.
+        '''
+        cards = self.hand + self.board
+        games = self.evaluator.simulate_games(cards, 2, n_sims, opp_weights=targets)
+        scores = self.evaluator.evaluate(games.reshape(-1, 7)).reshape(n_sims, 2)
+
+        holdings = HOLDING_INDEX[to_ids(games[:, 1, 0]), to_ids(games[:, 1, 1])]
+        outcomes = np.stack((scores[:, 0] < scores[:, 1], scores[:, 0] == scores[:, 1]), axis=1)
+
+        self.runouts = np.concatenate((self.runouts.reshape(len(self.runouts), 7 - len(cards)), games[:, 0, len(cards):]))
+        self.holdings = np.concatenate((self.holdings, holdings))
+        self.proposals = np.concatenate((self.proposals, targets[holdings]))
+        self.outcomes = np.concatenate((self.outcomes, outcomes))
+        self.n_simulated += n_sims
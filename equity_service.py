@@ -0,0 +1,312 @@
+"""
+A local service that computes post-flop equities for every bot process on a machine, with an in-process fallback.
+
+The unit of work is a board: the score of every holding on each of its runouts (every river of a turn, n_flop_runouts
+sampled runouts of a flop, or just the board on the river). From those scores, the equity of any hand against any
+weighted range takes a few vector operations, so one computation serves every hand, range and bot that meets the
+board. Boards are reduced to their suit-isomorphic canonical form first (see bucket_table.canonicalize), so the scores
+are computed and cached once per canonical board, and relabelled to the real suits by the caller.
+
+Running this file starts the service on a Unix socket. It gathers the boards requested by all connected bots for a
+short window, computes every board missing from its cache in one pass of EvaluatorNumpy.score_holdings, and answers
+each request with the canonical scores. The lookup table and the cache then live in the service only, instead of once
+per bot. Scoring a new board takes tens of milliseconds, far more than a decision can spend, so bots never wait for it:
+Equity asks for a board in the background and returns nothing until its scores arrive, and the bot falls back on its
+own Monte Carlo estimate meanwhile (and for good, if the service cannot be reached or goes away).
+
+Usage: python3 equity_service.py --socket /tmp/pokerbots_equity.sock
+"""
+
+import argparse
+import asyncio
+import os
+import queue
+import socket
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import bucket_table
+import equity_calc
+
+from equity_calc import HOLDINGS, HOLDING_INDEX, HOLDINGS_WITH_CARD
+
+DEFAULT_SOCKET = '/tmp/pokerbots_equity.sock'
+REQUEST_SIZE = 6  # The number of board cards, then the canonical board as 5 card ids padded with -1
+RESPONSE_HEADER = 4  # The number of runouts as a little endian uint32, then the scores as (n_runouts, 1326) uint16
+
+def canonical_board(board):
+    """
+    Given a board as card ids, returns its canonical board (sorted card ids) and the canonical id of each holding.
+    """
+    _, relabel = bucket_table.canonicalize(np.asarray(board))
+    return np.sort(relabel[board]), HOLDING_INDEX[relabel[HOLDINGS[:, 0]], relabel[HOLDINGS[:, 1]]]
+
+def hand_equity(scores, hand, weights=None):
+    """
+    Given the scores of every holding on each runout of a board, returns the [win, tie] odds of hand (two card ids)
+    against an opponent holding drawn from weights (uniform if None), over the runouts that do not deal our cards.
+    """
+    ours = scores[:, HOLDING_INDEX[hand[0], hand[1]]]
+    possible = ours > 0
+    scores, ours = scores[possible], ours[possible, None]
+
+    live = scores > 0  # The opponent cannot hold a board card, a runout card, or one of ours
+    live[:, HOLDINGS_WITH_CARD[hand].ravel()] = False
+    faced = live if weights is None else live * weights
+    total = faced.sum()
+    if total == 0:  # No holding of the range is left, so play against any holding
+        return hand_equity(scores, hand)
+
+    return np.array([(faced * (scores > ours)).sum(), (faced * (scores == ours)).sum()]) / total  # Lower scores win
+
+class ScoreTable:
+    """
+    Computes and caches the runout scores of canonical boards, keeping the most recently used up to max_bytes.
+    """
+
+    def __init__(self, evaluator=None, n_flop_runouts=48, max_bytes=32 << 20, chunk_size=1024):
+        self.evaluator = evaluator or equity_calc.EvaluatorNumpy()
+        self.n_flop_runouts = n_flop_runouts
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size  # Full boards scored at a time, which bounds the memory of score_holdings
+        self.cache = OrderedDict()
+        self.n_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def runouts(self, board):
+        """
+        Returns the full boards (n_runouts, 5) that a canonical board is scored on.
+        """
+        deck = np.setdiff1d(np.arange(52), board)
+        if len(board) == 5:
+            runouts = np.zeros((1, 0), dtype=int)
+        elif len(board) == 4:
+            runouts = deck[:, None]
+        else:  # Flop runouts are sampled, seeded by the board so that every process draws the same ones
+            rng = np.random.default_rng(bucket_table.board_key(board))
+            runouts = deck[np.argsort(rng.random((self.n_flop_runouts, len(deck))), axis=1)[:, :2]]
+
+        return np.concatenate((np.broadcast_to(board, (len(runouts), len(board))), runouts), axis=1)
+
+    def get(self, key):
+        scores = self.cache.get(key)
+        if scores is not None:
+            self.cache.move_to_end(key)
+        return scores
+
+    def put(self, key, scores):
+        self.cache[key] = scores
+        self.n_bytes += scores.nbytes
+        while self.n_bytes > self.max_bytes and len(self.cache) > 1:
+            _, evicted = self.cache.popitem(last=False)
+            self.n_bytes -= evicted.nbytes
+
+    def scores(self, boards):
+        """
+        Given a list of canonical boards, returns the scores (n_runouts, 1326) of every holding on each runout of each
+        one. Every board missing from the cache is scored in the same pass over full boards.
+        """
+        keys = [tuple(int(card) for card in board) for board in boards]
+        results = [self.get(key) for key in keys]
+        missing = list(OrderedDict.fromkeys(key for key, result in zip(keys, results) if result is None))
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            full_boards = [self.runouts(np.array(key)) for key in missing]
+            ends = np.cumsum([len(runouts) for runouts in full_boards])
+            full_boards = np.concatenate(full_boards)
+            scores = np.concatenate([self.evaluator.score_holdings(full_boards[start:start + self.chunk_size])
+                                     for start in range(0, len(full_boards), self.chunk_size)]).astype(np.uint16)
+            for key, board_scores in zip(missing, np.split(scores, ends[:-1])):
+                self.put(key, board_scores)
+
+        return [self.get(key) for key in keys]
+
+class EquityServer:
+    """
+    Serves canonical board scores from a ScoreTable over a Unix socket, batching the requests of every client.
+    """
+
+    def __init__(self, table, window=.002, max_batch=64):
+        self.table = table
+        self.window = window  # How long to wait for more requests once one arrives, in seconds
+        self.max_batch = max_batch
+        self.pending = {}  # Futures of the boards requested but not yet scored, by board
+        self.queue = None
+        self.n_batches = 0
+        self.n_requests = 0
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request = np.frombuffer(await reader.readexactly(REQUEST_SIZE), dtype=np.int8)
+                scores = await self.request(tuple(int(card) for card in request[1:1 + request[0]]))
+                writer.write(np.array([len(scores)], dtype='<u4').tobytes() + scores.astype('<u2').tobytes())
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def request(self, board):
+        self.n_requests += 1
+        scores = self.table.get(board)
+        if scores is not None:
+            self.table.hits += 1
+            return scores
+
+        if board not in self.pending:  # Boards already queued by another client are scored once for both
+            self.pending[board] = asyncio.get_running_loop().create_future()
+            await self.queue.put(board)
+        return await asyncio.shield(self.pending[board])
+
+    async def batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            boards = [await self.queue.get()]
+            await asyncio.sleep(self.window)
+            while not self.queue.empty() and len(boards) < self.max_batch:
+                boards.append(self.queue.get_nowait())
+
+            try:
+                results = await loop.run_in_executor(None, self.table.scores, [np.array(board) for board in boards])
+            except Exception as error:  # Fail the waiting requests rather than the service
+                results = [error] * len(boards)
+            self.n_batches += 1
+
+            for board, result in zip(boards, results):
+                future = self.pending.pop(board)
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    async def serve(self, path):
+        if os.path.exists(path):
+            os.remove(path)
+        self.queue = asyncio.Queue()
+        server = await asyncio.start_unix_server(self.handle, path)
+        batcher = asyncio.ensure_future(self.batch_loop())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            os.remove(path)
+
+class EquityClient:
+    """
+    A connection to an EquityServer, with the same scores method as ScoreTable.
+    """
+
+    def __init__(self, path=DEFAULT_SOCKET, timeout=5.):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.settimeout(timeout)
+        self.socket.connect(path)
+
+    def receive(self, n_bytes):
+        data = bytearray(n_bytes)
+        view = memoryview(data)
+        while view:
+            received = self.socket.recv_into(view)
+            if received == 0:
+                raise ConnectionError('The equity service closed the connection')
+            view = view[received:]
+        return data
+
+    def scores(self, boards):
+        # Requests are pipelined: all boards are sent before the first answer is read
+        requests = np.full((len(boards), REQUEST_SIZE), -1, dtype=np.int8)
+        for row, board in zip(requests, boards):
+            row[0] = len(board)
+            row[1:1 + len(board)] = board
+        self.socket.sendall(requests.tobytes())
+
+        results = []
+        for _ in boards:
+            n_runouts = int(np.frombuffer(self.receive(RESPONSE_HEADER), dtype='<u4')[0])
+            data = self.receive(2 * n_runouts * len(HOLDINGS))
+            results.append(np.frombuffer(data, dtype='<u2').reshape(n_runouts, len(HOLDINGS)))
+        return results
+
+    def close(self):
+        self.socket.close()
+
+class Equity:
+    """
+    Looks up the equity of hands against weighted ranges in board scores fetched from the service at path. Boards are
+    fetched by a background thread: strength returns None for a board whose scores have not arrived yet, after asking
+    for them, so a decision never waits on the service and the caller estimates that equity itself. Later decisions on
+    the same street then read the scores. Raises an OSError if the service cannot be reached.
+    """
+
+    def __init__(self, path=DEFAULT_SOCKET, max_boards=64):
+        self.client = EquityClient(path)
+        self.max_boards = max_boards
+        self.boards = OrderedDict()  # The scores received for the most recent canonical boards
+        self.requested = set()  # Boards asked for and not received yet
+        self.connected = True
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.fetch_loop, daemon=True)
+        self.thread.start()
+
+    def fetch_loop(self):
+        while True:
+            boards = [self.queue.get()]
+            while not self.queue.empty():  # Ask for every waiting board at once
+                boards.append(self.queue.get_nowait())
+
+            try:
+                results = self.client.scores(boards)
+            except OSError:  # The service went away, so stop asking and let the caller estimate every equity
+                self.connected = False
+                self.client.close()
+                return
+
+            with self.lock:
+                for board, scores in zip(boards, results):
+                    self.boards[board] = scores
+                    self.requested.discard(board)
+                while len(self.boards) > self.max_boards:
+                    self.boards.popitem(last=False)
+
+    def strength(self, hand, board, weights=None):
+        """
+        Returns the [win, tie] odds of hand against an opponent holding drawn from weights on a flop, turn or river, or
+        None if the board's scores are not available yet.
+        """
+        canonical, holdings = canonical_board(board)
+        key = tuple(int(card) for card in canonical)
+        with self.lock:
+            scores = self.boards.get(key)
+            if scores is None:
+                if self.connected and key not in self.requested:
+                    self.requested.add(key)
+                    self.queue.put(key)
+                return None
+
+        return hand_equity(scores[:, holdings], hand, weights)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python3 equity_service.py')
+    parser.add_argument('--socket', type=str, default=DEFAULT_SOCKET, help='Path of the Unix socket to listen on')
+    parser.add_argument('--window-ms', type=float, default=2, help='Time spent gathering requests into a batch')
+    parser.add_argument('--max-batch', type=int, default=64, help='Most boards scored in one batch')
+    parser.add_argument('--flop-runouts', type=int, default=48, help='Runouts sampled for each flop')
+    parser.add_argument('--cache-mb', type=int, default=1024, help='Memory for cached board scores, in MB')
+    args = parser.parse_args()
+
+    start = time.time()
+    table = ScoreTable(n_flop_runouts=args.flop_runouts, max_bytes=args.cache_mb << 20)
+    server = EquityServer(table, args.window_ms / 1000, args.max_batch)
+    print(f"Loaded the evaluator in {time.time() - start:.1f}s, serving on {args.socket}")
+    try:
+        asyncio.run(server.serve(args.socket))
+    except KeyboardInterrupt:
+        print(f"Served {server.n_requests} requests in {server.n_batches} batches, "
+              f"{table.hits} cache hits and {table.misses} boards scored")
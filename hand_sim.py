@@ -6,17 +6,18 @@ This utilizes the deuces library, which was compiled locally in C.
 
 import equity_calc
 
-def get_deck():
+def get_deck(rng=None):
     """
-    Creates an instance of a deck.
+    Creates an instance of a deck, shuffled with the numpy Generator rng if one is given.
     """
-    return equity_calc.Deck()
+    return equity_calc.Deck(rng)
 
-def get_evaluator():
+def get_evaluator(rng=None):
     """
-    Creates an instance of the EvaluatorNumpy class which can evaluate hands.
+    Creates an instance of the EvaluatorNumpy class which can evaluate hands, seeding its simulations from the numpy
+    Generator rng if one is given.
     """
-    return equity_calc.EvaluatorNumpy()
+    return equity_calc.EvaluatorNumpy(rng)
 
 def card_to_str(card):
     """
@@ -30,10 +31,21 @@ def str_to_card(card):
     """
     return equity_calc.Card.new(card)
 
-def get_strength(hand, board, evaluator, iters=100):
+def get_session(evaluator):
     """
-    Runs a monte carlo simulation for iters iterations to approximate the hand strength at any point in the game.
+    Creates an EquitySession, which keeps the simulations of a hand so they can be reused on later streets.
     """
+    return equity_calc.EquitySession(evaluator)
+
+def get_strength(hand, board, evaluator, iters=100, opp_weights=None, session=None):
+    """
+    Runs a monte carlo simulation for iters iterations to approximate the hand strength at any point in the game. If
+    opp_weights (a weight for each of the 1326 possible opponent hands) is given, the opponent's hand is drawn from it.
+    If a session is given, the simulations from earlier in the hand are reused and only the shortfall is simulated.
+    """
+    if session is not None:
+        return session.update(hand, board, iters, opp_weights=opp_weights)
+
     cards = hand + board # Convert all cards to binary integers and put them in a single list
-    win_tie_prob = evaluator.analyze_hand(cards, n_players=2, n_sims=iters)
+    win_tie_prob = evaluator.analyze_hand(cards, n_players=2, n_sims=iters, opp_weights=opp_weights)
     return win_tie_prob # The first index is the probability of winning with that hand, the second is tying
\ No newline at end of file
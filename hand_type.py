@@ -1,9 +1,11 @@
 """
 A utility to determine what type of hand you have at any stage of the game (i.e. high card, full house, etc). It assumes
-a standard deck permutation.
+a standard deck permutation. Classification runs on the equity_calc card representation, so a hand type is a lookup
+into a precomputed table of hand scores.
 """
 
-import eval7 as eval
+import equity_calc
+import numpy as np
 
 # All cards in a standard 52 card deck
 cards = ["2c", "2d", "2h", "2s", "3c", "3d", "3h", "3s", "4c", "4d", "4h", "4s", "5c", "5d", "5h", "5s", "6c", "6d",
@@ -34,31 +36,23 @@ def get_street(board):
     """
     return len(board)
 
+# Shared evaluator holding the score lookup tables and the score to hand type table
+evaluator = equity_calc.EvaluatorNumpy()
+
 def get_type(hand, board):
     """
-    Given your hand and board cards, both represented as a list of strings, return what type of hand it is. All possible
+    Given your hand and board cards, both represented as a list of card ids, return what type of hand it is. All possible
     hand types, in order of increasing strength, are: High card, pair, two pair, three of a kind, straight, flush, full
     house, four of a kind, straight flush, royal flush.
     """
-    formatted_hand = [eval.Card(card) for card in hand]
-    formatted_board = [eval.Card(card) for card in board]
-
-    board_score = eval.evaluate(formatted_board) # The hand strength of just the board cards
-    full_score = eval.evaluate(formatted_hand + formatted_board) # The hand strength of the hand and board cards together
-
-    board_eval = eval.hand_type(board_score) # The hand type of just the board cards
-    full_eval = eval.hand_type(full_score) # The hand type of the hand and board cards together
-
-    if board_eval == full_eval: # If the best five card hand is potentially being made without any cards from your hand
-        if full_score > board_score: # The best hand includes your hole cards
-            return hand_map[full_eval]
+    formatted_hand = equity_calc.ID_TO_INT[hand]
+    formatted_board = equity_calc.ID_TO_INT[board]
 
-        else: # Return the hand type of just your hole cards
-            hand_ranks = [card[0] for card in hand]
+    return int(get_types(formatted_hand[np.newaxis], formatted_board[np.newaxis])[0])
 
-            if len(set(hand_ranks)) == 1:  # Both cards have the same rank
-                return hand_map["Pair"]
-
-            return hand_map["High Card"]
-
-    return hand_map[full_eval]
\ No newline at end of file
+def get_types(hands, boards):
+    """
+    Batched form of get_type. Takes in an array of hands (n, 2) and an array of boards (n, 3 to 5), both as equity_calc
+    card integers, and returns an array of n hand types.
+    """
+    return evaluator.classify(hands, boards)
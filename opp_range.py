@@ -0,0 +1,197 @@
+"""
+A Bayesian model of the opponent's hole cards over the course of a single round. The model keeps a weight for each of
+the 1326 possible holdings in equity_calc.HOLDINGS and multiplies in the likelihood of every action the opponent takes,
+so that the range narrows as the opponent bets, calls and checks.
+
+Likelihoods are a function of how strong each holding is on the current street relative to the other live holdings,
+and are pre-computed into one table per street so that each update is a single in-place multiplication. Holdings are
+indexed by the cards they play as under the predicted permutation, so the weights can be passed straight to the
+equity calculator.
+"""
+
+import numpy as np
+import equity_calc
+import preflop_table
+
+from skeleton.states import RoundState, TerminalState, STARTING_STACK
+
+# The kinds of actions the opponent can take, as rows of the likelihood table
+CHECK = 0
+CALL = 1
+RAISE_SMALL = 2  # Up to half the pot
+RAISE_MEDIUM = 3  # Up to the size of the pot
+RAISE_LARGE = 4  # Up to twice the pot
+RAISE_HUGE = 5  # More than twice the pot
+FOLD = 6
+
+raise_cutoffs = np.array([.5, 1, 2])  # Raise sizes, as a fraction of the pot, that separate the raise kinds
+
+# For each kind of action, the strength percentile (0 is the weakest live holding, 1 the strongest) around which the
+# opponent starts to prefer it, and whether stronger holdings take it more (1) or less (-1) often
+thresholds = np.array([.7, .3, .5, .6, .7, .8, .3])
+directions = np.array([-1, 1, 1, 1, 1, 1, -1])
+
+temperature = .1  # How sharply the likelihoods change around each threshold
+floor = .05  # The smallest likelihood of any action, so that bluffs and slowplays are never ruled out entirely
+
+def get_likelihoods(percentiles):
+    """
+    Given the strength percentile of every holding, returns the likelihood of each kind of action for every holding
+    as a (7, 1326) table.
+    """
+    logits = directions[:, None] * (percentiles[None, :] - thresholds[:, None]) / temperature
+    return floor + (1 - floor) / (1 + np.exp(-logits))
+
+def get_actions(round_state):
+    """
+    Walks back through the game tree from round_state to the start of the round and returns every action taken, in
+    order, as tuples of (player, street, kind, state the action was taken in).
+    """
+    states = []
+    state = round_state
+
+    while state is not None:
+        states.append(state)
+        state = state.previous_state
+
+    states.reverse()
+    actions = []
+
+    for i in range(len(states) - 1):
+        before, after = states[i], states[i + 1]
+        player = before.button % 2
+        continue_cost = before.pips[1 - player] - before.pips[player]
+
+        if isinstance(after, TerminalState):
+            if continue_cost > 0:  # Only a fold can end the round while facing a bet
+                actions.append((player, before.street, FOLD, before))
+            continue
+
+        if after.street != before.street and after.stacks == before.stacks and is_closing_call(states, i):
+            continue  # The street was advanced after a call that has already been counted
+
+        contribution = before.stacks[player] - after.stacks[player]
+
+        if contribution == 0:
+            actions.append((player, before.street, CHECK, before))
+
+        elif contribution <= continue_cost:
+            actions.append((player, before.street, CALL, before))
+
+        else:
+            pot = 2 * STARTING_STACK - before.stacks[0] - before.stacks[1] + continue_cost
+            size = (contribution - continue_cost) / pot
+            actions.append((player, before.street, RAISE_SMALL + np.searchsorted(raise_cutoffs, size), before))
+
+    return actions
+
+def is_closing_call(states, i):
+    """
+    Returns whether states[i] only exists because a call in states[i - 1] ended the street, in which case it is not a
+    decision point of its own.
+    """
+    if i == 0:
+        return False
+
+    before, after = states[i - 1], states[i]
+    called = after.stacks != before.stacks and after.pips[0] == after.pips[1]
+    return called and not (after.street == 0 and before.button == 0)  # The small blind completing is not the end
+
+class RangeTracker:
+    """
+    Tracks the opponent's range for one round at a time. Call reset at the start of every round and observe whenever
+    a new RoundState is seen.
+    """
+
+    def __init__(self, evaluator):
+        """
+        Takes in an EvaluatorNumpy, used to score every holding on each new board.
+        """
+        self.evaluator = evaluator
+        self.weights = np.ones(len(equity_calc.HOLDINGS))  # The (unnormalized) probability of each opponent holding
+        self.n_observed = 0  # The number of opponent actions multiplied into the weights this round
+
+        equity, pairs = preflop_table.load_matrix()
+        class_strengths = np.sum(equity * pairs, axis=1) / np.sum(pairs, axis=1)  # Preflop equity against a random hand
+        self.preflop_percentiles = self.get_percentiles(class_strengths[preflop_table.HOLDING_CLASSES])
+        self.preflop_likelihoods = get_likelihoods(self.preflop_percentiles)
+
+    def reset(self, hand, remap):
+        """
+        Starts tracking a new round. Takes in your hand as card ids and the remap of card ids to the cards they play as
+        under the predicted permutation.
+        """
+        self.remap = remap
+        self.weights.fill(1)
+        self.weights[equity_calc.HOLDINGS_WITH_CARD[remap[hand]]] = 0  # The opponent cannot hold your cards
+        self.n_observed = 0
+        self.street = 0
+        self.likelihoods = self.preflop_likelihoods
+        self.n_actions = 0  # The number of actions in the round that have already been observed
+
+    def observe(self, round_state, opponent):
+        """
+        Updates the range with every action the opponent has taken since the last observed state. Returns whether the
+        opponent took any new actions.
+        """
+        actions = get_actions(round_state)
+        acted = False
+
+        for player, street, kind, state in actions[self.n_actions:]:
+            if street != self.street:
+                self.new_street(state.deck[:street])
+
+            if player == opponent:
+                np.multiply(self.weights, self.likelihoods[kind], out=self.weights)
+                self.n_observed += 1
+                acted = True
+
+        self.n_actions = len(actions)
+
+        if isinstance(round_state, RoundState) and round_state.street != self.street:
+            self.new_street(round_state.deck[:round_state.street])
+
+        return acted
+
+    def new_street(self, board):
+        """
+        Removes the holdings that use any of the board cards and re-ranks the live holdings on the new board.
+        """
+        self.street = len(board)
+        board = self.remap[board]
+        self.weights[equity_calc.HOLDINGS_WITH_CARD[board]] = 0
+
+        hands = np.empty((len(equity_calc.HOLDINGS), 2 + len(board)), dtype=np.int32)
+        hands[:, :2] = equity_calc.HOLDING_INTS
+        hands[:, 2:] = equity_calc.ID_TO_INT[board]
+        scores = self.evaluator.evaluate(hands)
+
+        live = np.ones(len(scores), dtype=bool)
+        live[equity_calc.HOLDINGS_WITH_CARD[board]] = False
+        self.likelihoods = get_likelihoods(self.get_percentiles(-scores, live))  # Lower scores are stronger hands
+
+    def get_percentiles(self, strengths, live=None):
+        """
+        Converts strengths (higher is better) into percentiles among the live holdings, with ties sharing a percentile.
+        """
+        order = np.sort(strengths if live is None else strengths[live])
+        below = np.searchsorted(order, strengths, side='left')
+        above = np.searchsorted(order, strengths, side='right')
+        return (below + above) / (2 * len(order))
+
+    def get_weights(self):
+        """
+        Returns the current range, normalized to sum to one.
+        """
+        return self.weights / np.sum(self.weights)
+
+    def get_class_weights(self):
+        """
+        Returns the current range as weights over the 169 preflop hand classes, summing to one. The weight of a class
+        is the mean weight of its holdings that do not share a card with ours, since range_equity already counts the
+        combinations of each matchup that can be dealt.
+        """
+        weights = np.bincount(preflop_table.HOLDING_CLASSES, self.weights, minlength=preflop_table.N_CLASSES)
+        live = np.bincount(preflop_table.HOLDING_CLASSES, self.weights > 0, minlength=preflop_table.N_CLASSES)
+        weights = weights / np.maximum(live, 1)
+        return weights / np.sum(weights)
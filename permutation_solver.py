@@ -3,11 +3,9 @@
 A utility to narrow down the probability of a distribution based on a list of direct comparisons between numbers.
 """
 
-import eval7
+import equity_calc
 import hand_type
 import numpy as np
-import toposort
-import scipy.optimize
 
 # Maps each rank to a probability distribution representing where it will be placed in any given permutation
 DIST = {
@@ -60,6 +58,100 @@ RANKS = {
     "A": 12
 }
 
+# The prior of each rank's position as a matrix, row i for the rank with integer representation i
+RANK_DIST = np.array([DIST[INDICES[rank]] for rank in range(13)])
+
+def get_ranks(cards):
+    """
+    Given a list of card ids, returns the string representation of each of their ranks.
+    """
+    return [INDICES[card >> 2] for card in cards]
+
+def get_remap(order):
+    """
+    Given an ordering of ranks from weakest to strongest, builds an array that maps each card id to the id of the card
+    it plays as, so a whole hand can be converted with a single lookup.
+    """
+    remap = np.empty(52, dtype=int)
+
+    for card in range(52):
+        remap[card] = 4 * order.index(INDICES[card >> 2]) + (card & 3)
+
+    return remap
+
+def sample_orders(dependencies, n_orders, rng=np.random, n_candidates=4):
+    """
+    Samples n_orders rank orderings (n_orders, 13), as integer ranks from weakest to strongest, consistent with
+    dependencies (a dictionary from each rank to the set of ranks known to be below it). Each rank is placed by its
+    DIST prior, and the orderings that break a known rule are rejected. If too few of n_candidates * n_orders draws
+    survive, the rest are repaired instead: ranks are taken in order of their draws, skipping any rank still above one
+    not yet taken.
+    """
+    rules = np.array([(RANKS[upper], RANKS[lower]) for upper, lowers in dependencies.items() for lower in lowers],
+                     dtype=int).reshape(-1, 2)
+
+    # Each rank draws a position from its prior, and random jitter breaks ties between ranks drawing the same one
+    n_draws = n_orders * n_candidates
+    cumulative = np.cumsum(RANK_DIST, axis=1)
+    positions = (rng.random((n_draws, 13, 1)) * cumulative[:, -1:] > cumulative).sum(axis=2)
+    keys = positions + rng.random((n_draws, 13))
+
+    consistent = (keys[:, rules[:, 0]] > keys[:, rules[:, 1]]).all(axis=1)
+    orders = np.argsort(keys[consistent][:n_orders], axis=1)
+    if len(orders) == n_orders:
+        return orders
+
+    below = {RANKS[upper]: [RANKS[lower] for lower in lowers] for upper, lowers in dependencies.items()}
+    repaired = []
+    for draw in keys[~consistent][:n_orders - len(orders)]:
+        order = []
+        left = list(np.argsort(draw))
+        while left:
+            ready = [rank for rank in left if all(lower in order for lower in below.get(rank, []))]
+            rank = ready[0] if ready else left[0]  # Known rules never form a cycle, but do not loop if they do
+            order.append(rank)
+            left.remove(rank)
+        repaired.append(order)
+
+    return np.concatenate((orders, np.array(repaired, dtype=orders.dtype)))
+
+def get_remaps(orders):
+    """
+    Given rank orderings (n, 13) as integer ranks, returns a table (n, 52) mapping each card id to the id of the card it
+    plays as under each ordering, as get_remap does for one.
+    """
+    positions = np.argsort(orders, axis=1)  # The position of each rank in each ordering
+    cards = np.arange(52)
+    return 4 * positions[:, cards >> 2] + (cards & 3)
+
+def sampled_strength(evaluator, hand, board, dependencies, n_sims=128, n_orders=16, opp_weights=None, rng=np.random):
+    """
+    Computes the odds of a hand over rank orderings sampled with sample_orders as well as over the cards to come, in one
+    batch of n_sims simulations: each simulation deals the runout and the opponent's hand as simulate_games does, then
+    evaluates both under one of n_orders orderings. hand and board are card ids, and opp_weights (if given) weighs every
+    holding of real cards. Returns the [win, tie] odds averaged over the orderings, and the spread of the win odds
+    between orderings with the sampling noise of each ordering's estimate taken out (0 if every sampled ordering is the
+    same).
+    """
+    n_sims = n_sims - n_sims % n_orders  # The same number of simulations for each ordering
+    cards = equity_calc.ID_TO_INT[list(hand) + list(board)]
+    games = evaluator.simulate_games(cards, 2, n_sims, seed=int(rng.integers(1, 2 ** 62)), opp_weights=opp_weights)
+
+    remaps = get_remaps(sample_orders(dependencies, n_orders, rng))
+    ordering = np.arange(n_sims) % n_orders
+    played = equity_calc.ID_TO_INT[remaps[ordering[:, None, None], equity_calc.to_ids(games)]]
+    scores = evaluator.evaluate(played.reshape(-1, 7)).reshape(n_sims, 2)
+
+    # Lower scores win
+    outcomes = np.stack((scores[:, 0] < scores[:, 1], scores[:, 0] == scores[:, 1])).reshape(2, -1, n_orders)
+    odds = outcomes.mean(axis=1)  # (2, n_orders), each simulation of an ordering is one row
+    if (remaps == remaps[0]).all():  # The rules fix the order, what is left of the spread would only be noise
+        return odds.mean(axis=1), 0.
+
+    noise = outcomes[0].var(axis=0, ddof=1).mean() / outcomes.shape[1]
+    spread = np.sqrt(max(odds[0].var(ddof=1) - noise, 0))
+    return odds.mean(axis=1), spread
+
 class Permutation:
     """
     An object that contains the current permutation used by the game. Continually updates itself as new rules are
@@ -68,8 +160,8 @@ class Permutation:
 
     def __init__(self):
         """
-        The permutation begins as a standard deck of cards. Takes in a mapping of each possible card to its
-        corresponding eval7.Card object.
+        The permutation begins as a standard deck of cards, with no rules learned. Cards are handled as card ids
+        0..51 throughout.
         """
         self.ground_truth = ["2", "3", "4", "5", "6", "7", "8", "9", "T", "J", "Q", "K", "A"]  # The permutation for a standard deck of cards
         self.permutation = self.ground_truth  # The current permutation
@@ -96,10 +188,10 @@ class Permutation:
         else:
             self.reverse_dependencies[lower].add(upper)
 
-    def convert_cards(self, cards, perm, to_eval7=False):
+    def convert_cards(self, cards, perm, to_binary=False):
         """
-        Given a list of cards represented as strings, converts them to their true values given a permutation. If
-        to_eval7 is true, they will be converted to eval7.Card objects.
+        Given a list of card ids, converts them to their true values given a permutation. If to_binary is true, they
+        will be converted to equity_calc card integers.
         """
         if cards == []:  # If there are no cards to convert
             return cards
@@ -107,15 +199,14 @@ class Permutation:
         converted = []
 
         for card in cards:
-            rank = card[0]
-            suit = card[1]
-            new_rank = perm[RANKS[rank]]
+            new_rank = perm[card >> 2]
+            new_card = 4 * RANKS[new_rank] + (card & 3)
 
-            if to_eval7:
-                converted.append(eval7.Card(new_rank + suit))
+            if to_binary:
+                converted.append(int(equity_calc.ID_TO_INT[new_card]))
 
             else:
-                converted.append(new_rank + suit)
+                converted.append(new_card)
 
         return converted
 
@@ -124,8 +215,8 @@ class Permutation:
         If you have a flush, finds what suit the flush consists of. Will only be applied when there are four cards of
         the same suit on the board.
         """
-        hand_suits = [card[1] for card in hand]  # The suits of the cards in hand
-        board_suits = [card[1] for card in board]  # The suits of the cards in hand
+        hand_suits = [card & 3 for card in hand]  # The suits of the cards in hand
+        board_suits = [card & 3 for card in board]  # The suits of the cards in hand
 
         if hand_suits[0] == hand_suits[1]:  # We only accept flushes with four board cards of the same suit
             return None
@@ -141,8 +232,8 @@ class Permutation:
         If you have a full house, then this function attempts to find which ranks you have three of and which ranks you have
         two of. Returns the rank you have three of first, then the rank you have two of.
         """
-        hand_ranks = [card[0] for card in hand]  # The ranks of the cards in hand
-        board_ranks = [card[0] for card in board]  # The ranks of the cards in board
+        hand_ranks = get_ranks(hand)  # The ranks of the cards in hand
+        board_ranks = get_ranks(board)  # The ranks of the cards in board
 
         three = None  # The rank we have three of
         two = None  # The rank we have two of
@@ -191,8 +282,8 @@ class Permutation:
         If you have a pair, three of a kind, or four of a kind, as designated by type (1, 3, or 7) then this function
         finds which rank you have multiples of.
         """
-        hand_ranks = [card[0] for card in hand]  # The ranks of the cards in hand
-        board_ranks = [card[0] for card in board]  # The ranks of the cards in board
+        hand_ranks = get_ranks(hand)  # The ranks of the cards in hand
+        board_ranks = get_ranks(board)  # The ranks of the cards in board
 
         if type == 1:  # A pair has two cards of the same type
 
@@ -226,8 +317,8 @@ class Permutation:
         """
         If you have two pair, then this function attempts to find which ranks you have pairs of.
         """
-        hand_ranks = [card[0] for card in hand]  # The ranks of the cards in hand
-        board_ranks = [card[0] for card in board]  # The ranks of the cards in board
+        hand_ranks = get_ranks(hand)  # The ranks of the cards in hand
+        board_ranks = get_ranks(board)  # The ranks of the cards in board
 
         pairs = []  # Ranks you have found pairs of
 
@@ -264,18 +355,18 @@ class Permutation:
 
         if delta == 0:  # If neither player won we cannot determine any rules
             if type == opp_type and type == 5:  # If we tied a flush (all five board cards have the same suit)
-                suit = board[0][1]  # The suit the flush is made of
+                suit = board[0] & 3  # The suit the flush is made of
                 rules = []  # The rules we were able to learn
 
                 for card in hand:
-                    if card[1] == suit:  # If it is the same suit as the flush, it is less than all cards on the board
+                    if card & 3 == suit:  # If it is the same suit as the flush, it is less than all cards on the board
                         for board_card in board:
-                            rules.append((board_card[0], card[0]))
+                            rules.append((INDICES[board_card >> 2], INDICES[card >> 2]))
 
                 for card in opp_hand:
-                    if card[1] == suit:  # If it is the same suit as the flush, it is less than all cards on the board
+                    if card & 3 == suit:  # If it is the same suit as the flush, it is less than all cards on the board
                         for board_card in board:
-                            rules.append((board_card[0], card[0]))
+                            rules.append((INDICES[board_card >> 2], INDICES[card >> 2]))
 
                 if rules != []:  # If we were able to learn a rule
                     return rules
@@ -289,8 +380,8 @@ class Permutation:
         if type == opp_type:  # We can only extrapolate rules when we have the same type of hand as our opponent
 
             if type == 0:  # High card
-                hand_ranks = [card[0] for card in hand]  # The ranks of the cards in hand
-                opp_hand_ranks = [card[0] for card in opp_hand]  # The ranks of the cards in hand
+                hand_ranks = get_ranks(hand)  # The ranks of the cards in hand
+                opp_hand_ranks = get_ranks(opp_hand)  # The ranks of the cards in hand
 
                 if delta > 0:  # If we won
                     if hand_ranks[1] in dependencies and hand_ranks[0] in dependencies[
@@ -440,23 +531,23 @@ class Permutation:
                 else:
                     if delta > 0:  # If we won
                         for card in hand:
-                            if suit in card:
-                                upper = card[0]
+                            if card & 3 == suit:
+                                upper = INDICES[card >> 2]
 
                         for card in opp_hand:
-                            if opp_suit in card:
-                                lower = card[0]
+                            if card & 3 == opp_suit:
+                                lower = INDICES[card >> 2]
 
                         return [(upper, lower)]
 
                     else:  # If our opponent won
                         for card in opp_hand:
-                            if opp_suit in card:
-                                upper = card[0]
+                            if card & 3 == opp_suit:
+                                upper = INDICES[card >> 2]
 
                         for card in hand:
-                            if suit in card:
-                                lower = card[0]
+                            if card & 3 == suit:
+                                lower = INDICES[card >> 2]
 
                         return [(upper, lower)]
 
@@ -525,4 +616,6 @@ class Permutation:
         """
         Performs a topological sort on all ranks which we have learned a relative ranking for.
         """
+        import toposort  # Only needed once enough showdowns have been seen, so it is not imported at startup
+
         return list(toposort.toposort(self.dependencies))
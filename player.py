@@ -1,15 +1,26 @@
+import startup_profile # Imported first, so the startup report covers every other import
 import act_utils
-import hand_type
+import betting_tree
+import board_texture
+import bucket_store
+import bucket_table
+import opp_range
 import pickle
+import threading
 import numpy as np
 import permutation_solver
+import preflop_table
+import push_fold
+import rng_streams
 
 from hand_type import get_type
-from hand_sim import get_evaluator, get_strength, str_to_card
+from equity_calc import ID_TO_INT, HOLDINGS, HOLDING_INDEX
+from hand_sim import get_evaluator, get_session, get_strength
 from skeleton.actions import FoldAction, CallAction, CheckAction, RaiseAction
 from skeleton.states import NUM_ROUNDS, STARTING_STACK, BIG_BLIND, SMALL_BLIND
 from skeleton.bot import Bot
 from skeleton.runner import parse_args, run_bot
+from skeleton.cards import STR_TO_ID
 
 class Node:
     def __init__(self, name, index):
@@ -29,42 +40,141 @@ class Node:
     def getIndex(self):
         return self.index
 
+_load_lock = threading.Lock()
+_preflop_tables = None
+_strategy_tables = None
+_node_strategy = None
+
+def load_preflop_tables():
+    """
+    Returns the preflop win probabilities, tie probabilities and hand types (52, 52) indexed by the ids of both hole
+    cards, loading them the first time they are needed. The tables are read-only and shared by every Player in the
+    process.
+    """
+    global _preflop_tables
+
+    with _load_lock:  # Bots on other threads can ask at the same time, and must not load twice
+        if _preflop_tables is None:
+            with open('preflop_odds.pickle', 'rb') as file:
+                preflop_odds = pickle.load(file) # A dictionary of pre-computed preflop odds and hand types
+
+            strengths = np.zeros((52, 52))
+            ties = np.zeros((52, 52))
+            types = np.zeros((52, 52), dtype=int)
+            for cards, (odds, type) in preflop_odds.items():
+                first, second = STR_TO_ID[cards[:2]], STR_TO_ID[cards[2:]]
+                strengths[first, second] = odds[0]
+                ties[first, second] = odds[1]
+                types[first, second] = type
+
+            _preflop_tables = (strengths, ties, types)
+
+    return _preflop_tables
+
+def load_strategy_tables():
+    """
+    Returns the regret and strategy stores, loading them the first time they are needed. The stores are read-only
+    during play and shared by every Player in the process.
+    """
+    global _strategy_tables
+
+    with _load_lock:  # Bots on other threads can ask at the same time, and must not load twice
+        if _strategy_tables is None:
+            _strategy_tables = (bucket_store.load('regretsum_small_2'), bucket_store.load('stratsum_small_2'))
+
+    return _strategy_tables
+
+def load_node_strategy():
+    """
+    Returns the per-node strategy store written by vector_cfr.py, indexed from the compiled tree's node_base, or None
+    if there is none, loading it the first time it is needed.
+    """
+    global _node_strategy
+
+    with _load_lock:  # Bots on other threads can ask at the same time, and must not load twice
+        if _node_strategy is None:
+            try:
+                _node_strategy = bucket_store.BucketStore.load('node_stratsum.npz')
+            except FileNotFoundError:
+                _node_strategy = False  # Checked once, so later calls do not look for the file again
+
+    return _node_strategy or None
+
 class Player(Bot):
     '''
     A bot that plays using a Nash equilibrium computed using counterfactual regret minimization. Plays under the
     assumption that there is no permutation of ranks.
     '''
 
-    def __init__(self):
+    def __init__(self, seed=None, solver=False, equity_socket=None, rank_sampling=False):
         '''
         Called when a new game starts. Called exactly once.
 
         Arguments:
-        Nothing.
+        seed: the match seed that every random stream is derived from, fresh entropy if None.
+        solver: whether to solve turn and river decisions in real time with subgame.SubgameSolver.
+        equity_socket: the socket of an equity_service to compute post-flop equities with, or None to simulate them.
+        rank_sampling: whether to average post-flop equities over rank orders consistent with the rules learned so far,
+        instead of computing them under the predicted order.
 
         Returns:
         Nothing.
         '''
-        self.cache = {} # A cache of hand strengths that we have seen so that they do not have to be computed again
-
-        with open('card_lookups.pickle', 'rb') as file:
-            self.card_map = pickle.load(file) # A mapping of all cards in a deck to their corresponding Card object
-
         self.checkfold = False  # If we should check/ fold the rest of the game to guarantee a win
-        self.evaluator = get_evaluator() # Evaluator object used to calculate hand strength
+        self.streams = rng_streams.Streams(seed) # Independent random streams for each component, from one match seed
+        self.rng = self.streams['strategy'] # Random numbers for choosing between actions
+        self.evaluator = get_evaluator(self.streams['evaluator']) # Evaluator object used to calculate hand strength
+        self.tracker = opp_range.RangeTracker(self.evaluator) # A model of the opponent's range, updated on each action
+        self.session = get_session(self.evaluator) # The simulations of the current hand, reused on later streets
+        self.solver = None # Solves turn and river decisions in real time, if enabled
+        if solver:
+            import subgame  # Only needed with --solver, so it is not imported at startup
+            self.solver = subgame.SubgameSolver(self.evaluator, self.streams['solver'])
+        self.equity = None # Looks up post-flop equities in the scores of the equity service, if enabled
+        if equity_socket:
+            import equity_service  # Only needed with --equity-socket, so it is not imported at startup
+            try:
+                self.equity = equity_service.Equity(equity_socket)
+            except OSError:
+                print('Could not reach the equity service at {}, simulating equities'.format(equity_socket))
+        self.rank_sampling = rank_sampling
         self.parentDictionary = {'2':[],'3':[],'4':[],'5':[],'6':[],'7':[],'8':[],'9':[],'T':[],'J':[],'Q':[],'K':[],'A':[]}
         self.predictedOrder = ['2','3','4','5','6','7','8','9','T','J','Q','K','A']
-        self.values = ['2', '3', '4', '5', '6', '7', '8', '9', 'T', 'J', 'Q', 'K', 'A']
         self.P = permutation_solver.Permutation()
         self.confidenceInterval = 6e9
 
-        with open('preflop_odds.pickle', 'rb') as file:
-            self.preflop_odds = pickle.load(file) # A dictionary of pre-computed preflop odds and hand types
+        # Pre-computed preflop win probabilities and hand types, indexed by the ids of both hole cards
+        self.preflop_strengths, self.preflop_ties, self.preflop_types = load_preflop_tables()
 
         self.shove_counts = np.array([0, 0, 0, 0])  # The number of times we have shoved preflop/postflop
 
-        self.regretsum = np.genfromtxt('regretsum_small_2.csv', delimiter=',') # A numpy array of regrets for each bucket
-        self.stratsum = np.genfromtxt('stratsum_small_2.csv', delimiter=',')  # A numpy array of strategies for each bucket
+    @property
+    def regretsum(self):
+        """
+        A sparse store of regrets for each visited bucket, loaded the first time an action is needed.
+        """
+        return load_strategy_tables()[0]
+
+    @property
+    def node_stratsum(self):
+        """
+        A sparse store of strategies with rows of their own for each node of the tree, if vector_cfr.py has written one.
+        """
+        return load_node_strategy()
+
+    @property
+    def tree(self):
+        """
+        The compiled betting tree of the abstraction, loaded the first time an action is needed.
+        """
+        return betting_tree.load_tree()
+
+    @property
+    def stratsum(self):
+        """
+        A sparse store of strategies for each visited bucket, loaded the first time an action is needed.
+        """
+        return load_strategy_tables()[1]
 
     def handle_new_round(self, game_state, round_state, active):
         '''
@@ -79,14 +189,22 @@ class Player(Bot):
         Nothing.
         '''
         print(self.predictedOrder)
-        self.hand = round_state.hands[active] # Your hand
-        self.board = [] # The board cards
+        self.hand = round_state.hands[active] # Your hand, as card ids
+        self.board = [] # The board cards, as card ids
 
-        self.formatted_hand = [self.card_map[i] for i in round_state.hands[active]] # Your hand, converted to Card objects
-        self.formatted_board = [] # The board cards, converted to Card objects
+        self.remap = permutation_solver.get_remap(self.predictedOrder) # Maps each card id to the card it plays as
+        self.tracker.reset(self.hand, self.remap)
+        self.session.reset()
+        if self.solver is not None:
+            self.solver.reset()
 
         self.street = 0 # What street you are on
+        self.cluster = None # The post-flop cluster of your hand, only used with the node tables trained on clusters
+        self.texture = 0 # The packed texture of the board under the predicted permutation, see board_texture
+        self.strength_spread = 0 # The spread of the hand strength between sampled rank orders, with rank_sampling
         self.shoved = [False, False] # Did you shove preflop or postflop
+        self.tree_node = 0 # Where the hand is in the compiled betting tree, -1 once it has left the tree
+        self.n_translated = 0 # The number of actions of the hand already mapped onto the tree
         self.strength, self.type = self.calc() # Hand strength and hand type
 
     def handle_round_over(self, game_state, terminal_state, active):
@@ -143,8 +261,14 @@ class Player(Bot):
 
             return FoldAction()
 
+        opp_acted = self.tracker.observe(round_state, 1 - active) # Narrow the opponent's range with their latest actions
+        street_changed = round_state.street != self.street
+
         self.update_board(round_state) # Update the street and board cards if the street has changed, along with hand strength and type
 
+        if opp_acted and not street_changed: # Hand strength depends on the opponent's range
+            self.strength, self.type = self.calc()
+
         active = round_state.button % 2 # Are we the small blind (0) or big blind (1)
         pip = round_state.pips[active]  # The number of chips you have contributed to the pot this round of betting
         opp_pip = round_state.pips[1 - active]  # The number of chips your opponent has contributed to the pot this round of betting
@@ -158,58 +282,104 @@ class Player(Bot):
 
         pot_odds = float(continue_cost) / pot_after_continue  # Compute the equity needed for it to be worth it to continue
 
-        if pot_odds >= .4:  # Shove behavior
-            action = self.play_shove(continue_cost, pot_odds, self.strength)
+        strategy = self.solve(game_state, round_state, active) if self.solver is not None and self.street >= 4 else None
+
+        if strategy is not None:
+            import abstract_game  # Already loaded along with subgame
+            action = np.searchsorted(np.cumsum(strategy), self.rng.random())
+            # Bet at the solved tree's own sizes, so the next decision is still on the tree and its regrets are reused
+            return act_utils.act(action, legal_actions, round_state, pip, continue_cost, pot_after_continue,
+                                 abstract_game.MEAN_SIZES)
+
+        elif pot_odds >= .4:  # Shove behavior
+            action = self.play_shove(round_state, active, continue_cost, pot_odds, self.strength)
+            if action == 3 and self.street == 0 and RaiseAction in legal_actions:  # The charts assume a real all in
+                return RaiseAction(round_state.raise_bounds()[1])
 
         else:
-            bucket = act_utils.get_bucket(active, continue_cost, pot_after_continue, self.street, self.strength) # Bucket the game state
-            outputs = self.stratsum[bucket] # See how many times we have visited this bucket
+            node = self.translate(round_state) # The betting situation in the tree that the real one maps to
+            if node >= 0 and self.tree.player[node] == active and self.tree.street[node] == self.street:
+                if self.node_stratsum is not None: # The strategy trained for this very node, on the clusters
+                    strength_bucket = act_utils.get_strength_bucket(self.street, self.strength, self.cluster)
+                    outputs = self.node_stratsum[self.tree.node_base[node] + strength_bucket]
+                else: # The shared rows were trained on the strength cutoffs
+                    strength_bucket = act_utils.get_strength_bucket(self.street, self.strength)
+                    outputs = self.stratsum[self.tree.base[node] + strength_bucket]
+            else:
+                bucket = act_utils.get_bucket(active, continue_cost, pot_after_continue, self.street,
+                                              self.strength) # Bucket the game state
+                outputs = self.stratsum[bucket] # See how many times we have visited this bucket
 
             if np.sum(outputs) < 1000:
                 action = self.play_default(continue_cost, pot_odds, self.strength)
 
             else:
-                strategy = act_utils.calculate_strategy(self.stratsum[bucket])
-                action = np.searchsorted(np.cumsum(strategy), np.random.random())
+                strategy = act_utils.calculate_strategy(outputs)
+                action = np.searchsorted(np.cumsum(strategy), self.rng.random())
 
-        return act_utils.act(action, legal_actions, round_state, pip, continue_cost, pot_after_continue)
+        return act_utils.act(action, legal_actions, round_state, pip, continue_cost, pot_after_continue,
+                             self.streams['act'])
+
+    def translate(self, round_state):
+        """
+        Maps the actions of the hand that have not been mapped yet onto the compiled betting tree, raises of any size
+        with the pseudo-harmonic mapping, and returns the tree node the hand is at (-1 if it has left the tree).
+        """
+        steps = betting_tree.history(round_state)
+        self.tree_node = self.tree.locate(steps[self.n_translated:], self.streams['translation'],
+                                                  self.tree_node)
+        self.n_translated = len(steps)
+        return self.tree_node
+
+    def solve(self, game_state, round_state, active):
+        """
+        Solves the rest of the hand from the current decision within a share of the time left per remaining round, and
+        returns the strategy of our hand over the abstract actions, or None if there is not enough time to solve.
+        """
+        ranges = np.ones((2, len(HOLDINGS)))  # Our own range is taken as uniform
+        ranges[1 - active] = self.tracker.weights
+        hand = HOLDING_INDEX[self.remap[self.hand[0]], self.remap[self.hand[1]]]
+        budget = self.solver.budget(game_state.game_clock, NUM_ROUNDS - game_state.round_num + 1)
+
+        return self.solver.solve(round_state, self.remap[self.board], hand, ranges, budget)
 
     def calc(self):
         """
-        Calculates the probability of winning this hand given the cards in your hand and on the board.
+        Calculates the probability of winning this hand given the cards in your hand and on the board, against the
+        opponent's current range.
         """
-        hand = []
-        board = []
-        for card in self.hand:
-            number = card[:-1]
-            suit = card[-1]
-            currentCard = self.predictedOrder.index(number)
-            hand.append(self.values[currentCard] + suit)
-
-        for card in self.board:
-            number = card[:-1]
-            suit = card[-1]
-            currentCard = self.predictedOrder.index(number)
-            board.append(self.values[currentCard] + suit)
-
-        if self.street == 0: # If we are preflop, perform a lookup
-            cards = "".join(hand)
-            return self.preflop_odds[cards][0] # The first index is the probability of winning
+        hand = self.remap[self.hand] # The cards in your hand, under the predicted permutation
+        board = self.remap[self.board] # The board cards, under the predicted permutation
 
-        else:
-            key1 = frozenset("".join(hand))
-            key2 = frozenset("".join(board))
+        if self.street == 0: # If we are preflop, use the pre-computed tables
+            if self.tracker.n_observed == 0: # The opponent has not acted yet, so their range is still uniform
+                return self.preflop_strengths[hand[0], hand[1]], self.preflop_types[hand[0], hand[1]]
 
-            if key1 in self.cache and key2 in self.cache[key1]: # If we have seen this hand and board before
-                return self.cache[key1][key2]
+            # The equity matrix counts ties as half a win, while the tables and the preflop buckets count wins only
+            strength = preflop_table.hand_equity(hand[0], hand[1], self.tracker.get_class_weights())
+            strength -= self.preflop_ties[hand[0], hand[1]] / 2
+            return strength, self.preflop_types[hand[0], hand[1]]
 
-            else:
-                strength = get_strength(self.formatted_hand, self.formatted_board, self.evaluator, iters=100)
-                type = hand_type.get_type(hand, board)
-                if get_type(hand, board) == 4:
-                    strength[0] = strength[0]/2
-                self.cache[key1] = {key2: [strength[0], type]}
-                return strength[0], type
+        else:
+            strength = None
+            if self.rank_sampling: # Sample the true rank order along with the runouts, the range is of real cards
+                weights = self.tracker.weights[HOLDING_INDEX[self.remap[HOLDINGS[:, 0]], self.remap[HOLDINGS[:, 1]]]]
+                strength, self.strength_spread = permutation_solver.sampled_strength(
+                    self.evaluator, self.hand, self.board, self.P.dependencies, opp_weights=weights,
+                    rng=self.streams['orders'])
+            elif self.equity is not None: # The board's scores from the equity service, None until they have arrived
+                strength = self.equity.strength(hand, board, self.tracker.weights)
+
+            if strength is None:
+                formatted_hand = list(ID_TO_INT[hand]) # Your hand, converted to binary integers
+                formatted_board = list(ID_TO_INT[board]) # The board cards, converted to binary integers
+
+                strength = get_strength(formatted_hand, formatted_board, self.evaluator, iters=100,
+                                        opp_weights=self.tracker.weights, session=self.session)
+            type = get_type(hand, board)
+            if type == 4:
+                strength[0] = strength[0]/2
+            return strength[0], type
 
     def play_checkfold(self, game_state):
         """
@@ -227,8 +397,12 @@ class Player(Bot):
 
     def play_default(self, continue_cost, pot_odds, strength):
         """
-        The default strategy to play with. Takes into account the continue cost, pot odds, and hand strength.
+        The default strategy to play with. Takes into account the continue cost, pot odds, hand strength and the texture
+        of the board.
         """
+        if self.type in (1, 2) and board_texture.is_wet(self.texture):
+            strength -= .1  # Pairs and two pairs lose value on boards where straights and flushes are possible
+
         if strength > .85:
             return 3
 
@@ -238,7 +412,7 @@ class Player(Bot):
 
             # Is it worth it to stay in the game?
             if strength >= pot_odds:  # Staying in the game has positive EV
-                if strength > .5 and np.random.random() < strength:  # Commit more sometimes
+                if strength > .5 and self.rng.random() < strength:  # Commit more sometimes
                     return 2
 
                 return 1
@@ -247,24 +421,22 @@ class Player(Bot):
                 return 0
 
         else:
-            if np.random.random() < strength:  # Balance bluffs with value bets
+            if self.rng.random() < strength:  # Balance bluffs with value bets
                 return 2
             return 1
 
-    def play_shove(self, continue_cost, pot_odds, strength):
+    def play_shove(self, round_state, active, continue_cost, pot_odds, strength):
         """
-        The strategy to take if we decide that shoving is a viable option. Takes into account the continue cost, pot
-        odds, and hand strength.
+        The strategy to take if we decide that shoving is a viable option. Preflop, follows the push/fold charts.
+        Postflop, takes into account the continue cost, pot odds, and hand strength.
         """
         if self.street == 0:
             self.shoved[0] = True
-            shoves = self.shove_counts[0] + 1 # The number of times your opponent has shoved preflop
-            hands = self.shove_counts[1] + 1 # The number of times you have been to the preflop
+            return self.play_push_fold(round_state, active)
 
-        else:
-            self.shoved[1] = True
-            shoves = self.shove_counts[2] + 1 # The number of times your opponent has shoved postflop
-            hands = self.shove_counts[3] + 1 # The number of times you have been to the postflop
+        self.shoved[1] = True
+        shoves = self.shove_counts[2] + 1 # The number of times your opponent has shoved postflop
+        hands = self.shove_counts[3] + 1 # The number of times you have been to the postflop
 
         if hands < 50:  # Inexperienced shoving
             return self.play_default(continue_cost, pot_odds, strength)
@@ -276,18 +448,39 @@ class Player(Bot):
         else:
             return 0
 
+    def play_push_fold(self, round_state, active):
+        """
+        Looks up a preflop all in decision in the push/fold charts: whether to call if the opponent is all in, and
+        otherwise whether to go all in ourselves. Returns 3 to go all in or call and 0 to fold.
+        """
+        hand = self.remap[self.hand] # The cards in your hand, under the predicted permutation
+        hand_class = preflop_table.get_class(hand[0], hand[1])
+        contribution = STARTING_STACK - round_state.stacks[active]
+
+        if round_state.stacks[1 - active] == 0: # The opponent is all in, look up what they had in before
+            pushed = STARTING_STACK - round_state.previous_state.stacks[1 - active]
+            frequency = push_fold.call_frequency(hand_class, pushed, contribution)
+
+        else:
+            opp_contribution = STARTING_STACK - round_state.stacks[1 - active]
+            frequency = push_fold.push_frequency(hand_class, contribution, opp_contribution)
+
+        return 3 if self.rng.random() < frequency else 0
+
     def update_board(self, round_state):
         """
-        Called by get_action. Checks to see if the street has changed, updating the street and the board as well as hand
-        strength and hand type if it has to minimize the number of calls to the time intensive str_to_card and calc
-        functions.
+        Called by get_action. Checks to see if the street has changed, and only then updates the street, the board card
+        ids and what depends on them (cluster, texture, hand strength and hand type), so the time intensive calc runs
+        once per street.
         """
         street = round_state.street  # 0, 3, 4, or 5 representing pre-flop, flop, turn, or river respectively
 
         if street != self.street: # If we changed streets, update the board cards
             self.street = street
             self.board = round_state.deck[:street]
-            self.formatted_board = [self.card_map[i] for i in round_state.deck[:street]]
+            if self.node_stratsum is not None: # Only the node tables of vector_cfr.py are trained on the clusters
+                self.cluster = bucket_table.get_cluster(self.remap[self.hand], self.remap[self.board])
+            self.texture = board_texture.get_texture(self.board, self.remap)
 
             self.strength, self.type = self.calc()  # Calculate hand strength and hand type
 
@@ -382,4 +575,19 @@ class Player(Bot):
             return predictedOrder, parentDictionary
 
 if __name__ == '__main__':
-    run_bot(Player(), parse_args())
\ No newline at end of file
+    args = parse_args()
+    startup_profile.mark('imports')
+    player = Player(args.seed, args.solver, args.equity_socket, args.rank_sampling)
+    startup_profile.mark('player')
+
+    if args.startup_report:
+        load_preflop_tables()
+        load_strategy_tables()
+        load_node_strategy()
+        bucket_table.load_tables()
+        push_fold.load_charts()
+        betting_tree.load_tree()
+        startup_profile.mark('deferred tables')
+        startup_profile.report()
+
+    run_bot(player, args)
\ No newline at end of file
@@ -0,0 +1,208 @@
+"""
+Generates the pre-computed preflop tables by exact enumeration of every board, and provides lookups into them.
+
+Running this file rebuilds preflop_odds.pickle (the win and tie probability of every hand against a random hand) and
+preflop_equity.npz, which holds the equity of each of the 169 preflop hand classes against every other class. Boards
+are enumerated up to suit isomorphism, which leaves every class against class total unchanged, and are split across a
+pool of worker processes.
+
+Hand classes are laid out on a 13x13 grid: pairs on the diagonal, suited hands at (high rank, low rank) and offsuit
+hands at (low rank, high rank), so the class of a hand is 13 * row + column.
+"""
+
+import argparse
+import itertools
+import multiprocessing
+import pickle
+import threading
+import time
+
+import numpy as np
+import equity_calc
+
+from skeleton.cards import ID_TO_STR
+
+N_CLASSES = 169
+N_BOARDS = 1712304  # The number of boards that can be dealt once both players have their hole cards, (48 choose 5)
+
+def get_class(first, second):
+    """
+    Given two hole cards as card ids, returns the index of their preflop hand class.
+    """
+    high, low = max(first >> 2, second >> 2), min(first >> 2, second >> 2)
+
+    if (first & 3) == (second & 3):  # Suited hands sit above the diagonal
+        return 13 * high + low
+
+    return 13 * low + high
+
+# The hand class of every holding in equity_calc.HOLDINGS
+HOLDING_CLASSES = np.array([get_class(first, second) for first, second in equity_calc.HOLDINGS])
+
+def get_disjoint():
+    """
+    Returns whether each pair of holdings can be dealt at the same time (they share no cards), as a (1326, 1326) matrix.
+    Only needed to generate the tables, so it is built on demand.
+    """
+    return (equity_calc.HOLDINGS[:, None, :, None] != equity_calc.HOLDINGS[None, :, None, :]).all(axis=(2, 3))
+
+def class_name(index):
+    """
+    Returns the usual name of a hand class, such as AKs, 72o or TT.
+    """
+    row, column = divmod(index, 13)
+    ranks = '23456789TJQKA'
+
+    if row == column:
+        return ranks[row] * 2
+
+    if row > column:
+        return ranks[row] + ranks[column] + 's'
+
+    return ranks[column] + ranks[row] + 'o'
+
+def class_matrix(holding_matrix):
+    """
+    Sums a (1326, 1326) matrix over holdings into a (169, 169) matrix over hand classes.
+    """
+    one_hot = np.zeros((len(HOLDING_CLASSES), N_CLASSES))
+    one_hot[np.arange(len(HOLDING_CLASSES)), HOLDING_CLASSES] = 1
+    return one_hot.T @ holding_matrix @ one_hot
+
+def canonical_boards(n_cards=5):
+    """
+    Enumerates every board of n_cards up to a relabelling of suits. Returns the canonical boards as card ids along with
+    the number of boards that each one stands for.
+    """
+    boards = np.array(list(itertools.combinations(range(52), n_cards)), dtype=np.int8)
+    powers = 52 ** np.arange(n_cards - 1, -1, -1, dtype=np.int64)
+    keys = None
+
+    for suits in itertools.permutations(range(4)):
+        relabel = np.array([4 * (card >> 2) + suits[card & 3] for card in range(52)], dtype=np.int8)
+        relabelled = np.sort(relabel[boards], axis=1)
+        relabelled_keys = relabelled.astype(np.int64) @ powers
+        keys = relabelled_keys if keys is None else np.minimum(keys, relabelled_keys)
+
+    keys, counts = np.unique(keys, return_counts=True)
+    canonical = (keys[:, None] // powers) % 52
+    return canonical.astype(np.int32), counts
+
+def enumerate_boards(boards, weights):
+    """
+    Worker task. For every board, scores all holdings and counts how many boards each holding wins and ties against
+    every other holding, weighted by the number of boards the canonical board stands for.
+    """
+    evaluator = equity_calc.EvaluatorNumpy()
+    n_holdings = len(equity_calc.HOLDINGS)
+    wins = np.zeros((n_holdings, n_holdings), dtype=np.int64)
+    ties = np.zeros((n_holdings, n_holdings), dtype=np.int64)
+    compare = np.empty((n_holdings, n_holdings), dtype=bool)
+    hands = np.empty((n_holdings, 7), dtype=np.int32)
+    hands[:, :2] = equity_calc.ID_TO_INT[equity_calc.HOLDINGS]
+
+    for board, weight in zip(boards, weights):
+        hands[:, 2:] = equity_calc.ID_TO_INT[board]
+        scores = evaluator.evaluate(hands).astype(np.float32)
+        scores[np.isin(equity_calc.HOLDINGS, board).any(axis=1)] = np.nan  # Holdings that use a board card never win or tie
+
+        np.less(scores[:, None], scores[None, :], out=compare)
+        np.add(wins, weight, out=wins, where=compare)
+        np.equal(scores[:, None], scores[None, :], out=compare)
+        np.add(ties, weight, out=ties, where=compare)
+
+    return wins, ties
+
+def generate(n_workers=None, chunk_size=2000, limit=None):
+    """
+    Enumerates every board across a pool of workers. Returns the (169, 169) matrices of weighted wins and ties, and
+    the number of pairs of holdings behind each class matchup. If limit is set, only that many canonical boards are
+    enumerated, which is only useful for testing.
+    """
+    boards, weights = canonical_boards()
+    if limit is not None:
+        boards, weights = boards[:limit], weights[:limit]
+
+    chunks = [(boards[i:i + chunk_size], weights[i:i + chunk_size]) for i in range(0, len(boards), chunk_size)]
+    n_holdings = len(equity_calc.HOLDINGS)
+    wins = np.zeros((n_holdings, n_holdings), dtype=np.int64)
+    ties = np.zeros((n_holdings, n_holdings), dtype=np.int64)
+
+    with multiprocessing.Pool(n_workers) as pool:
+        for i, (chunk_wins, chunk_ties) in enumerate(pool.imap_unordered(_enumerate_chunk, chunks)):
+            wins += chunk_wins
+            ties += chunk_ties
+            print(f"{i + 1}/{len(chunks)} chunks done")
+
+    disjoint = get_disjoint()
+    wins *= disjoint  # Holdings that share a card are never dealt together
+    ties *= disjoint
+    return class_matrix(wins), class_matrix(ties), class_matrix(disjoint.astype(np.int64))
+
+def _enumerate_chunk(chunk):
+    return enumerate_boards(*chunk)
+
+def save(wins, ties, pairs, odds_path='preflop_odds.pickle', matrix_path='preflop_equity.npz'):
+    """
+    Writes the preflop odds dictionary used by Player and the class against class equity matrix.
+    """
+    totals = pairs * N_BOARDS
+    equity = (wins + ties / 2) / np.maximum(totals, 1)
+    np.savez_compressed(matrix_path, equity=equity.astype(np.float32), pairs=pairs.astype(np.int16))
+
+    win_odds = wins.sum(axis=1) / totals.sum(axis=1)
+    tie_odds = ties.sum(axis=1) / totals.sum(axis=1)
+    preflop_odds = {}
+
+    for first, second in itertools.permutations(range(52), 2):
+        index = get_class(first, second)
+        type = 1 if first >> 2 == second >> 2 else 0  # Pocket pairs are the only hand type before the flop
+        preflop_odds[ID_TO_STR[first] + ID_TO_STR[second]] = [[float(win_odds[index]), float(tie_odds[index])], type]
+
+    with open(odds_path, 'wb') as file:
+        pickle.dump(preflop_odds, file)
+
+_load_lock = threading.Lock()
+_matrix = None
+
+def load_matrix(path='preflop_equity.npz'):
+    """
+    Returns the (169, 169) class against class equity matrix and the number of pairs of holdings behind each matchup,
+    loading them the first time they are needed.
+    """
+    global _matrix
+
+    with _load_lock:  # Bots on other threads can ask at the same time, and must not load twice
+        if _matrix is None:
+            with np.load(path) as data:
+                _matrix = (data['equity'].astype(float), data['pairs'].astype(float))
+
+    return _matrix
+
+def range_equity(weights, opp_weights):
+    """
+    Given two ranges as weights over the 169 hand classes, returns the preflop equity of the first range against the
+    second as a matrix product, accounting for how many combinations of each matchup can be dealt.
+    """
+    equity, pairs = load_matrix()
+    combos = weights[:, None] * pairs * opp_weights[None, :]
+    return np.sum(combos * equity) / np.sum(combos)
+
+def hand_equity(first, second, opp_weights):
+    """
+    Returns the preflop equity of the hole cards first and second against a range of weights over the 169 hand classes.
+    """
+    weights = np.zeros(N_CLASSES)
+    weights[get_class(first, second)] = 1
+    return range_equity(weights, opp_weights)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python3 preflop_table.py')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes, defaults to all cores')
+    parser.add_argument('--limit', type=int, default=None, help='Only enumerate this many canonical boards (testing)')
+    args = parser.parse_args()
+
+    start = time.time()
+    wins, ties, pairs = generate(args.workers, limit=args.limit)
+    save(wins, ties, pairs)
+    print(f"Done in {time.time() - start:.0f}s")
@@ -0,0 +1,121 @@
+"""
+Generates heads-up push/fold equilibrium charts for all-in decisions before the flop, and provides lookups into them.
+
+In the push/fold game, the player to act has put pushed chips in the pot and faces a bet, the opponent having put in
+called chips. They either fold, losing what they put in, or go all in for STARTING_STACK, and the opponent either folds
+or calls for a showdown. Both players hold a hand class, dealt together as often as preflop_table's class against class
+matrix says, and the showdown is settled with its equities. The equilibrium of each game is found by fictitious play:
+every iteration, both players best respond to the other's average strategy so far.
+
+Contributions are snapped to GRID, and the game of every pair of grid contributions is solved at once. Running this
+file rebuilds push_fold.npz, which holds the push frequency and the call frequency of every hand class in every game.
+"""
+
+import argparse
+import threading
+import time
+
+import numpy as np
+import preflop_table
+
+from skeleton.states import STARTING_STACK
+
+# Contributions the charts are solved for, roughly evenly spaced in log scale
+GRID = np.array([1, 2, 3, 4, 5, 6, 8, 10, 12, 15, 20, 25, 30, 40, 50, 60, 80, 100, 125, 150, 175, 200])
+GRID_INDEX = np.abs(np.log(np.maximum(np.arange(STARTING_STACK + 1), 1))[:, None]
+                    - np.log(GRID)[None, :]).argmin(axis=1)  # The nearest grid point to each contribution
+
+def games():
+    """
+    Returns the pushed and called contributions of every game solved, the player to act facing a bet. Games with equal
+    contributions stand for close ones that snap to the same grid point.
+    """
+    pushed, called = np.meshgrid(GRID, GRID, indexing='ij')
+    facing = pushed <= called
+    return pushed[facing], called[facing]
+
+def best_responses(pushed, called, push, call, equity, pairs):
+    """
+    Given the pushed and called contributions of n games and both players' strategies (n, 169), returns the expected
+    value of pushing minus folding for every pusher class and of calling minus folding for every caller class, each
+    (n, 169) and summed over the opponent's classes weighted by how often they are dealt.
+    """
+    showdown = 2 * STARTING_STACK * equity - STARTING_STACK  # The pusher's winnings when called, by class matchup
+    push_gain = (pushed[:, None] * pairs.sum(axis=1)  # Folding loses what the pusher put in
+                 + called[:, None] * ((1 - call) @ pairs.T) + call @ (pairs * showdown).T)
+    call_gain = called[:, None] * (push @ pairs) - push @ (pairs * showdown)
+    return push_gain, call_gain
+
+def solve(n_iterations=2000):
+    """
+    Runs fictitious play on every game at once and returns the pushed and called contributions of each game and the
+    average push and call strategies, (n_games, 169), along with the exploitability of each game in chips per hand.
+    """
+    equity, pairs = preflop_table.load_matrix()
+    pushed, called = games()
+    push = np.ones((len(pushed), preflop_table.N_CLASSES))
+    call = np.ones((len(pushed), preflop_table.N_CLASSES))
+
+    for iteration in range(1, n_iterations + 1):
+        push_gain, call_gain = best_responses(pushed, called, push, call, equity, pairs)
+        push += ((push_gain > 0) - push) / (iteration + 1)
+        call += ((call_gain > 0) - call) / (iteration + 1)
+
+    push_gain, call_gain = best_responses(pushed, called, push, call, equity, pairs)
+    exploitability = (np.maximum(push_gain, 0).sum(axis=1) - (push * push_gain).sum(axis=1)
+                      + np.maximum(call_gain, 0).sum(axis=1) - (call * call_gain).sum(axis=1)) / pairs.sum()
+    return pushed, called, push, call, exploitability
+
+def save(pushed, called, push, call, path='push_fold.npz'):
+    """
+    Writes the charts as frequencies in 255ths, indexed by the grid indices of the pushed and called contributions and
+    the hand class.
+    """
+    shape = (len(GRID), len(GRID), preflop_table.N_CLASSES)
+    push_chart = np.zeros(shape, dtype=np.uint8)
+    call_chart = np.zeros(shape, dtype=np.uint8)
+    rows, columns = np.searchsorted(GRID, pushed), np.searchsorted(GRID, called)
+    push_chart[rows, columns] = np.rint(255 * push)
+    call_chart[rows, columns] = np.rint(255 * call)
+    np.savez_compressed(path, push=push_chart, call=call_chart)
+
+_load_lock = threading.Lock()
+_charts = None
+
+def load_charts(path='push_fold.npz'):
+    """
+    Returns the push and call charts as probabilities, (len(GRID), len(GRID), 169), loading them the first time they are
+    needed.
+    """
+    global _charts
+
+    with _load_lock:  # Bots on other threads can ask at the same time, and must not load twice
+        if _charts is None:
+            with np.load(path) as data:
+                _charts = (data['push'] / 255, data['call'] / 255)
+
+    return _charts
+
+def push_frequency(hand_class, pushed, called):
+    """
+    Returns how often to go all in with a hand class, having put in pushed chips and facing called.
+    """
+    return load_charts()[0][GRID_INDEX[pushed], GRID_INDEX[called], hand_class]
+
+def call_frequency(hand_class, pushed, called):
+    """
+    Returns how often to call an all in with a hand class, having put in called chips against an opponent who had put in
+    pushed chips before going all in.
+    """
+    return load_charts()[1][GRID_INDEX[pushed], GRID_INDEX[called], hand_class]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python3 push_fold.py')
+    parser.add_argument('--iterations', type=int, default=2000, help='Number of fictitious play iterations')
+    args = parser.parse_args()
+
+    start = time.time()
+    pushed, called, push, call, exploitability = solve(args.iterations)
+    save(pushed, called, push, call)
+    print(f"Solved {len(pushed)} games in {time.time() - start:.0f}s, "
+          f"worst exploitability {exploitability.max():.4f} chips/hand")
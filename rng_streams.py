@@ -0,0 +1,34 @@
+"""
+Independent random number streams for each component of a bot, all derived from one match seed.
+
+Every component (dealing, equity simulations, bet sizing, strategy sampling) draws from its own numpy Generator, so a
+match can be replayed exactly from its seed, and two versions of a bot given the same seed see the same random numbers
+in every component they have in common. A stream depends only on the match seed and the component's name, not on the
+order in which streams are created.
+"""
+
+import zlib
+
+import numpy as np
+
+class Streams:
+    """
+    A lazily created numpy Generator per component name, derived from one match seed. Streams(None) seeds from fresh
+    entropy, and the seed it picked is kept in self.seed so the match can be reproduced.
+    """
+
+    def __init__(self, seed=None):
+        self.root = np.random.SeedSequence(seed)
+        self.seed = self.root.entropy
+        self.generators = {}
+
+    def __getitem__(self, component):
+        """
+        Returns the Generator for component, creating it the first time it is asked for.
+        """
+        if component not in self.generators:
+            key = zlib.crc32(component.encode())  # A stable key for the name, unlike hash()
+            sequence = np.random.SeedSequence(self.seed, spawn_key=(key,))
+            self.generators[component] = np.random.Generator(np.random.PCG64(sequence))
+
+        return self.generators[component]
@@ -6,5 +6,5 @@ from distutils.core import setup
 from Cython.Build import cythonize
 
 setup(
-    ext_modules=cythonize("equity_calc.pyx"),
+    ext_modules=cythonize("equity_calc.pyx", force=True),  # Always regenerate equity_calc.c from the .pyx source
 )
\ No newline at end of file
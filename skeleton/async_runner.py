@@ -0,0 +1,92 @@
+'''
+An asyncio based alternative to runner.py that hosts many games in one process.
+
+Each game is an independent Bot instance talking to its own engine socket, while module-level tables are loaded once
+and shared by every bot. Packets are read on the event loop and handed to a bounded pool of worker threads, so the
+bots' equity calculations (whose kernels release the GIL) run concurrently without one thread per game.
+
+Usage: python3 -m skeleton.async_runner player:Player 5001 5002 5003
+'''
+import argparse
+import asyncio
+import importlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from .bot import Bot
+from .runner import PacketHandler, encode
+
+
+async def run_session(pokerbot, host, port, executor):
+    '''
+    Plays one game against the engine at host:port. Packets are handled in order on the executor.
+    '''
+    assert isinstance(pokerbot, Bot)
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        print('Could not connect to {}:{}'.format(host, port))
+        return
+    loop = asyncio.get_running_loop()
+    handler = PacketHandler(pokerbot)
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            packet = line.decode().strip().split(' ')
+            action = await loop.run_in_executor(executor, handler.handle_packet, packet)
+            if action is None:
+                break
+            writer.write(encode(action).encode())
+            await writer.drain()
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def run_sessions(bot_factory, host, ports, n_workers=None, seed=None):
+    '''
+    Plays one game per port concurrently, each with a new bot from bot_factory, sharing at most n_workers threads. If a
+    seed is given, the bot for the i-th port is built with bot_factory(seed + i).
+    '''
+    n_workers = n_workers or os.cpu_count() or 1
+    seeds = [()] * len(ports) if seed is None else [(seed + i,) for i in range(len(ports))]
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(n_workers) as executor:
+        # Bots load the shared tables on their first actions, in run_session's threads. The loaders are guarded by
+        # locks, so whichever bot gets there first loads each table once and the others wait for it
+        bots = [await loop.run_in_executor(executor, bot_factory, *bot_seed) for bot_seed in seeds]
+        await asyncio.gather(*[run_session(bot, host, port, executor) for bot, port in zip(bots, ports)])
+
+
+def run_bots(bot_factory, args):
+    '''
+    Runs one bot per port in args.ports.
+    '''
+    asyncio.run(run_sessions(bot_factory, args.host, args.ports, args.workers, args.seed))
+
+
+def load_factory(path):
+    '''
+    Imports a bot class given as module:Class.
+    '''
+    module, name = path.split(':')
+    return getattr(importlib.import_module(module), name)
+
+
+def parse_args():
+    '''
+    Parses arguments corresponding to the bot class and the socket connection information of every game.
+    '''
+    parser = argparse.ArgumentParser(prog='python3 -m skeleton.async_runner')
+    parser.add_argument('bot', type=str, help='Bot class to play with, as module:Class')
+    parser.add_argument('--host', type=str, default='localhost', help='Host to connect to, defaults to localhost')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker threads, defaults to all cores')
+    parser.add_argument('--seed', type=int, default=None, help='Match seed of the first game, the next games count up')
+    parser.add_argument('ports', type=int, nargs='+', help='Ports on host to connect to, one game per port')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    run_bots(load_factory(args.bot), args)
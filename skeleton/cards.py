@@ -0,0 +1,22 @@
+'''
+The canonical integer representation of cards. Every card is an id in 0..51 equal to 4 * rank + suit, with ranks
+ordered 23456789TJQKA and suits ordered shdc, matching the order of equity_calc.Deck.GetFullDeck.
+'''
+
+RANKS = '23456789TJQKA'
+SUITS = 'shdc'
+
+STR_TO_ID = {rank + suit: 4 * i + j for i, rank in enumerate(RANKS) for j, suit in enumerate(SUITS)}
+ID_TO_STR = [rank + suit for rank in RANKS for suit in SUITS]
+
+def parse_cards(cards):
+    '''
+    Converts a comma separated list of cards sent by the engine into a list of card ids.
+    '''
+    return [STR_TO_ID[card] for card in cards.split(',')]
+
+def to_str(cards):
+    '''
+    Converts a list of card ids back into their string representations.
+    '''
+    return [ID_TO_STR[card] for card in cards]
@@ -0,0 +1,189 @@
+'''
+A compact binary log of every hand played, with a streaming reader.
+
+Each hand is one fixed size record of RECORD_DTYPE, appended after a short header, so a log can be memory mapped as a
+NumPy structured array and read in batches without loading it. Cards are ids as in cards.py (-1 where unknown), and
+each action is packed into 16 bits: its kind in the top bits and the raise amount, if any, in the low bits. The seat of
+each action follows from replaying them from the blinds with RoundState.
+
+HandLog fills records in a preallocated buffer and hands full buffers to a background thread for writing, so the only
+work on the action path is a few assignments at the end of each hand.
+'''
+import os
+import queue
+import threading
+from collections import namedtuple
+
+import numpy as np
+from .actions import FoldAction, CallAction, CheckAction, RaiseAction
+
+MAGIC = b'PBHLOG01'
+HEADER_SIZE = 16  # MAGIC, then the record size as a little endian uint32 and 4 reserved bytes
+MAX_ACTIONS = 32  # Longer hands are truncated and flagged
+
+# Action kinds, stored in the top bits of each packed action
+FOLD, CALL, CHECK, RAISE = range(4)
+KIND_SHIFT = 12
+AMOUNT_MASK = (1 << KIND_SHIFT) - 1
+ACTION_TYPES = [FoldAction, CallAction, CheckAction, RaiseAction]
+
+TRUNCATED = 1  # Flag set when the hand had more than MAX_ACTIONS actions
+
+RECORD_DTYPE = np.dtype([
+    ('round_num', '<u2'),
+    ('active', 'u1'),  # Our seat, 0 for the small blind
+    ('flags', 'u1'),
+    ('hand', 'i1', 2),
+    ('opp_hand', 'i1', 2),  # -1 unless shown at showdown
+    ('board', 'i1', 5),  # -1 for cards not dealt
+    ('n_actions', 'u1'),
+    ('actions', '<u2', MAX_ACTIONS),
+    ('delta', '<i2'),  # Our winnings in the hand
+    ('clock', '<f4'),  # Seconds left on our game clock at the end of the hand
+    ('bankroll', '<i4'),  # Our bankroll after the hand
+])
+
+Hand = namedtuple('Hand', ['round_num', 'active', 'hand', 'opp_hand', 'board', 'actions', 'delta', 'clock', 'bankroll',
+                           'truncated'])
+
+
+def pack_action(action):
+    '''
+    Packs a skeleton action into 16 bits.
+    '''
+    kind = ACTION_TYPES.index(type(action))
+    return (kind << KIND_SHIFT) | (action.amount if kind == RAISE else 0)
+
+
+def unpack_action(code):
+    '''
+    Unpacks 16 bits into a skeleton action.
+    '''
+    kind = code >> KIND_SHIFT
+    return RaiseAction(code & AMOUNT_MASK) if kind == RAISE else ACTION_TYPES[kind]()
+
+
+class HandLog():
+    '''
+    Appends hands to a log file through a buffer of buffer_size records, written by a background thread.
+    '''
+
+    def __init__(self, path, buffer_size=256):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.buffer = np.zeros(buffer_size, dtype=RECORD_DTYPE)
+        self.n_buffered = 0
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            check_header(path)
+            self.file = open(path, 'ab')
+        else:
+            self.file = open(path, 'wb')
+            self.file.write(header())
+
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.write_loop, daemon=True)
+        self.thread.start()
+
+    def record(self, round_num, active, hand, opp_hand, board, actions, delta, clock, bankroll):
+        '''
+        Adds a hand to the buffer. Cards are lists of card ids (empty if unknown) and actions are packed actions.
+        '''
+        record = self.buffer[self.n_buffered]
+        record['round_num'] = round_num
+        record['active'] = active
+        record['flags'] = TRUNCATED if len(actions) > MAX_ACTIONS else 0
+        record['hand'] = hand
+        record['opp_hand'] = opp_hand if opp_hand else -1
+        record['board'][:len(board)] = board
+        record['board'][len(board):] = -1
+        n_actions = min(len(actions), MAX_ACTIONS)
+        record['n_actions'] = n_actions
+        record['actions'][:n_actions] = actions[:n_actions]
+        record['actions'][n_actions:] = 0
+        record['delta'] = delta
+        record['clock'] = clock
+        record['bankroll'] = bankroll
+
+        self.n_buffered += 1
+        if self.n_buffered == self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        '''
+        Hands the buffered records to the writer thread.
+        '''
+        if self.n_buffered > 0:
+            self.queue.put(self.buffer[:self.n_buffered].tobytes())
+            self.n_buffered = 0
+
+    def write_loop(self):
+        while True:
+            data = self.queue.get()
+            if data is None:
+                break
+            self.file.write(data)
+
+    def close(self):
+        '''
+        Writes every buffered record and closes the file.
+        '''
+        self.flush()
+        self.queue.put(None)
+        self.thread.join()
+        self.file.close()
+
+
+def header():
+    return MAGIC + np.array([RECORD_DTYPE.itemsize, 0], dtype='<u4').tobytes()
+
+
+def check_header(path):
+    '''
+    Raises a ValueError if the file is not a hand log written with the current record layout.
+    '''
+    with open(path, 'rb') as file:
+        data = file.read(HEADER_SIZE)
+    if data[:len(MAGIC)] != MAGIC or np.frombuffer(data[len(MAGIC):], dtype='<u4')[0] != RECORD_DTYPE.itemsize:
+        raise ValueError('{} is not a hand log with the current record layout'.format(path))
+
+
+def read(path):
+    '''
+    Memory maps a log as a read-only structured array of records. A partly written last record is left out.
+    '''
+    check_header(path)
+    n_records = (os.path.getsize(path) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+    if n_records == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE, shape=(n_records,))
+
+
+def batches(path, batch_size=65536):
+    '''
+    Yields the records of a log as structured arrays of up to batch_size records, each a view of the memory map.
+    '''
+    records = read(path)
+    for start in range(0, len(records), batch_size):
+        yield records[start:start + batch_size]
+
+
+def decode(record):
+    '''
+    Converts a record into a Hand, with cards as lists of card ids and actions as skeleton actions.
+    '''
+    return Hand(int(record['round_num']), int(record['active']), [int(card) for card in record['hand']],
+                [int(card) for card in record['opp_hand'] if card >= 0],
+                [int(card) for card in record['board'] if card >= 0],
+                [unpack_action(int(code)) for code in record['actions'][:record['n_actions']]],
+                int(record['delta']), float(record['clock']), int(record['bankroll']),
+                bool(record['flags'] & TRUNCATED))
+
+
+def hands(path, batch_size=65536):
+    '''
+    Yields every hand of a log as a Hand, reading the log in batches.
+    '''
+    for batch in batches(path, batch_size):
+        for record in batch:
+            yield decode(record)
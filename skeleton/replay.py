@@ -0,0 +1,85 @@
+'''
+Replays a transcript recorded with --transcript through Runner.run, without an engine.
+
+The bot receives the recorded packets, game clock included, so a bot seeded as in the recorded game takes the same
+decisions again. Every action it sends is checked against the recording, and every get_action call is timed, which
+makes slow or wrong decisions reproducible offline and profilable. Decisions that depend on wall time (such as the
+subgame solver's iteration count) can differ from the recording.
+
+Usage: python3 -m skeleton.replay player:Player game.transcript --seed 42
+'''
+import argparse
+import time
+import numpy as np
+from .bot import Bot
+from .runner import Runner
+from .async_runner import load_factory
+from .transcript import ReplayFile, read_transcript, response_times
+
+
+class TimedBot(Bot):
+    '''
+    Passes every call through to pokerbot, timing each get_action.
+    '''
+
+    def __init__(self, pokerbot):
+        self.pokerbot = pokerbot
+        self.timings = []  # (round number, seconds) of every get_action call
+
+    def handle_new_round(self, game_state, round_state, active):
+        self.pokerbot.handle_new_round(game_state, round_state, active)
+
+    def handle_round_over(self, game_state, terminal_state, active):
+        self.pokerbot.handle_round_over(game_state, terminal_state, active)
+
+    def get_action(self, game_state, round_state, active):
+        start = time.perf_counter()
+        action = self.pokerbot.get_action(game_state, round_state, active)
+        self.timings.append((game_state.round_num, time.perf_counter() - start))
+        return action
+
+
+def replay(pokerbot, path):
+    '''
+    Plays the transcript at path against pokerbot. Returns the mismatched packets, as in ReplayFile, and the round
+    number and duration of every get_action call.
+    '''
+    socketfile = ReplayFile(read_transcript(path))
+    bot = TimedBot(pokerbot)
+    Runner(bot, socketfile).run()
+    return socketfile.mismatches, bot.timings
+
+
+def report(mismatches, timings, recorded, n_slowest=5):
+    '''
+    Prints the mismatches and a summary of the replayed and recorded decision times.
+    '''
+    for index, received, expected, actual in mismatches:
+        print('Packet {} after {}: recorded {}, replayed {}'.format(index, received, expected, actual))
+    print('{} mismatched packets'.format(len(mismatches)))
+
+    seconds = np.array([duration for _, duration in timings])
+    for name, times in [('Replayed get_action', seconds), ('Recorded response', np.array(recorded))]:
+        if len(times) > 0:
+            p50, p90, p99 = 1000 * np.percentile(times, [50, 90, 99])
+            print('{:<20}{:>6} calls, p50 {:.2f} ms, p90 {:.2f} ms, p99 {:.2f} ms, max {:.2f} ms, total {:.2f} s'.format(
+                name, len(times), p50, p90, p99, 1000 * times.max(), times.sum()))
+
+    for i in np.argsort(-seconds)[:n_slowest]:
+        print('Round {}: {:.2f} ms'.format(timings[i][0], 1000 * seconds[i]))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python3 -m skeleton.replay')
+    parser.add_argument('bot', type=str, help='Bot class to replay with, as module:Class')
+    parser.add_argument('transcript', type=str, help='Transcript recorded with --transcript')
+    parser.add_argument('--seed', type=int, default=None, help='Match seed the recorded bot was started with')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    bot_factory = load_factory(args.bot)
+    pokerbot = bot_factory() if args.seed is None else bot_factory(args.seed)
+    mismatches, timings = replay(pokerbot, args.transcript)
+    report(mismatches, timings, response_times(read_transcript(args.transcript)))
@@ -7,6 +7,9 @@ from .actions import FoldAction, CallAction, CheckAction, RaiseAction
 from .states import GameState, TerminalState, RoundState
 from .states import STARTING_STACK, BIG_BLIND, SMALL_BLIND
 from .bot import Bot
+from .cards import parse_cards
+from .hand_log import HandLog, pack_action
+from .transcript import RecordingFile
 
 
 class Runner():
@@ -14,9 +17,10 @@ class Runner():
     Interacts with the engine.
     '''
 
-    def __init__(self, pokerbot, socketfile):
+    def __init__(self, pokerbot, socketfile, log=None):
         self.pokerbot = pokerbot
         self.socketfile = socketfile
+        self.handler = PacketHandler(pokerbot, log)
 
     def receive(self):
         '''
@@ -32,78 +36,126 @@ class Runner():
         '''
         Encodes an action and sends it to the engine.
         '''
-        if isinstance(action, FoldAction):
-            code = 'F'
-        elif isinstance(action, CallAction):
-            code = 'C'
-        elif isinstance(action, CheckAction):
-            code = 'K'
-        else:  # isinstance(action, RaiseAction)
-            code = 'R' + str(action.amount)
-        self.socketfile.write(code + '\n')
+        self.socketfile.write(encode(action))
         self.socketfile.flush()
 
     def run(self):
         '''
         Reconstructs the game tree based on the action history received from the engine.
         '''
-        game_state = GameState(0, 0., 1)
-        round_state = None
-        active = 0
-        round_flag = True
         for packet in self.receive():
-            for clause in packet:
-                if clause[0] == 'T':
-                    game_state = GameState(game_state.bankroll, float(clause[1:]), game_state.round_num)
-                elif clause[0] == 'P':
-                    active = int(clause[1:])
-                elif clause[0] == 'H':
-                    hands = [[], []]
-                    hands[active] = clause[1:].split(',')
-                    pips = [SMALL_BLIND, BIG_BLIND]
-                    stacks = [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND]
-                    round_state = RoundState(0, 0, pips, stacks, hands, [], None)
-                    if round_flag:
-                        self.pokerbot.handle_new_round(game_state, round_state, active)
-                        round_flag = False
-                elif clause[0] == 'F':
-                    round_state = round_state.proceed(FoldAction())
-                elif clause[0] == 'C':
-                    round_state = round_state.proceed(CallAction())
-                elif clause[0] == 'K':
-                    round_state = round_state.proceed(CheckAction())
-                elif clause[0] == 'R':
-                    round_state = round_state.proceed(RaiseAction(int(clause[1:])))
-                elif clause[0] == 'B':
-                    round_state = RoundState(round_state.button, round_state.street, round_state.pips, round_state.stacks,
-                                             round_state.hands, clause[1:].split(','), round_state.previous_state)
-                elif clause[0] == 'O':
-                    # backtrack
-                    round_state = round_state.previous_state
-                    revised_hands = list(round_state.hands)
-                    revised_hands[1-active] = clause[1:].split(',')
-                    # rebuild history
-                    round_state = RoundState(round_state.button, round_state.street, round_state.pips, round_state.stacks,
-                                             revised_hands, round_state.deck, round_state.previous_state)
-                    round_state = TerminalState([0, 0], round_state)
-                elif clause[0] == 'D':
-                    assert isinstance(round_state, TerminalState)
-                    delta = int(clause[1:])
-                    deltas = [-delta, -delta]
-                    deltas[active] = delta
-                    round_state = TerminalState(deltas, round_state.previous_state)
-                    game_state = GameState(game_state.bankroll + delta, game_state.game_clock, game_state.round_num)
-                    self.pokerbot.handle_round_over(game_state, round_state, active)
-                    game_state = GameState(game_state.bankroll, game_state.game_clock, game_state.round_num + 1)
-                    round_flag = True
-                elif clause[0] == 'Q':
-                    return
-            if round_flag:  # ack the engine
-                self.send(CheckAction())
-            else:
-                assert active == round_state.button % 2
-                action = self.pokerbot.get_action(game_state, round_state, active)
-                self.send(action)
+            action = self.handler.handle_packet(packet)
+            if action is None:
+                return
+            self.send(action)
+
+
+class PacketHandler():
+    '''
+    Reconstructs the game tree one packet at a time and asks the pokerbot for its actions. Holds all the state of a
+    single game, so it can be driven by a blocking socket or by an event loop. If a HandLog is given, every hand is
+    recorded to it when the round ends.
+    '''
+
+    def __init__(self, pokerbot, log=None):
+        self.pokerbot = pokerbot
+        self.log = log
+        self.game_state = GameState(0, 0., 1)
+        self.round_state = None
+        self.active = 0
+        self.round_flag = True
+        self.actions = []  # The packed actions of the current round, for the log
+
+    def handle_packet(self, packet):
+        '''
+        Applies every clause of a packet from the engine. Returns the action to send back, or None if the game is over.
+        '''
+        game_state = self.game_state
+        round_state = self.round_state
+        active = self.active
+        for clause in packet:
+            if clause[0] == 'T':
+                game_state = GameState(game_state.bankroll, float(clause[1:]), game_state.round_num)
+            elif clause[0] == 'P':
+                active = int(clause[1:])
+            elif clause[0] == 'H':
+                hands = [[], []]
+                hands[active] = parse_cards(clause[1:])
+                pips = [SMALL_BLIND, BIG_BLIND]
+                stacks = [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND]
+                round_state = RoundState(0, 0, pips, stacks, hands, [], None)
+                self.actions = []
+                if self.round_flag:
+                    self.pokerbot.handle_new_round(game_state, round_state, active)
+                    self.round_flag = False
+            elif clause[0] in 'FCKR':
+                action = decode(clause)
+                self.actions.append(pack_action(action))
+                round_state = round_state.proceed(action)
+            elif clause[0] == 'B':
+                round_state = RoundState(round_state.button, round_state.street, round_state.pips, round_state.stacks,
+                                         round_state.hands, parse_cards(clause[1:]), round_state.previous_state)
+            elif clause[0] == 'O':
+                # backtrack
+                round_state = round_state.previous_state
+                revised_hands = list(round_state.hands)
+                revised_hands[1-active] = parse_cards(clause[1:])
+                # rebuild history
+                round_state = RoundState(round_state.button, round_state.street, round_state.pips, round_state.stacks,
+                                         revised_hands, round_state.deck, round_state.previous_state)
+                round_state = TerminalState([0, 0], round_state)
+            elif clause[0] == 'D':
+                assert isinstance(round_state, TerminalState)
+                delta = int(clause[1:])
+                deltas = [-delta, -delta]
+                deltas[active] = delta
+                round_state = TerminalState(deltas, round_state.previous_state)
+                game_state = GameState(game_state.bankroll + delta, game_state.game_clock, game_state.round_num)
+                if self.log is not None:
+                    final_state = round_state.previous_state
+                    self.log.record(game_state.round_num, active, final_state.hands[active],
+                                    final_state.hands[1-active], final_state.deck, self.actions, delta,
+                                    game_state.game_clock, game_state.bankroll)
+                self.pokerbot.handle_round_over(game_state, round_state, active)
+                game_state = GameState(game_state.bankroll, game_state.game_clock, game_state.round_num + 1)
+                self.round_flag = True
+            elif clause[0] == 'Q':
+                return None
+        self.game_state = game_state
+        self.round_state = round_state
+        self.active = active
+        if self.round_flag:  # ack the engine
+            return CheckAction()
+        assert active == round_state.button % 2
+        return self.pokerbot.get_action(game_state, round_state, active)
+
+
+def decode(clause):
+    '''
+    Decodes an action clause of the engine protocol.
+    '''
+    if clause[0] == 'F':
+        return FoldAction()
+    if clause[0] == 'C':
+        return CallAction()
+    if clause[0] == 'K':
+        return CheckAction()
+    return RaiseAction(int(clause[1:]))
+
+
+def encode(action):
+    '''
+    Encodes an action as a line of the engine protocol.
+    '''
+    if isinstance(action, FoldAction):
+        code = 'F'
+    elif isinstance(action, CallAction):
+        code = 'C'
+    elif isinstance(action, CheckAction):
+        code = 'K'
+    else:  # isinstance(action, RaiseAction)
+        code = 'R' + str(action.amount)
+    return code + '\n'
 
 
 def parse_args():
@@ -112,6 +164,16 @@ def parse_args():
     '''
     parser = argparse.ArgumentParser(prog='python3 player.py')
     parser.add_argument('--host', type=str, default='localhost', help='Host to connect to, defaults to localhost')
+    parser.add_argument('--startup-report', action='store_true', help='Print the time spent in each phase of startup')
+    parser.add_argument('--seed', type=int, default=None, help='Match seed for the bot\'s random streams')
+    parser.add_argument('--solver', action='store_true', help='Solve turn and river decisions in real time')
+    parser.add_argument('--log', type=str, default=None, help='Append every hand played to this hand log')
+    parser.add_argument('--transcript', type=str, default=None,
+                        help='Record every packet exchanged with the engine to this file, see skeleton/replay.py')
+    parser.add_argument('--equity-socket', type=str, default=None,
+                        help='Compute post-flop equities with the equity service listening on this socket')
+    parser.add_argument('--rank-sampling', action='store_true',
+                        help='Average post-flop equities over rank orders consistent with the rules learned so far')
     parser.add_argument('port', type=int, help='Port on host to connect to')
     return parser.parse_args()
 
@@ -126,7 +188,15 @@ def run_bot(pokerbot, args):
         print('Could not connect to {}:{}'.format(args.host, args.port))
         return
     socketfile = sock.makefile('rw')
-    runner = Runner(pokerbot, socketfile)
-    runner.run()
-    socketfile.close()
-    sock.close()
+    transcript = RecordingFile(socketfile, args.transcript) if args.transcript else None
+    log = HandLog(args.log) if args.log else None
+    runner = Runner(pokerbot, transcript or socketfile, log)
+    try:
+        runner.run()
+    finally:  # Keep the buffered hands and packets even if the game ended in an error
+        if log is not None:
+            log.close()
+        if transcript is not None:
+            transcript.close()
+        socketfile.close()
+        sock.close()
@@ -0,0 +1,97 @@
+'''
+Timestamped transcripts of the packets exchanged with the engine, and a fake socket file that plays one back.
+
+A transcript is a text file with one line per packet: the seconds since the game started, '<' for a packet received
+from the engine or '>' for one sent to it, and the packet itself. RecordingFile writes it while passing every read and
+write through to the real socket file, and ReplayFile feeds the received packets back to a Runner without a socket,
+comparing what the bot sends with what was recorded. See replay.py.
+'''
+import time
+from collections import deque
+
+RECEIVED = '<'
+SENT = '>'
+
+
+class RecordingFile():
+    '''
+    Wraps the socket file of a game, writing every packet read or written to a transcript at path.
+    '''
+
+    def __init__(self, socketfile, path):
+        self.socketfile = socketfile
+        self.file = open(path, 'w')
+        self.start = time.perf_counter()
+
+    def record(self, direction, line):
+        self.file.write('{:.6f} {} {}\n'.format(time.perf_counter() - self.start, direction, line.rstrip('\n')))
+
+    def readline(self):
+        line = self.socketfile.readline()
+        self.record(RECEIVED, line)
+        return line
+
+    def write(self, data):
+        self.record(SENT, data)
+        self.socketfile.write(data)
+
+    def flush(self):
+        self.socketfile.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def read_transcript(path):
+    '''
+    Returns the packets of a transcript as a list of (seconds, direction, packet).
+    '''
+    events = []
+    with open(path) as file:
+        for line in file:
+            fields = line.rstrip('\n').split(' ', 2)
+            events.append((float(fields[0]), fields[1], fields[2] if len(fields) > 2 else ''))
+    return events
+
+
+def response_times(events):
+    '''
+    Returns the seconds between each action sent and the packet received just before it, as recorded. The checks that
+    acknowledge the end of a round are left out.
+    '''
+    times = []
+    last_received, acknowledging = 0., False
+    for seconds, direction, packet in events:
+        if direction == RECEIVED:
+            last_received, acknowledging = seconds, packet.split(' ')[-1][:1] == 'D'
+        elif not acknowledging:
+            times.append(seconds - last_received)
+    return times
+
+
+class ReplayFile():
+    '''
+    Stands in for a socket file, reading the received packets of a transcript in order and checking every packet
+    written against the next sent one. Once the transcript runs out, the game is ended with a quit packet.
+    '''
+
+    def __init__(self, events):
+        self.received = deque(packet for _, direction, packet in events if direction == RECEIVED)
+        self.sent = deque(packet for _, direction, packet in events if direction == SENT)
+        self.last_packet = None
+        self.n_written = 0
+        self.mismatches = []  # (index of the packet sent, packet received before it, packet recorded, packet written)
+
+    def readline(self):
+        self.last_packet = self.received.popleft() if self.received else 'Q'
+        return self.last_packet + '\n'
+
+    def write(self, data):
+        expected = self.sent.popleft() if self.sent else None
+        actual = data.rstrip('\n')
+        if actual != expected:
+            self.mismatches.append((self.n_written, self.last_packet, expected, actual))
+        self.n_written += 1
+
+    def flush(self):
+        pass
@@ -0,0 +1,24 @@
+"""
+A utility to measure how long each phase of startup takes, from the moment this module is imported. Import it before
+anything else, call mark at the end of each phase and report to print the time spent in every phase.
+"""
+
+import time
+
+START = time.perf_counter()
+phases = []  # (name, seconds) for each phase marked so far
+
+def mark(name):
+    """
+    Ends the current phase, recording the time since the previous mark (or since import) under name.
+    """
+    elapsed = time.perf_counter() - START
+    phases.append((name, elapsed - sum(seconds for _, seconds in phases)))
+
+def report():
+    """
+    Prints the time spent in each phase and in total.
+    """
+    for name, seconds in phases:
+        print('{:<24}{:>8.1f} ms'.format(name, 1000 * seconds))
+    print('{:<24}{:>8.1f} ms'.format('total', 1000 * sum(seconds for _, seconds in phases)))
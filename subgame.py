@@ -0,0 +1,227 @@
+"""
+A real-time solver for the rest of a hand from the turn or the river.
+
+The betting subtree is built from the current RoundState with abstract_game.Tree, so every node offers the four
+abstract actions of act_utils.act at their average sizes. Instead of card buckets, both players hold a range over the
+1326 holdings of equity_calc.HOLDINGS, and CFR+ is run on whole range vectors: one walk of the tree per player and
+iteration updates the regrets of every holding at once. Showdowns are settled against the opponent's reach by sorting
+the holdings by score once per river, so a showdown costs O(1326) per walk, with card removal handled through the 51
+holdings that contain each card. From the turn, each iteration samples a few river cards and keeps separate regrets for
+the river nodes under each card.
+
+The solver keeps its tree and regrets for the whole hand. When the next decision is a node of the tree already solved
+(the opponent checked, called or we bet at the tree's own sizes), the regrets found so far are kept and the iterations
+go on from that node with the updated ranges.
+"""
+
+import time
+
+import numpy as np
+import abstract_game
+
+from equity_calc import HOLDINGS, HOLDINGS_WITH_CARD
+
+N_HOLDINGS = len(HOLDINGS)
+HOLDING_HAS_CARD = (HOLDINGS[None, :, :] == np.arange(52)[:, None, None]).any(axis=2)  # (52, 1326)
+
+def unblocked(reach):
+    """
+    Returns, for every holding, the total reach of the holdings that share no card with it.
+    """
+    with_card = reach[HOLDINGS_WITH_CARD].sum(axis=1)
+    return reach.sum() - with_card[HOLDINGS[:, 0]] - with_card[HOLDINGS[:, 1]] + reach
+
+class Showdown:
+    """
+    The holdings of one river board sorted by score, so that the result of every holding against a range is a few
+    cumulative sums.
+    """
+
+    def __init__(self, evaluator, board):
+        scores = evaluator.score_holdings(np.array([board]))[0].astype(np.int64)
+        self.live = scores > 0
+        scores[~self.live] = np.iinfo(np.int64).max  # Dead holdings have no reach, keep them out of the way
+
+        self.order = np.argsort(scores, kind='stable')
+        ordered = scores[self.order]
+        self.better = np.searchsorted(ordered, scores, side='left')  # Holdings that beat each holding (lower scores)
+        self.not_worse = np.searchsorted(ordered, scores, side='right')
+
+        # The same positions among the 51 holdings that contain each card, as flat indices into a (52, 52) table of
+        # cumulative sums whose first column is 0
+        card_scores = scores[HOLDINGS_WITH_CARD]
+        card_order = np.argsort(card_scores, axis=1, kind='stable')
+        self.card_holdings = np.take_along_axis(HOLDINGS_WITH_CARD, card_order, axis=1)
+        card_ordered = np.take_along_axis(card_scores, card_order, axis=1)
+        self.card_better = []
+        self.card_worse = []
+        for column in range(2):
+            cards = HOLDINGS[:, column]
+            rows = card_ordered[cards]
+            self.card_better.append(52 * cards + (rows < scores[:, None]).sum(axis=1))
+            self.card_worse.append(52 * cards + (rows <= scores[:, None]).sum(axis=1))
+        self.card_totals = [52 * HOLDINGS[:, column] + 51 for column in range(2)]
+
+    def values(self, reach):
+        """
+        Returns, for every holding, the opponent reach it beats minus the reach it loses to, over the opponent holdings
+        that share no card with it.
+        """
+        reach = reach * self.live
+        cumulative = np.concatenate(([0], np.cumsum(reach[self.order])))
+        better = cumulative[self.better]
+        worse = cumulative[-1] - cumulative[self.not_worse]
+
+        card_cumulative = np.zeros((52, 52))
+        np.cumsum(reach[self.card_holdings], axis=1, out=card_cumulative[:, 1:])
+        card_cumulative = card_cumulative.ravel()
+        for column in range(2):  # The holding ties itself, so it is never removed twice
+            better -= card_cumulative[self.card_better[column]]
+            worse -= card_cumulative[self.card_totals[column]] - card_cumulative[self.card_worse[column]]
+
+        return (worse - better) * self.live
+
+class SubgameSolver:
+    """
+    Solves the rest of the current hand with CFR+ on range vectors, reusing the tree and regrets between the decisions
+    of one hand. Cards are card ids under the predicted permutation, like RangeTracker's.
+    """
+
+    def __init__(self, evaluator, rng=None, n_rivers=4, min_budget=.005, max_budget=.5):
+        self.evaluator = evaluator
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.n_rivers = n_rivers  # River cards sampled per iteration when solving from the turn
+        self.min_budget = min_budget  # Seconds, at least one iteration is always run
+        self.max_budget = max_budget
+        self.iteration_seconds = {}  # The time of the latest iteration from each street, kept between hands
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets the tree, regrets and showdowns of the previous hand, to be called at the start of every hand.
+        """
+        self.tree = None
+        self.board = None  # The board the tree was built on
+        self.tables = {}  # (node index, river card or None) to [regret sums, strategy sums], each (1326, children)
+        self.showdowns = {}  # River card to Showdown
+        self.iterations = 0
+
+    def budget(self, game_clock, rounds_left, share=.5):
+        """
+        Returns the seconds to spend on a decision: a share of the time left per remaining hand, within the limits.
+        """
+        return min(max(share * game_clock / max(rounds_left, 1), self.min_budget), self.max_budget)
+
+    def solve(self, round_state, board, hand, ranges, budget):
+        """
+        Runs CFR+ from the current decision until budget seconds have passed and returns the average strategy of the
+        holding hand (an index into HOLDINGS) over the N_ACTIONS abstract actions. Returns None without solving if the
+        budget is shorter than an iteration from this street has been taking.
+
+        board: the board as card ids, 4 or 5 cards.
+        ranges: (2, 1326) weights of each seat's holdings. Holdings that use a board card are ignored.
+        """
+        start = time.perf_counter()
+        deadline = start + budget
+        board = list(board)
+        if budget < self.iteration_seconds.get(round_state.street, 0):
+            return None
+
+        node = self.tree.find(round_state) if self.tree is not None and len(board) >= len(self.board) else None
+
+        if node is None:  # Off the tree (or a new hand), start over from here
+            self.reset()
+            self.tree = abstract_game.Tree(round_state)
+            self.board = board
+            node = self.tree.root
+
+        river = board[4] if len(board) == 5 and len(self.board) == 4 else None  # Dealt since the tree was built
+        ranges = np.asarray(ranges, dtype=float) * ~HOLDING_HAS_CARD[board].any(axis=0)
+        ranges /= np.maximum(ranges.sum(axis=1, keepdims=True), 1e-12)
+
+        while True:
+            self.iterations += 1
+            for player in range(2):
+                self.walk(node, ranges, player, river)
+
+            now = time.perf_counter()
+            self.iteration_seconds[round_state.street] = now - start
+            if now + self.iteration_seconds[round_state.street] >= deadline:  # Another iteration would overrun
+                break
+            start = now
+
+        strategy = np.zeros(abstract_game.N_ACTIONS)
+        regrets, strategy_sums = self.table(node, river)
+        row = strategy_sums[hand] if strategy_sums[hand].sum() > 0 else np.maximum(regrets[hand], 0)
+        row = row / row.sum() if row.sum() > 0 else np.full(len(row), 1 / len(row))
+        for probability, (_, actions) in zip(row, node.distinct()):
+            strategy[actions[0]] = probability  # The first abstract action that leads to each child
+
+        return strategy
+
+    def table(self, node, river):
+        key = (node.index, river)
+        if key not in self.tables:
+            shape = (N_HOLDINGS, len(node.distinct()))
+            self.tables[key] = [np.zeros(shape), np.zeros(shape)]
+        return self.tables[key]
+
+    def showdown(self, river):
+        board = self.board if river is None else self.board + [river]
+        key = board[4]
+        if key not in self.showdowns:
+            self.showdowns[key] = Showdown(self.evaluator, board)
+        return self.showdowns[key]
+
+    def walk(self, node, reach, player, river):
+        """
+        Given both seats' reach (2, 1326), returns the counterfactual value of every holding of player at the node
+        and updates the regrets of player's nodes and the strategy sums of the opponent's.
+        """
+        opponent = 1 - player
+        if node.terminal:
+            if node.showdown:
+                return node.contribution * self.showdown(river).values(reach[opponent])
+            return node.deltas[player] * unblocked(reach[opponent])
+
+        children = node.distinct()
+        regrets, strategy_sums = self.table(node, river)
+        positive = np.maximum(regrets, 0)
+        totals = positive.sum(axis=1, keepdims=True)
+        strategy = np.where(totals > 0, positive / np.where(totals > 0, totals, 1), 1 / len(children))
+
+        if node.player == player:
+            values = np.empty((N_HOLDINGS, len(children)))
+            for i, (child, _) in enumerate(children):
+                child_reach = reach.copy()
+                child_reach[player] = reach[player] * strategy[:, i]
+                values[:, i] = self.walk_child(node, child, child_reach, player, river)
+
+            value = (strategy * values).sum(axis=1)
+            regrets += values - value[:, None]
+            np.maximum(regrets, 0, out=regrets)  # CFR+ keeps regrets non-negative
+            return value
+
+        strategy_sums += self.iterations * reach[opponent][:, None] * strategy  # Linear averaging, as in CFR+
+        value = np.zeros(N_HOLDINGS)
+        for i, (child, _) in enumerate(children):
+            child_reach = reach.copy()
+            child_reach[opponent] = reach[opponent] * strategy[:, i]
+            value += self.walk_child(node, child, child_reach, player, river)
+        return value
+
+    def walk_child(self, node, child, reach, player, river):
+        """
+        Walks a child of a node, dealing the river first if the child is on the next street and the river card is not
+        known yet. River cards are sampled and the child's value is averaged over them.
+        """
+        if child.terminal or child.street == node.street or river is not None or len(self.board) == 5:
+            return self.walk(child, reach, player, river)
+
+        cards = np.setdiff1d(np.arange(52), self.board)
+        rivers = self.rng.choice(cards, min(self.n_rivers, len(cards)), replace=False)
+        value = np.zeros(N_HOLDINGS)
+        for card in rivers:
+            dealt = reach * ~HOLDING_HAS_CARD[card]
+            value += self.walk(child, dealt, player, int(card)) * ~HOLDING_HAS_CARD[card]
+        return value / len(rivers)
@@ -0,0 +1,10 @@
+"""
+Puts the repository root on the path and makes it the working directory, where the bot's modules find their tables.
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
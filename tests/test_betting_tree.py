@@ -0,0 +1,67 @@
+import numpy as np
+import betting_tree
+import pytest
+
+from skeleton.actions import FoldAction, CallAction, CheckAction, RaiseAction
+from skeleton.hand_log import ACTION_TYPES, RAISE
+from skeleton.states import RoundState, TerminalState, STARTING_STACK, BIG_BLIND, SMALL_BLIND
+
+@pytest.fixture(scope='module')
+def tree():
+    return betting_tree.load_tree()
+
+def new_round():
+    return RoundState(0, 0, [SMALL_BLIND, BIG_BLIND], [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND],
+                      [[], []], [], None)
+
+def real_action(tree, node, state, a):
+    """
+    Returns the skeleton action that abstract action a of a node takes in state.
+    """
+    kind = tree.kinds[node, a]
+    if kind != RAISE:
+        return ACTION_TYPES[kind]()
+
+    active = state.button % 2
+    continue_cost = state.pips[1 - active] - state.pips[active]
+    pot_after_continue = 2 * STARTING_STACK - state.stacks[0] - state.stacks[1] + continue_cost
+    return RaiseAction(int(round(state.pips[active] + continue_cost + tree.fractions[node, a] * pot_after_continue)))
+
+def test_pseudo_harmonic_brackets():
+    assert betting_tree.pseudo_harmonic(.5, 1, .5) == pytest.approx(1)
+    assert betting_tree.pseudo_harmonic(.5, 1, 1) == pytest.approx(0)
+    sizes = np.linspace(.5, 1, 11)
+    assert (np.diff(betting_tree.pseudo_harmonic(.5, 1, sizes)) < 0).all()
+    # A bet of 3/4 pot between half pot and pot is read as half pot with probability 3/7
+    assert betting_tree.pseudo_harmonic(.5, 1, .75) == pytest.approx(3 / 7)
+
+def test_passive_actions_translate_exactly(tree):
+    state = new_round()
+    for action in [FoldAction(), CallAction()]:
+        a = np.flatnonzero(tree.kinds[0] == ACTION_TYPES.index(type(action)))[0]
+        assert tree.translate(0, state, action) == tree.children[0, a]
+
+def test_raises_between_sizes_are_mixed(tree):
+    state = new_round()
+    raises = np.flatnonzero(tree.kinds[0] == RAISE)
+    low, high = (real_action(tree, 0, state, a) for a in raises[np.argsort(tree.fractions[0, raises])][:2])
+    middle = RaiseAction((low.amount + high.amount) // 2)
+    assert low.amount < middle.amount < high.amount
+
+    rng = np.random.default_rng(0)
+    children = [tree.translate(0, state, middle, rng) for _ in range(2000)]
+    assert set(children) == {tree.translate(0, state, low), tree.translate(0, state, high)}
+
+def test_history_and_locate_follow_the_tree(tree):
+    rng = np.random.default_rng(1)
+    for _ in range(300):
+        node, state = 0, new_round()
+        while not tree.terminal(node):
+            a = rng.integers(tree.children.shape[1])
+            state = state.proceed(real_action(tree, node, state, a))
+            node = tree.children[node, a]
+            if isinstance(state, TerminalState):
+                assert tree.terminal(node)
+                break
+            assert tree.locate(betting_tree.history(state), rng) == node
+            assert tree.street[node] == state.street
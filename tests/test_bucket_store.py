@@ -0,0 +1,50 @@
+import numpy as np
+import bucket_store
+
+from bucket_store import BucketStore
+
+def random_table(rng, n_buckets=5000, n_used=700):
+    table = np.zeros((n_buckets, 4), dtype=np.float32)
+    used = rng.choice(n_buckets, n_used, replace=False)
+    table[used] = rng.random((n_used, 4)) + .1
+    return table, used
+
+def test_from_dense_matches_dense_lookup():
+    rng = np.random.default_rng(0)
+    table, _ = random_table(rng)
+    store = BucketStore.from_dense(table)
+
+    for key in range(len(table)):
+        np.testing.assert_array_equal(store[key], table[key])
+    np.testing.assert_array_equal(store.to_dense(len(table)), table)
+
+def test_only_updated_buckets_are_stored():
+    rng = np.random.default_rng(1)
+    table, used = random_table(rng)
+    store = BucketStore.from_dense(table)
+
+    assert len(store) == len(used)
+    assert all(key in store for key in used)
+
+def test_add_accumulates_through_resizes():
+    rng = np.random.default_rng(2)
+    store = BucketStore(4, capacity=8)  # Small enough to grow many times
+    dense = np.zeros((100000, 4))
+    for key in rng.integers(0, len(dense), 3000):
+        vector = rng.random(4)
+        store.add(int(key), vector)
+        dense[key] += vector
+
+    np.testing.assert_allclose(store.to_dense(len(dense)), dense, rtol=1e-6)
+
+def test_get_returns_a_copy():
+    store = BucketStore(4)
+    store[7] = np.ones(4)
+    store[7][0] = 5  # Changing the copy leaves the store alone
+    np.testing.assert_array_equal(store[7], np.ones(4))
+    np.testing.assert_array_equal(store[8], np.zeros(4))
+
+def test_save_and_load(tmp_path):
+    table, _ = random_table(np.random.default_rng(3))
+    BucketStore.from_dense(table).save(str(tmp_path / 'table.npz'))
+    np.testing.assert_array_equal(bucket_store.load(str(tmp_path / 'table')).to_dense(len(table)), table)
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+import bucket_table
+import equity_calc
+from equity_calc import HOLDINGS, HOLDING_INDEX, ID_TO_INT
+
+@pytest.fixture(scope='module')
+def evaluator():
+    return equity_calc.EvaluatorNumpy(np.random.default_rng(0))
+
+def test_next_street_equities_match_sweeps(evaluator):
+    rng = np.random.default_rng(0)
+    board = np.sort(rng.choice(52, 4, replace=False))
+    equities = bucket_table.next_street_equities(evaluator, board)
+
+    deck = np.setdiff1d(np.arange(52), board)
+    assert equities.shape == (len(deck), len(HOLDINGS))
+    for row in rng.choice(len(deck), 3, replace=False):
+        odds, _ = evaluator.sweep_board(ID_TO_INT[np.append(board, deck[row])])
+        np.testing.assert_allclose(equities[row], odds[:, 0] + odds[:, 1] / 2)
+
+    histograms = bucket_table.get_histograms(equities)
+    live = ~np.isnan(equities).all(axis=0)
+    assert (histograms[live].sum(axis=1) == (~np.isnan(equities[:, live])).sum(axis=0)).all()
+
+@pytest.mark.parametrize('n_cards', [3, 4])
+def test_cluster_lookups_are_suit_isomorphic(n_cards):
+    rng = np.random.default_rng(n_cards)
+    for _ in range(10):
+        cards = rng.choice(52, n_cards + 2, replace=False)
+        hand, board = cards[:2], cards[2:]
+        clusters = bucket_table.get_clusters(board)
+        assert bucket_table.get_cluster(hand, board) == clusters[HOLDING_INDEX[hand[0], hand[1]]]
+        assert (clusters[equity_calc.HOLDINGS_WITH_CARD[board].ravel()] == 0).all()
+        assert clusters.max() < bucket_table.N_CLUSTERS
+
+        suits = bucket_table.SUIT_PERMUTATIONS[rng.integers(len(bucket_table.SUIT_PERMUTATIONS))]
+        assert bucket_table.get_cluster(suits[hand], suits[board]) == bucket_table.get_cluster(hand, board)
+
+def test_clusters_are_numbered_by_equity(evaluator):
+    rng = np.random.default_rng(5)
+    for _ in range(3):
+        board = rng.choice(52, 4, replace=False)
+        odds, _ = evaluator.sweep_board(ID_TO_INT[board])
+        equities = odds[:, 0] + odds[:, 1] / 2
+        live = ~np.isnan(equities)
+        ranks = np.argsort(np.argsort(equities[live]))
+        assert np.corrcoef(ranks, bucket_table.get_clusters(board)[live])[0, 1] > .95
@@ -0,0 +1,137 @@
+import numpy as np
+import pytest
+
+import equity_calc
+from equity_calc import ID_TO_INT
+
+@pytest.fixture(scope='module')
+def evaluator():
+    return equity_calc.EvaluatorNumpy(np.random.default_rng(0))
+
+def random_hands(rng, n_hands, n_cards, cards=np.arange(52)):
+    return np.array([rng.choice(cards, n_cards, replace=False) for _ in range(n_hands)])
+
+@pytest.mark.parametrize('n_cards', [5, 6, 7])
+def test_kernel_scores_match_the_reference_evaluator(evaluator, n_cards):
+    rng = np.random.default_rng(n_cards)
+    reference = equity_calc.Evaluator()
+    flushes = np.flatnonzero(np.arange(52) % 4 < 2)  # Two suits, so most hands make a flush
+    pairs = np.arange(20)  # Five ranks, so most hands pair the board
+    ids = np.concatenate([random_hands(rng, 300, n_cards, cards) for cards in [np.arange(52), flushes, pairs]])
+
+    hands = ID_TO_INT[ids]
+    expected = [reference.evaluate([int(card) for card in hand], []) for hand in hands]
+    assert list(evaluator.evaluate(hands)) == expected
+
+def test_sampled_deals_are_uniform_without_replacement():
+    deck = ID_TO_INT[np.arange(10, 52)]
+    deals = equity_calc.sample_batch(deck, 20000, 7, 42)
+
+    assert np.isin(deals, deck).all()
+    assert (np.sort(deals, axis=1)[:, 1:] != np.sort(deals, axis=1)[:, :-1]).all()
+    assert (deals == equity_calc.sample_batch(deck, 20000, 7, 42)).all()
+    frequencies = np.unique(deals, return_counts=True)[1] / deals.size
+    assert len(frequencies) == len(deck)
+    assert frequencies == pytest.approx(1 / len(deck), abs=.003)
+
+def test_simulated_games_respect_the_known_cards(evaluator):
+    cards = ID_TO_INT[[0, 5, 10, 20, 30]]
+    games = evaluator.simulate_games(cards, 2, 1000)
+
+    assert (games[:, 0, :5] == cards).all()
+    assert (games[:, 1, 2:5] == cards[2:]).all()
+    assert (games[:, 0, 5:] == games[:, 1, 5:]).all()
+    dealt = np.sort(np.concatenate((games[:, 0], games[:, 1, :2]), axis=1), axis=1)
+    assert (dealt[:, 1:] != dealt[:, :-1]).all()
+
+def test_simulated_odds_match_enumeration(evaluator):
+    reference = equity_calc.Evaluator()
+    hand, board = [int(card) for card in ID_TO_INT[[48, 49]]], [int(card) for card in ID_TO_INT[[0, 21, 33, 42, 7]]]
+    ours = reference.evaluate(hand, board)
+    outcomes = []
+    for first, second in equity_calc.HOLDING_INTS:
+        if not {int(first), int(second)} & set(hand + board):
+            theirs = reference.evaluate([int(first), int(second)], board)
+            outcomes.append([ours < theirs, ours == theirs])
+
+    odds = evaluator.analyze_hand(hand + board, 2, 20000)
+    assert odds == pytest.approx(np.mean(outcomes, axis=0), abs=.015)
+
+def brute_force_odds(evaluator, holding, board, opponents=None):
+    """
+    The [win, tie] odds of a holding (two card ids) on a turn or river board against every opponent holding (or the
+    given ones), enumerating every river and scoring each showdown on its own.
+    """
+    holdings = equity_calc.HOLDINGS if opponents is None else equity_calc.HOLDINGS[opponents]
+    rivers = [[]] if len(board) == 5 else [[card] for card in np.setdiff1d(np.arange(52), list(board) + list(holding))]
+    outcomes = np.zeros(3)
+    for river in rivers:
+        full_board = list(board) + river
+        dead = list(holding) + full_board
+        faced = holdings[~np.isin(holdings, dead).any(axis=1)]
+        ours = evaluator.evaluate(ID_TO_INT[[list(holding) + full_board]])[0]
+        theirs = evaluator.evaluate(ID_TO_INT[np.concatenate((faced, np.tile(full_board, (len(faced), 1))), axis=1)])
+        outcomes += [(ours < theirs).sum(), (ours == theirs).sum(), len(faced)]
+    return outcomes[:2] / outcomes[2]
+
+@pytest.mark.parametrize('n_cards', [4, 5])
+def test_sweep_matches_brute_force(evaluator, n_cards):
+    rng = np.random.default_rng(n_cards)
+    board = rng.choice(52, n_cards, replace=False)
+    odds, scores = evaluator.sweep_board(ID_TO_INT[board])
+
+    assert scores.shape == (52 - n_cards if n_cards == 4 else 1, len(equity_calc.HOLDINGS))
+    assert np.isnan(odds[equity_calc.HOLDINGS_WITH_CARD[board].ravel(), 0]).all()
+    live = np.flatnonzero(~np.isnan(odds[:, 0]))
+    for index in rng.choice(live, 5, replace=False):
+        assert odds[index] == pytest.approx(brute_force_odds(evaluator, equity_calc.HOLDINGS[index], board))
+
+def test_versus_matches_brute_force(evaluator):
+    rng = np.random.default_rng(3)
+    board = rng.choice(52, 4, replace=False)
+    odds, scores = evaluator.sweep_board(ID_TO_INT[board])
+    live = np.flatnonzero(~np.isnan(odds[:, 0]))
+    first, second = rng.choice(live, 3, replace=False), rng.choice(live, 4, replace=False)
+
+    equities = evaluator.versus(scores, first, second)
+    for i, ours in enumerate(first):
+        for j, theirs in enumerate(second):
+            if np.isin(equity_calc.HOLDINGS[ours], equity_calc.HOLDINGS[theirs]).any():
+                assert np.isnan(equities[i, j])
+            else:
+                win, tie = brute_force_odds(evaluator, equity_calc.HOLDINGS[ours], board, [theirs])
+                assert equities[i, j] == pytest.approx(win + tie / 2)
+
+def exact_odds(evaluator, hand, board, weights):
+    """
+    The exact [win, tie] odds of hand on a turn or river against an opponent drawn from weights over HOLDINGS.
+    """
+    _, scores = evaluator.sweep_board(ID_TO_INT[board])
+    ours = scores[:, equity_calc.HOLDING_INDEX[hand[0], hand[1]]][:, None]
+    faced = ((scores > 0) & (ours > 0)) * np.broadcast_to(weights, scores.shape[1:])
+    faced[:, equity_calc.HOLDINGS_WITH_CARD[hand].ravel()] = 0
+    return np.array([(faced * (scores > ours)).sum(), (faced * (scores == ours)).sum()]) / faced.sum()
+
+def test_session_reuses_simulations_across_streets(evaluator):
+    hand, board = [48, 39], [45, 20, 3, 10, 34]
+    session = equity_calc.EquitySession(evaluator)
+    session.update(ID_TO_INT[hand], ID_TO_INT[board[:3]], 20000)
+    odds = session.update(ID_TO_INT[hand], ID_TO_INT[board[:4]], 20000)
+
+    assert 20000 < session.n_simulated < 40000  # The flop simulations that dealt the turn card are kept
+    assert odds == pytest.approx(exact_odds(evaluator, hand, board[:4], 1), abs=.02)
+
+def test_session_reweights_simulations_for_a_new_range(evaluator):
+    hand, board = [48, 39], [45, 20, 3, 10, 34]
+    weights = np.random.default_rng(4).random(len(equity_calc.HOLDINGS))
+    session = equity_calc.EquitySession(evaluator)
+    session.update(ID_TO_INT[hand], ID_TO_INT[board], 20000)
+
+    assert session.update(ID_TO_INT[hand], ID_TO_INT[board], 20000) == pytest.approx(exact_odds(
+        evaluator, hand, board, 1), abs=.02)
+    assert session.n_simulated == 20000
+
+    odds = session.update(ID_TO_INT[hand], ID_TO_INT[board], 20000, weights)
+    assert session.n_simulated < 40000  # Only the shortfall in effective simulations is simulated again
+    assert odds == pytest.approx(exact_odds(evaluator, hand, board, weights), abs=.02)
+    assert odds == pytest.approx(evaluator.analyze_hand(list(ID_TO_INT[hand + board]), 2, 20000, weights), abs=.03)
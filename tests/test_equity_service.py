@@ -0,0 +1,93 @@
+import threading
+import time
+import asyncio
+import numpy as np
+import pytest
+
+import bucket_table
+from equity_calc import HOLDING_INDEX
+from equity_service import canonical_board, hand_equity, ScoreTable, EquityServer, Equity
+
+@pytest.fixture(scope='module')
+def table():
+    return ScoreTable()
+
+def board_equity(table, hand, board, weights=None):
+    """
+    The equity of hand on board, read from the scores of its canonical board as Equity.strength does.
+    """
+    canonical, holdings = canonical_board(board)
+    return hand_equity(table.scores([canonical])[0][:, holdings], hand, weights)
+
+def test_canonical_board_is_suit_isomorphic():
+    rng = np.random.default_rng(0)
+    for n_cards in [3, 4, 5]:
+        for _ in range(20):
+            board = rng.choice(52, n_cards, replace=False)
+            suits = bucket_table.SUIT_PERMUTATIONS[rng.integers(len(bucket_table.SUIT_PERMUTATIONS))]
+            canonical, holdings = canonical_board(board)
+            permuted_canonical, _ = canonical_board(suits[board])
+
+            assert (canonical == permuted_canonical).all()
+            assert (np.diff(canonical) > 0).all()
+            assert (np.sort(holdings) == np.arange(len(holdings))).all()
+
+def test_equity_is_suit_isomorphic(table):
+    rng = np.random.default_rng(1)
+    for n_cards in [3, 4, 5]:
+        cards = rng.choice(52, n_cards + 2, replace=False)
+        hand, board = cards[:2], cards[2:]
+        suits = bucket_table.SUIT_PERMUTATIONS[rng.integers(len(bucket_table.SUIT_PERMUTATIONS))]
+        assert board_equity(table, hand, board) == pytest.approx(board_equity(table, suits[hand], suits[board]))
+
+def test_turn_equity_averages_rivers(table):
+    rng = np.random.default_rng(2)
+    cards = rng.choice(52, 6, replace=False)
+    hand, turn = cards[:2], cards[2:]
+    rivers = np.setdiff1d(np.arange(52), cards)
+    river_equities = [board_equity(table, hand, np.append(turn, river)) for river in rivers]
+    assert board_equity(table, hand, turn) == pytest.approx(np.mean(river_equities, axis=0))
+
+def test_single_holding_range(table):
+    rng = np.random.default_rng(3)
+    cards = rng.choice(52, 9, replace=False)
+    hand, board, opponent = cards[:2], cards[2:7], cards[7:]
+    canonical, holdings = canonical_board(board)
+    scores = table.scores([canonical])[0][:, holdings]
+    ours, theirs = scores[0, HOLDING_INDEX[hand[0], hand[1]]], scores[0, HOLDING_INDEX[opponent[0], opponent[1]]]
+
+    weights = np.zeros(len(holdings))
+    weights[HOLDING_INDEX[opponent[0], opponent[1]]] = 1
+    assert list(hand_equity(scores, hand, weights)) == [float(theirs > ours), float(theirs == ours)]
+
+def test_cache_keeps_recent_boards():
+    table = ScoreTable(max_bytes=3 * 2 * 1326)
+    boards = [np.array([0, 4, 8, 12, 16 + i]) for i in range(4)]
+    table.scores(boards[:3])
+    table.scores(boards[:1])
+    table.scores(boards[3:])
+    assert set(table.cache) == {tuple(boards[i]) for i in [0, 2, 3]}
+    assert (table.hits, table.misses) == (1, 4)
+
+def test_equity_never_waits_for_the_service(table, tmp_path):
+    path = str(tmp_path / 'equity.sock')
+    with pytest.raises(OSError):
+        Equity(path)
+
+    server = EquityServer(table)
+    threading.Thread(target=asyncio.run, args=(server.serve(path),), daemon=True).start()
+    for _ in range(100):
+        try:
+            equity = Equity(path)
+            break
+        except OSError:
+            time.sleep(.05)
+
+    hand, board = np.array([0, 5]), np.array([10, 20, 30, 40])
+    assert equity.strength(hand, board) is None
+    for _ in range(100):
+        strength = equity.strength(hand, board)
+        if strength is not None:
+            break
+        time.sleep(.05)
+    assert strength == pytest.approx(board_equity(table, hand, board))
@@ -0,0 +1,96 @@
+import argparse
+import socket
+import threading
+import pytest
+
+from skeleton import hand_log
+from skeleton.actions import FoldAction, CallAction, CheckAction, RaiseAction
+from skeleton.bot import Bot
+from skeleton.hand_log import HandLog, pack_action, unpack_action, MAX_ACTIONS
+from skeleton.runner import run_bot
+from skeleton.transcript import read_transcript
+
+class FoldingBot(Bot):
+
+    def handle_new_round(self, game_state, round_state, active):
+        pass
+
+    def handle_round_over(self, game_state, terminal_state, active):
+        pass
+
+    def get_action(self, game_state, round_state, active):
+        return FoldAction()
+
+def record_hands(log, n_hands):
+    for round_num in range(1, n_hands + 1):
+        actions = [pack_action(CallAction()), pack_action(RaiseAction(round_num)), pack_action(FoldAction())]
+        log.record(round_num, round_num % 2, [round_num % 52, 51], [], [1, 2, 3], actions, -round_num, 30. - round_num,
+                   round_num)
+
+def test_actions_round_trip():
+    for action in [FoldAction(), CallAction(), CheckAction(), RaiseAction(2), RaiseAction(200)]:
+        assert unpack_action(pack_action(action)) == action
+
+def test_hands_round_trip(tmp_path):
+    path = str(tmp_path / 'hands.log')
+    log = HandLog(path, buffer_size=4)
+    record_hands(log, 10)
+    log.record(11, 0, [4, 5], [6, 7], [8, 9, 10, 11, 12], [pack_action(CheckAction())] * (MAX_ACTIONS + 1), 200, 1.5,
+               211)
+    log.close()
+
+    hands = list(hand_log.hands(path, batch_size=3))
+    assert [hand.round_num for hand in hands] == list(range(1, 12))
+    assert hands[2] == hand_log.Hand(3, 1, [3, 51], [], [1, 2, 3], [CallAction(), RaiseAction(3), FoldAction()], -3,
+                                     27., 3, False)
+    last = hands[-1]
+    assert (last.opp_hand, last.board, last.delta, last.truncated) == ([6, 7], [8, 9, 10, 11, 12], 200, True)
+    assert len(last.actions) == MAX_ACTIONS
+
+def test_logs_are_appended(tmp_path):
+    path = str(tmp_path / 'hands.log')
+    for _ in range(2):
+        log = HandLog(path)
+        record_hands(log, 5)
+        log.close()
+    assert len(hand_log.read(path)) == 10
+
+def test_partial_records_are_left_out(tmp_path):
+    path = str(tmp_path / 'hands.log')
+    log = HandLog(path)
+    record_hands(log, 3)
+    log.close()
+    with open(path, 'ab') as file:
+        file.write(b'\0' * (hand_log.RECORD_DTYPE.itemsize // 2))
+    assert list(hand_log.read(path)['round_num']) == [1, 2, 3]
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / 'hands.log'
+    path.write_bytes(b'not a hand log at all')
+    with pytest.raises(ValueError):
+        HandLog(str(path))
+
+def test_run_bot_keeps_the_log_when_the_engine_drops(tmp_path):
+    server = socket.create_server(('localhost', 0))
+    port = server.getsockname()[1]
+
+    def engine():  # Plays one hand, then drops the connection in the middle of the next
+        connection, _ = server.accept()
+        with connection, connection.makefile('rw') as file:
+            for packet in ['T30.00 P0 H9d,Qd', 'F D-1', 'T29.90 P1 H2c,3d R4']:
+                file.write(packet + '\n')
+                file.flush()
+                file.readline()
+
+    thread = threading.Thread(target=engine)
+    thread.start()
+    path = str(tmp_path / 'hands.log')
+    transcript = str(tmp_path / 'game.transcript')
+    args = argparse.Namespace(host='localhost', port=port, log=path, transcript=transcript)
+    with pytest.raises(Exception):
+        run_bot(FoldingBot(), args)
+    thread.join()
+    server.close()
+
+    assert [hand.delta for hand in hand_log.hands(path)] == [-1]
+    assert len(read_transcript(transcript)) == 7
@@ -0,0 +1,76 @@
+import numpy as np
+import equity_calc
+import opp_range
+import player
+import preflop_table
+import pytest
+
+from skeleton.actions import CallAction, CheckAction, RaiseAction
+from skeleton.states import RoundState, STARTING_STACK, BIG_BLIND, SMALL_BLIND
+
+IDENTITY = np.arange(52)
+
+def new_round(deck=()):
+    return RoundState(0, 0, [SMALL_BLIND, BIG_BLIND], [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND],
+                      [[], []], list(deck), None)
+
+@pytest.fixture(scope='module')
+def tracker():
+    return opp_range.RangeTracker(equity_calc.EvaluatorNumpy(np.random.default_rng(0)))
+
+def test_likelihoods_follow_directions():
+    percentiles = np.linspace(0, 1, 101)
+    likelihoods = opp_range.get_likelihoods(percentiles)
+
+    assert likelihoods.shape == (7, 101)
+    assert (likelihoods >= opp_range.floor).all() and (likelihoods <= 1).all()
+    for kind, direction in enumerate(opp_range.directions):
+        assert (direction * np.diff(likelihoods[kind]) > 0).all()
+
+def test_percentiles_share_ties(tracker):
+    percentiles = tracker.get_percentiles(np.array([1., 2., 2., 3.]))
+    np.testing.assert_allclose(percentiles, [.125, .5, .5, .875])
+
+def test_reset_removes_our_cards(tracker):
+    tracker.reset([0, 5], IDENTITY)
+    dead = equity_calc.HOLDINGS_WITH_CARD[[0, 5]].ravel()
+    assert (tracker.weights[dead] == 0).all()
+    assert (tracker.weights == 0).sum() == len(np.unique(dead))
+
+def test_raise_multiplies_in_its_likelihood(tracker):
+    tracker.reset([0, 5], IDENTITY)
+    before = tracker.weights.copy()
+    state = new_round().proceed(RaiseAction(6))  # The small blind raises the size of the pot after calling
+
+    assert [kind for _, _, kind, _ in opp_range.get_actions(state)] == [opp_range.RAISE_MEDIUM]
+    assert tracker.observe(state, 0)
+    np.testing.assert_allclose(tracker.weights, before * tracker.preflop_likelihoods[opp_range.RAISE_MEDIUM])
+    assert tracker.n_observed == 1
+
+    # Observing the same state again changes nothing
+    assert not tracker.observe(state, 0)
+    np.testing.assert_allclose(tracker.weights, before * tracker.preflop_likelihoods[opp_range.RAISE_MEDIUM])
+
+def test_our_actions_are_not_observed(tracker):
+    tracker.reset([0, 5], IDENTITY)
+    before = tracker.weights.copy()
+    assert not tracker.observe(new_round().proceed(CallAction()), 1)
+    np.testing.assert_array_equal(tracker.weights, before)
+
+def test_new_street_removes_board_cards(tracker):
+    deck = [10, 20, 30, 40, 50]
+    tracker.reset([0, 5], IDENTITY)
+    state = new_round(deck).proceed(CallAction()).proceed(CheckAction())  # Limp and check to the flop
+
+    assert state.street == 3
+    tracker.observe(state, 0)
+    assert tracker.street == 3
+    assert (tracker.weights[equity_calc.HOLDINGS_WITH_CARD[deck[:3]].ravel()] == 0).all()
+
+def test_uniform_range_reproduces_preflop_tables(tracker):
+    strengths, ties, _ = player.load_preflop_tables()
+    rng = np.random.default_rng(0)
+    for first, second in equity_calc.HOLDINGS[rng.choice(len(equity_calc.HOLDINGS), 20, replace=False)]:
+        tracker.reset([first, second], IDENTITY)
+        equity = preflop_table.hand_equity(first, second, tracker.get_class_weights())
+        assert equity == pytest.approx(strengths[first, second] + ties[first, second] / 2)
@@ -0,0 +1,22 @@
+import numpy as np
+import equity_calc
+import permutation_solver
+
+RANKS = '23456789TJQKA'
+STANDARD_ORDER = {RANKS[i + 1]: {RANKS[i]} for i in range(12)}  # Rules that leave only the standard order
+
+def test_fixed_order_has_no_spread():
+    evaluator = equity_calc.EvaluatorNumpy(np.random.default_rng(0))
+    rng = np.random.default_rng(1)
+    orders = permutation_solver.sample_orders(STANDARD_ORDER, 16, rng)
+    assert (orders == np.arange(13)).all()
+
+    odds, spread = permutation_solver.sampled_strength(evaluator, [48, 49], [0, 21, 33], STANDARD_ORDER, n_sims=4096,
+                                                       rng=rng)
+    assert spread == 0
+    assert 0 < odds[0] < 1
+
+def test_sampled_orders_keep_the_rules():
+    orders = permutation_solver.sample_orders({'2': {'A'}, '3': {'K'}}, 50, np.random.default_rng(2))
+    positions = np.argsort(orders, axis=1)
+    assert (positions[:, 0] > positions[:, 12]).all() and (positions[:, 1] > positions[:, 11]).all()
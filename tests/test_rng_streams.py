@@ -0,0 +1,23 @@
+import numpy as np
+
+from rng_streams import Streams
+
+def test_streams_are_reproducible():
+    assert (Streams(42)['deal'].random(5) == Streams(42)['deal'].random(5)).all()
+
+def test_streams_do_not_depend_on_creation_order():
+    first, second = Streams(42), Streams(42)
+    first['deal'], first['equity']
+    draws = second['equity'].random(5)
+    second['deal'].random(100)
+    assert (draws == first['equity'].random(5)).all()
+
+def test_streams_are_independent():
+    streams = Streams(42)
+    assert streams['deal'] is streams['deal']
+    assert not np.array_equal(streams['deal'].random(5), streams['equity'].random(5))
+    assert not np.array_equal(Streams(42)['deal'].random(5), Streams(43)['deal'].random(5))
+
+def test_fresh_seed_is_kept():
+    streams = Streams()
+    assert (Streams(streams.seed)['deal'].random(5) == streams['deal'].random(5)).all()
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+import equity_calc
+import subgame
+from subgame import Showdown, unblocked, HOLDING_HAS_CARD
+
+COMPATIBLE = (HOLDING_HAS_CARD.T.astype(int) @ HOLDING_HAS_CARD) == 0  # Holdings that share no card
+
+@pytest.fixture(scope='module')
+def evaluator():
+    return equity_calc.EvaluatorNumpy()
+
+def test_unblocked_matches_dense():
+    reach = np.random.default_rng(0).random(subgame.N_HOLDINGS)
+    assert unblocked(reach) == pytest.approx(COMPATIBLE @ reach)
+
+def test_showdown_matches_dense(evaluator):
+    rng = np.random.default_rng(1)
+    for _ in range(3):
+        board = rng.choice(52, 5, replace=False)
+        reach = rng.random(subgame.N_HOLDINGS) * (rng.random(subgame.N_HOLDINGS) < .5)
+
+        scores = evaluator.score_holdings(np.array([board]))[0].astype(np.int64)
+        live = scores > 0
+        outcome = np.sign(scores[None, :] - scores[:, None])  # 1 where the holding beats the opponent's
+        expected = (COMPATIBLE * outcome) @ (reach * live) * live
+        assert Showdown(evaluator, board).values(reach) == pytest.approx(expected)
@@ -0,0 +1,76 @@
+from skeleton.actions import FoldAction, CallAction
+from skeleton.bot import Bot
+from skeleton.replay import replay
+from skeleton.runner import Runner
+from skeleton.transcript import RecordingFile, read_transcript, response_times, RECEIVED, SENT
+
+# Two rounds as the engine sends them to a bot that folds whenever it can
+PACKETS = ['T30.00 P0 H9d,Qd', 'F D-1', 'T29.90 P1 H2c,3d R4', 'F D-2', 'Q']
+
+class ScriptedEngine():
+    '''
+    Socket file that sends PACKETS and keeps what the bot writes.
+    '''
+
+    def __init__(self):
+        self.packets = iter(PACKETS)
+        self.written = []
+
+    def readline(self):
+        return next(self.packets) + '\n'
+
+    def write(self, data):
+        self.written.append(data.rstrip('\n'))
+
+    def flush(self):
+        pass
+
+class PassiveBot(Bot):
+
+    def __init__(self, action):
+        self.action = action
+
+    def handle_new_round(self, game_state, round_state, active):
+        pass
+
+    def handle_round_over(self, game_state, terminal_state, active):
+        pass
+
+    def get_action(self, game_state, round_state, active):
+        return self.action()
+
+def record(path):
+    engine = ScriptedEngine()
+    transcript = RecordingFile(engine, path)
+    Runner(PassiveBot(FoldAction), transcript).run()
+    transcript.close()
+    return engine.written
+
+def test_transcript_records_every_packet(tmp_path):
+    path = str(tmp_path / 'game.transcript')
+    written = record(path)
+    assert written == ['F', 'K', 'F', 'K']
+
+    events = read_transcript(path)
+    assert [packet for _, direction, packet in events if direction == RECEIVED] == PACKETS
+    assert [packet for _, direction, packet in events if direction == SENT] == written
+    seconds = [seconds for seconds, _, _ in events]
+    assert seconds == sorted(seconds)
+
+def test_replay_matches_the_recorded_bot(tmp_path):
+    path = str(tmp_path / 'game.transcript')
+    record(path)
+    mismatches, timings = replay(PassiveBot(FoldAction), path)
+    assert mismatches == []
+    assert [round_num for round_num, _ in timings] == [1, 2]
+
+def test_replay_reports_different_actions(tmp_path):
+    path = str(tmp_path / 'game.transcript')
+    record(path)
+    mismatches, _ = replay(PassiveBot(CallAction), path)
+    assert mismatches == [(0, PACKETS[0], 'F', 'C'), (2, PACKETS[2], 'F', 'C')]
+
+def test_response_times_skip_acknowledgements():
+    events = [(0., RECEIVED, 'T30.00 P0 H9d,Qd'), (.25, SENT, 'C'), (1., RECEIVED, 'K F D-2'), (1.5, SENT, 'K'),
+              (2., RECEIVED, 'T29.00 P1 H2c,3d R4'), (2.5, SENT, 'F')]
+    assert response_times(events) == [.25, .5]
@@ -0,0 +1,153 @@
+"""
+Solves the abstract game of abstract_game.py with vector-form CFR+, and writes the per-node strategy table Player
+reads.
+
+Each iteration walks the compiled betting tree of betting_tree.py once per player. The walking player's values and the
+opponent's reach are vectors over their card buckets, so one visit of a node updates the regrets of every bucket at
+once, and the two players' buckets move to the next street through the chance model's transition matrices, as in
+best_response.py. Tables are dense (n_rows, N_ACTIONS) arrays with rows of their own for every decision node, from
+the compiled tree's node_base. Player's shared get_bucket rows are not trained: they merge betting situations that need
+different actions, and CFR+ on them made the strategy more exploitable the longer it ran. Strategies are fixed at the
+start of each walk, regrets are floored at zero after it (CFR+), and the average strategy weighs iteration t by t.
+
+Running this file trains for a number of iterations, printing the throughput and the exploitability of the average
+strategy as it goes, and writes the regret and strategy tables as npz stores (and optionally as dense CSVs). Player
+uses the strategy table at every decision it can map onto the tree, and its shared tables elsewhere.
+"""
+
+import argparse
+import time
+
+import numpy as np
+import abstract_game
+import best_response
+import betting_tree
+import bucket_store
+
+from abstract_game import N_ACTIONS, n_buckets
+
+STRATEGY_SCALE = 10000  # Rows of the written strategy sums add up to this, above Player's threshold for trusting them
+
+def regret_matching(regrets):
+    """
+    Returns the current strategy of every row of a regret table, uniform where no regret is positive.
+    """
+    positive = np.maximum(regrets, 0)
+    totals = positive.sum(axis=1, keepdims=True)
+    return np.where(totals > 0, positive / np.where(totals > 0, totals, 1), 1 / N_ACTIONS)
+
+class VectorCFR:
+    """
+    The regret and strategy sums of a CFR+ run on the abstract game.
+    """
+
+    def __init__(self, tree, model):
+        self.tree = tree
+        self.model = model
+        decisions = np.flatnonzero(tree.player >= 0)
+        n_rows = max(tree.node_base[node] + n_buckets(tree.street[node]) for node in decisions)
+        self.regrets = np.zeros((n_rows, N_ACTIONS))
+        self.strategy_sums = np.zeros((n_rows, N_ACTIONS))
+        self.iterations = 0
+        self.children = [None if tree.terminal(node) else list(tree.distinct(node))  # Reused every walk
+                         for node in range(len(tree))]
+
+    def iterate(self):
+        """
+        Runs one iteration: a walk of the tree for each player.
+        """
+        self.iterations += 1
+        for player in range(2):
+            self.strategy = regret_matching(self.regrets)
+            self.walk(0, self.model.prior, player)
+            np.maximum(self.regrets, 0, out=self.regrets)
+
+    def walk(self, node, reach, player):
+        """
+        Given the opponent's reach over their card buckets on the node's street, returns player's counterfactual value
+        for each of their own card buckets, updating player's regrets and the opponent's strategy sums on the way.
+        """
+        tree = self.tree
+        if tree.terminal(node):
+            if tree.showdown[node]:
+                return tree.contribution[node] * (self.model.showdown @ reach)
+            return np.full(n_buckets(tree.street[node]), tree.deltas[node, player] * reach.sum())
+
+        rows = slice(tree.node_base[node], tree.node_base[node] + n_buckets(tree.street[node]))
+        strategy = self.strategy[rows]
+
+        if tree.player[node] == player:
+            values = np.empty((n_buckets(tree.street[node]), N_ACTIONS))
+            for child, actions in self.children[node]:
+                values[:, actions] = self.walk_child(node, child, reach, player)[:, None]
+
+            value = (strategy * values).sum(axis=1)
+            self.regrets[rows] += values - value[:, None]
+            return value
+
+        self.strategy_sums[rows] += self.iterations * reach[:, None] * strategy
+        return sum(self.walk_child(node, child, reach * strategy[:, actions].sum(axis=1), player)
+                   for child, actions in self.children[node])
+
+    def walk_child(self, node, child, reach, player):
+        if self.tree.street[child] != self.tree.street[node]:  # Both players' buckets move on to the next street
+            transition = self.model.transitions[self.tree.street[node]]
+            return transition @ self.walk(child, reach @ transition, player)
+        return self.walk(child, reach, player)
+
+    def average_strategy_table(self):
+        """
+        Returns the strategy sums with every visited row scaled to add up to STRATEGY_SCALE.
+        """
+        totals = self.strategy_sums.sum(axis=1, keepdims=True)
+        return np.where(totals > 0, STRATEGY_SCALE * self.strategy_sums / np.where(totals > 0, totals, 1), 0)
+
+    def average_regret(self):
+        """
+        Returns the largest positive regret of any bucket divided by the number of iterations, in chips, which CFR+
+        drives towards zero in the abstract game.
+        """
+        return self.regrets.max() / max(self.iterations, 1)
+
+    def exploitability(self):
+        """
+        Returns the exploitability of the average strategy in milli big blinds per hand, against a best response that
+        tells apart every node of the tree.
+        """
+        strategies = betting_tree.get_strategies(self.tree, self.strategy_sums, self.tree.node_base)
+        return best_response.exploitability(self.tree, self.model, strategies)[0]
+
+    def save(self, regretsum='node_regretsum', stratsum='node_stratsum', csv=False):
+        """
+        Writes the regret sums and the scaled strategy sums as npz stores, and as dense CSVs if csv is set.
+        """
+        for name, table in [(regretsum, self.regrets), (stratsum, self.average_strategy_table())]:
+            bucket_store.BucketStore.from_dense(table).save(name + '.npz')
+            if csv:
+                np.savetxt(name + '.csv', table, delimiter=',')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python3 vector_cfr.py')
+    parser.add_argument('--iterations', type=int, default=1000, help='Number of CFR+ iterations')
+    parser.add_argument('--report-every', type=int, default=100, help='Iterations between exploitability reports')
+    parser.add_argument('--model', type=str, default='abstract_game.npz', help='Chance model from abstract_game.py')
+    parser.add_argument('--regretsum', type=str, default='node_regretsum', help='Name of the regret table written')
+    parser.add_argument('--stratsum', type=str, default='node_stratsum', help='Name of the strategy table written')
+    parser.add_argument('--csv', action='store_true', help='Also write the tables as dense CSVs')
+    args = parser.parse_args()
+
+    start = time.time()
+    solver = VectorCFR(betting_tree.load_tree(), abstract_game.ChanceModel.load(args.model))
+    print(f"Loaded the tree ({len(solver.tree)} nodes) in {time.time() - start:.1f}s")
+
+    elapsed = 0
+    for iteration in range(1, args.iterations + 1):
+        start = time.time()
+        solver.iterate()
+        elapsed += time.time() - start  # Training time only, without the reports
+        if iteration % args.report_every == 0 or iteration == args.iterations:
+            print(f"Iteration {iteration}: {iteration / elapsed:.2f} iterations/s, "
+                  f"average regret {solver.average_regret():.3f} chips, "
+                  f"exploitability {solver.exploitability():.0f} mbb/hand")
+
+    solver.save(args.regretsum, args.stratsum, args.csv)